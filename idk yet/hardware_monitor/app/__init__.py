@@ -5,9 +5,11 @@ Inicialización de la aplicación Flask
 from flask import Flask
 from flask_cors import CORS
 import os
+import time
 from dotenv import load_dotenv
 from flask_jwt_extended import JWTManager
 import logging
+import random
 import uuid
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
@@ -40,15 +42,9 @@ def create_app():
     log_level = os.getenv('LOG_LEVEL', 'INFO').upper()
     log_file = os.getenv('LOG_FILE', 'hardware_monitor.log')
     
-    # Configurar logging estructurado
-    logging.basicConfig(
-        level=log_level,
-        format='%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s',
-        handlers=[
-            logging.FileHandler(log_file),
-            logging.StreamHandler()
-        ]
-    )
+    # Configurar logging estructurado: los requests solo encolan, un hilo escribe y rota el fichero
+    from app.logpipeline import configure_logging, LOG_ACCESS_SAMPLE
+    configure_logging(log_level, log_file)
 
     # Habilitar CORS con configuración específica
     CORS_ORIGINS = os.getenv('CORS_ORIGINS', '').split(',')
@@ -118,13 +114,23 @@ def create_app():
         from flask import request, g
         request_id = str(uuid.uuid4())
         g.request_id = request_id
-        logging.info(f"Request {request_id} iniciado: {request.method} {request.path}")
+        g.request_start = time.perf_counter()
     
     @app.after_request
     def after_request(response):
         from flask import g
+        from flask import request
+        from app.sketches import percentiles, shared_percentiles
         request_id = getattr(g, 'request_id', 'unknown')
-        logging.info(f"Request {request_id} completado: {response.status_code}")
+        elapsed_ms = (time.perf_counter() - g.request_start) * 1000 if hasattr(g, 'request_start') else 0.0
+        # Una línea de acceso por request, muestreada; los errores se registran siempre
+        if response.status_code >= 400 or random.random() < LOG_ACCESS_SAMPLE:
+            logging.info(f"Request {request_id} completado: {request.method} {request.path} "
+                         f"{response.status_code} ({elapsed_ms:.1f} ms)")
+        if request.endpoint and hasattr(g, 'request_start'):
+            # Latencia por endpoint para los percentiles (p50/p95/p99)
+            percentiles.observe(f"latency.{request.endpoint}", elapsed_ms)
+            shared_percentiles.publish()
         response.headers['X-Request-ID'] = request_id
         return response
     
@@ -132,4 +138,33 @@ def create_app():
     from app.routes import main_bp
     app.register_blueprint(main_bp)
     
+    # Iniciar el sampler de hardware en segundo plano (uno por proceso)
+    from app.sampler import hardware_sampler
+    from app.timeseries import metrics_store
+    from app.streaming import stream_hub
+    from app.persistence import history_segments, HISTORY_RESTORE_WINDOW
+    from app.sketches import percentiles, shared_percentiles
+    from app.payloads import stats_payload
+    if history_segments.enabled and not len(metrics_store):
+        # Recuperar el historial reciente tras un reinicio
+        restored = metrics_store.restore(history_segments, since=time.time() - HISTORY_RESTORE_WINDOW)
+        logging.info(f"Historial recuperado de disco: {restored} muestras")
+    hardware_sampler.add_listener(metrics_store.append_snapshot)
+    hardware_sampler.add_listener(stream_hub.publish)
+    if hardware_sampler.enabled:
+        # Bajo demanda cada muestra la lee un solo request: se comprime solo la variante negociada
+        hardware_sampler.add_listener(stats_payload.publish)
+    hardware_sampler.add_listener(percentiles.observe_snapshot)
+    hardware_sampler.add_listener(shared_percentiles.publish_snapshot)
+    if not hardware_sampler.shared_name:
+        # En modo compartido cada worker se engancha en post_fork (gunicorn.conf.py)
+        if history_segments.enabled:
+            hardware_sampler.add_listener(history_segments.append_snapshot)
+        hardware_sampler.start()
+    
+    # Sondas /livez y /readyz por delante de todo el middleware de Flask
+    from app.probes import ProbeMiddleware, readiness
+    app.wsgi_app = ProbeMiddleware(app.wsgi_app, readiness)
+    readiness.mark_ready()
+    
     return app 
\ No newline at end of file
@@ -0,0 +1,283 @@
+"""
+Agregados por rango sin reescanear: sumas prefijas, árbol de segmentos y sketches por tramo
+"""
+
+import bisect
+import math
+import os
+import re
+from collections import OrderedDict, deque
+
+import numpy as np
+
+from app.sketches import DDSketch
+
+# Configuración desde variables de entorno
+QUERY_MAX_INDEXED = int(os.getenv('QUERY_MAX_INDEXED', 8))  # Métricas con índice (~3 MB cada una con 86 400 muestras)
+QUERY_MAX_POINTS = int(os.getenv('QUERY_MAX_POINTS', 1000))  # Buckets máximos por consulta
+QUERY_CACHE_SIZE = int(os.getenv('QUERY_CACHE_SIZE', 10000))  # Resultados memoizados por bucket
+QUERY_SKETCH_SECONDS = int(os.getenv('QUERY_SKETCH_SECONDS', 60))  # Tramo de cada sketch de cuantiles
+SKETCH_LEVEL_FACTOR = 60  # Segundo nivel de sketches: tramos 60 veces más largos (1 h por defecto)
+
+QUERY_FUNCTIONS = ('sum', 'avg', 'min', 'max', 'count', 'increase', 'rate')
+QUANTILE_FUNCTION = re.compile(r'p(\d{1,2}(?:\.\d+)?)')
+
+def parse_function(fn):
+    """Cuantil de una función 'pNN' (None para los agregados simples); ValueError si no existe"""
+    if fn in QUERY_FUNCTIONS:
+        return None
+    match = QUANTILE_FUNCTION.fullmatch(fn or '')
+    if match is None:
+        raise ValueError(f"fn debe ser uno de {', '.join(QUERY_FUNCTIONS)} o un cuantil pNN (p. ej. p95)")
+    return float(match.group(1)) / 100
+
+class SeriesIndex:
+    """Índices incrementales de una serie, alineados con las posiciones del buffer circular"""
+
+    def __init__(self, capacity, sketch_seconds=QUERY_SKETCH_SECONDS):
+        self.capacity = capacity
+        self.sketch_seconds = sketch_seconds
+        # Acumulados hasta el índice lógico k, guardados en la posición k % capacity
+        self._sum = np.zeros(capacity, dtype=np.float64)
+        self._valid = np.zeros(capacity, dtype=np.int64)
+        self._increase = np.zeros(capacity, dtype=np.float64)
+        self._base = (0.0, 0, 0.0)  # Acumulados justo antes de la muestra más antigua conservada
+        # Árbol de segmentos (hojas = posiciones del buffer) para min/max en O(log n)
+        self._size = 1 << max(0, (capacity - 1).bit_length())
+        self._min = np.full(2 * self._size, np.inf, dtype=np.float32)
+        self._max = np.full(2 * self._size, -np.inf, dtype=np.float32)
+        self._previous = math.nan  # Último valor presente (para los incrementos)
+        # Dos niveles de sketches (inicios y DDSketch en paralelo): un rango largo fusiona pocos
+        # tramos gruesos; los inicios van aparte para buscarlos con bisect sin `key=` (Python 3.9)
+        self._levels = [(seconds, deque(), deque())
+                        for seconds in (sketch_seconds, sketch_seconds * SKETCH_LEVEL_FACTOR)]
+        self.count = 0
+
+    def backfill(self, timestamps, values, count):
+        """Construir los índices en bloque con las muestras conservadas (termina en `count`)"""
+        values = values.astype(np.float64)
+        present = ~np.isnan(values)
+        positions = (count - len(values) + np.arange(len(values))) % self.capacity
+        self._sum[positions] = np.cumsum(np.where(present, values, 0.0))
+        self._valid[positions] = np.cumsum(present)
+
+        # Incrementos entre valores presentes consecutivos; un descenso es un reinicio del contador
+        kept = values[present]
+        increments = np.zeros(len(values))
+        if len(kept) > 1:
+            deltas = np.diff(kept)
+            increments[np.flatnonzero(present)[1:]] = np.where(deltas >= 0, deltas, kept[1:])
+        self._increase[positions] = np.cumsum(increments)
+        self._previous = float(kept[-1]) if len(kept) else math.nan
+
+        self._min[self._size + positions] = np.where(present, values, np.inf)
+        self._max[self._size + positions] = np.where(present, values, -np.inf)
+        level = self._size
+        while level > 1:
+            parents = np.arange(level // 2, level)
+            self._min[parents] = np.minimum(self._min[2 * parents], self._min[2 * parents + 1])
+            self._max[parents] = np.maximum(self._max[2 * parents], self._max[2 * parents + 1])
+            level //= 2
+
+        for seconds, slice_starts, slices in self._levels:
+            starts = timestamps - timestamps % seconds
+            boundaries = np.flatnonzero(np.diff(starts)) + 1
+            for start, chunk in zip(starts[np.concatenate(([0], boundaries))].tolist(),
+                                    np.split(values, boundaries)):
+                sketch = DDSketch()
+                sketch.extend(chunk)
+                if sketch.count:
+                    slice_starts.append(start)
+                    slices.append(sketch)
+        self.count = count
+
+    def add(self, timestamp, value, oldest):
+        """Incorporar la muestra siguiente en O(log n)"""
+        position = self.count % self.capacity
+        if self.count >= self.capacity:
+            # La muestra sobrescrita pasa a ser la base de los acumulados
+            self._base = (self._sum[position], self._valid[position], self._increase[position])
+        if self.count:
+            previous = (self.count - 1) % self.capacity
+            total, valid, increase = self._sum[previous], self._valid[previous], self._increase[previous]
+        else:
+            total, valid, increase = self._base
+
+        present = value == value
+        if present:
+            total += value
+            valid += 1
+            if self._previous == self._previous:
+                delta = value - self._previous
+                increase += delta if delta >= 0 else value
+            self._previous = value
+        self._sum[position] = total
+        self._valid[position] = valid
+        self._increase[position] = increase
+        self._set_leaf(position, value if present else None)
+
+        for seconds, slice_starts, slices in self._levels:
+            if present:
+                start = timestamp - timestamp % seconds
+                if not slice_starts or start > slice_starts[-1]:
+                    slice_starts.append(start)
+                    slices.append(DDSketch())
+                slices[-1].add(value)
+            # Los tramos con muestras ya descartadas del buffer dejan de ser exactos
+            while slice_starts and slice_starts[0] < oldest:
+                slice_starts.popleft()
+                slices.popleft()
+        self.count += 1
+
+    def _set_leaf(self, position, value):
+        index = self._size + position
+        self._min[index] = np.inf if value is None else value
+        self._max[index] = -np.inf if value is None else value
+        index //= 2
+        while index:
+            self._min[index] = min(self._min[2 * index], self._min[2 * index + 1])
+            self._max[index] = max(self._max[2 * index], self._max[2 * index + 1])
+            index //= 2
+
+    def _prefix(self, array, base, k):
+        """Acumulado de los índices lógicos anteriores a k"""
+        first = max(0, self.count - self.capacity)
+        return base if k <= first else array[(k - 1) % self.capacity]
+
+    def _tree(self, tree, lo, hi, reduce, identity):
+        """Reducir las posiciones [lo, hi) del árbol"""
+        result = identity
+        lo += self._size
+        hi += self._size
+        while lo < hi:
+            if lo & 1:
+                result = reduce(result, tree[lo])
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                result = reduce(result, tree[hi])
+            lo //= 2
+            hi //= 2
+        return result
+
+    def _extreme(self, tree, lo, hi, reduce, identity):
+        """Mínimo o máximo del rango lógico [lo, hi) (dos tramos si da la vuelta al buffer)"""
+        start = lo % self.capacity
+        end = start + hi - lo
+        if end <= self.capacity:
+            result = self._tree(tree, start, end, reduce, identity)
+        else:
+            result = reduce(self._tree(tree, start, self.capacity, reduce, identity),
+                            self._tree(tree, 0, end - self.capacity, reduce, identity))
+        return None if math.isinf(result) else float(result)
+
+    def reduce(self, fn, lo, hi, timestamp):
+        """Agregado simple del rango lógico [lo, hi); `timestamp(k)` da el instante de la muestra k"""
+        if hi <= lo:
+            return 0 if fn == 'count' else None
+        if fn in ('min', 'max'):
+            tree, reduce, identity = ((self._min, min, np.inf) if fn == 'min'
+                                      else (self._max, max, -np.inf))
+            return self._extreme(tree, lo, hi, reduce, identity)
+        if fn in ('increase', 'rate'):
+            if hi - lo < 2:
+                return None
+            # Incrementos posteriores a la primera muestra del rango
+            increase = (self._prefix(self._increase, self._base[2], hi)
+                        - self._prefix(self._increase, self._base[2], lo + 1))
+            if fn == 'increase':
+                return float(increase)
+            duration = timestamp(hi - 1) - timestamp(lo)
+            return float(increase / duration) if duration > 0 else None
+
+        total = self._prefix(self._sum, self._base[0], hi) - self._prefix(self._sum, self._base[0], lo)
+        valid = int(self._prefix(self._valid, self._base[1], hi) - self._prefix(self._valid, self._base[1], lo))
+        if fn == 'count':
+            return valid
+        if not valid:
+            return None
+        return float(total) if fn == 'sum' else float(total / valid)
+
+    def _merge_range(self, sketch, level, since, until, raw):
+        """Fusionar los tramos completos del nivel y resolver los bordes con el nivel más fino"""
+        if until <= since:
+            return
+        if level < 0:
+            # Bordes más cortos que el tramo más fino: muestras crudas
+            sketch.extend(raw(since, until))
+            return
+        seconds, slice_starts, slices = self._levels[level]
+        first_full = math.ceil(since / seconds) * seconds
+        last_full = math.floor(until / seconds) * seconds
+        if last_full <= first_full:
+            self._merge_range(sketch, level - 1, since, until, raw)
+            return
+        index = bisect.bisect_left(slice_starts, first_full)
+        while index < len(slices) and slice_starts[index] < last_full:
+            sketch.merge(slices[index])
+            index += 1
+        self._merge_range(sketch, level - 1, since, first_full, raw)
+        self._merge_range(sketch, level - 1, last_full, until, raw)
+
+    def quantile(self, quantile, since, until, raw):
+        """Cuantil de [since, until): tramos gruesos, luego finos en los bordes y crudos en los extremos"""
+        sketch = DDSketch()
+        self._merge_range(sketch, len(self._levels) - 1, since, until, raw)
+        return sketch.quantile(quantile)
+
+class RangeIndex:
+    """Índices por métrica (LRU acotado) y resultados memoizados de buckets cerrados"""
+
+    def __init__(self, max_indexed=QUERY_MAX_INDEXED, cache_size=QUERY_CACHE_SIZE,
+                 sketch_seconds=QUERY_SKETCH_SECONDS):
+        self.max_indexed = max(1, max_indexed)
+        self.cache_size = cache_size
+        self.sketch_seconds = sketch_seconds
+        self._indexes = OrderedDict()  # columna -> SeriesIndex
+        self._memo = OrderedDict()  # (columna, fn, inicio, fin) -> valor
+        self.hits = 0
+        self.misses = 0
+
+    def memory_bytes(self):
+        """Memoria de los arrays de los índices construidos"""
+        return sum(array.nbytes for index in self._indexes.values()
+                   for array in (index._sum, index._valid, index._increase, index._min, index._max))
+
+    def reset(self):
+        """Descartar índices y resultados (p. ej. tras recargar el historial)"""
+        self._indexes.clear()
+        self._memo.clear()
+
+    def add(self, timestamp, vector, oldest):
+        """Actualizar los índices existentes con la muestra recién añadida al buffer"""
+        for column, index in self._indexes.items():
+            index.add(timestamp, float(vector[column]), oldest)
+
+    def index(self, column, capacity, build):
+        """Índice de una columna; se construye con `build(index)` la primera vez que se consulta"""
+        index = self._indexes.get(column)
+        if index is not None:
+            self._indexes.move_to_end(column)
+            return index
+        if len(self._indexes) >= self.max_indexed:
+            evicted, _ = self._indexes.popitem(last=False)
+            for key in [key for key in self._memo if key[0] == evicted]:
+                del self._memo[key]
+        index = SeriesIndex(capacity, self.sketch_seconds)
+        build(index)
+        self._indexes[column] = index
+        return index
+
+    def memoized(self, key, closed, compute):
+        """Resultado de un bucket; solo se memoizan los cerrados (ya no pueden recibir muestras)"""
+        if key in self._memo:
+            self._memo.move_to_end(key)
+            self.hits += 1
+            return self._memo[key]
+        self.misses += 1
+        value = compute()
+        if closed and self.cache_size:
+            self._memo[key] = value
+            if len(self._memo) > self.cache_size:
+                self._memo.popitem(last=False)
+        return value
@@ -0,0 +1,37 @@
+"""
+GET condicional para endpoints de métricas: ETag por muestra y caché hasta la próxima
+"""
+
+import time
+
+def snapshot_etag(snapshot):
+    """Etiqueta opaca de un snapshot: secuencia e instante de muestreo (no se repite tras reiniciar)"""
+    return f"{snapshot.seq}-{int(snapshot.timestamp * 1000):x}"
+
+def is_not_modified(snapshot, if_none_match):
+    """Indica si el cliente ya tiene este snapshot (ignora el sufijo ':gzip' de Flask-Compress)"""
+    if not snapshot.seq or not if_none_match:
+        return False
+    if if_none_match.star_tag:
+        return True
+    tag = snapshot_etag(snapshot)
+    return any(value.split(':')[0] == tag for value in if_none_match.as_set(include_weak=True))
+
+def cache_seconds(snapshot, interval, now=None):
+    """Segundos enteros que faltan para la próxima muestra (0: no cachear)"""
+    if not snapshot.seq or not interval:
+        return 0
+    now = time.time() if now is None else now
+    return max(0, int(snapshot.timestamp + interval - now))
+
+def apply_cache_headers(response, snapshot, interval, encoding=None):
+    """ETag del snapshot (por codificación) y Cache-Control alineado con la cadencia del sampler"""
+    if snapshot.seq:
+        tag = snapshot_etag(snapshot)
+        response.set_etag(f"{tag}:{encoding}" if encoding and encoding != 'identity' else tag)
+    # El ETag depende de la codificación: el 304 también debe declarar Vary
+    response.vary.add('Accept-Encoding')
+    seconds = cache_seconds(snapshot, interval)
+    # s-maxage permite que el proxy cachee respuestas a requests autenticadas
+    response.headers['Cache-Control'] = f"max-age={seconds}, s-maxage={seconds}" if seconds else 'no-cache'
+    return response
@@ -0,0 +1,111 @@
+"""
+Codificación delta de snapshots: keyframes periódicos y solo campos modificados
+"""
+
+import copy
+import os
+
+def parse_epsilons(spec):
+    """Interpretar 'campo:epsilon,...' (el campo es el nombre final de la ruta)"""
+    epsilons = {}
+    for item in spec.split(','):
+        item = item.strip()
+        if item:
+            name, value = item.split(':')
+            epsilons[name.strip()] = float(value)
+    return epsilons
+
+# Configuración desde variables de entorno
+DELTA_KEYFRAME_INTERVAL = int(os.getenv('DELTA_KEYFRAME_INTERVAL', 30))  # Muestras entre keyframes
+DELTA_EPSILONS = parse_epsilons(os.getenv(
+    'DELTA_EPSILONS',
+    'usage:0.1,user:0.1,system:0.1,iowait:0.1,steal:0.1,per_core:0.5,'
+    'used:1048576,free:1048576,sent_mb:0.01,received_mb:0.01'
+))
+
+# Campos que no viajan en los deltas (el envoltorio ya lleva el timestamp del snapshot)
+DELTA_IGNORED_FIELDS = frozenset(['timestamp'])
+
+def _changed(old, new, epsilon):
+    """Comparar un valor hoja con tolerancia numérica"""
+    if isinstance(new, bool) or isinstance(old, bool):
+        return old != new
+    if isinstance(new, (int, float)) and isinstance(old, (int, float)):
+        return abs(new - old) > epsilon
+    if isinstance(new, list) and isinstance(old, list):
+        return len(new) != len(old) or any(_changed(a, b, epsilon) for a, b in zip(old, new))
+    return old != new
+
+def _diff(reference, current, epsilons):
+    """Calcular un merge patch (RFC 7386) y actualizar la referencia a lo enviado"""
+    patch = {}
+    for key, value in current.items():
+        if key in DELTA_IGNORED_FIELDS:
+            continue
+        old = reference.get(key)
+        if isinstance(value, dict) and isinstance(old, dict):
+            sub_patch = _diff(old, value, epsilons)
+            if sub_patch:
+                patch[key] = sub_patch
+        elif key not in reference or _changed(old, value, epsilons.get(key, 0.0)):
+            patch[key] = copy.deepcopy(value)
+            reference[key] = copy.deepcopy(value)
+
+    for key in [key for key in reference if key not in current]:
+        # Campo eliminado (p. ej. desaparece un 'error'): null en el merge patch
+        patch[key] = None
+        del reference[key]
+    return patch
+
+def apply_delta(state, patch):
+    """Aplicar un merge patch sobre el estado del cliente (in situ)"""
+    for key, value in patch.items():
+        if value is None:
+            state.pop(key, None)
+        elif isinstance(value, dict) and isinstance(state.get(key), dict):
+            apply_delta(state[key], value)
+        else:
+            state[key] = copy.deepcopy(value)
+    return state
+
+def merge_patches(first, second):
+    """Componer dos merge patches consecutivos en uno solo"""
+    merged = copy.deepcopy(first)
+    for key, value in second.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_patches(merged[key], value)
+        else:
+            merged[key] = copy.deepcopy(value)
+    return merged
+
+class DeltaEncoder:
+    """Genera keyframes periódicos y deltas respecto al último estado enviado"""
+
+    def __init__(self, keyframe_interval=DELTA_KEYFRAME_INTERVAL, epsilons=None):
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.epsilons = DELTA_EPSILONS if epsilons is None else epsilons
+        self._reference = None
+        self._last_seq = None
+        self._since_keyframe = 0
+
+    def encode(self, seq, timestamp, payload):
+        """Codificar una muestra: devuelve (keyframe, delta, es_keyframe_periódico)"""
+        # El delta se calcula siempre (salvo en la primera muestra) para poder
+        # componer cadenas; en los keyframes periódicos el stream envía el keyframe
+        keyframe = {'type': 'keyframe', 'seq': seq, 'timestamp': timestamp, 'data': payload}
+
+        delta = None
+        if self._reference is not None:
+            changes = _diff(self._reference, payload, self.epsilons)
+            delta = {'type': 'delta', 'seq': seq, 'base': self._last_seq,
+                     'timestamp': timestamp, 'changes': changes}
+        self._last_seq = seq
+
+        self._since_keyframe += 1
+        is_keyframe = delta is None or self._since_keyframe >= self.keyframe_interval
+        if is_keyframe:
+            # Keyframe periódico: la referencia vuelve a ser el estado exacto
+            self._reference = {key: copy.deepcopy(value) for key, value in payload.items()
+                               if key not in DELTA_IGNORED_FIELDS}
+            self._since_keyframe = 0
+        return keyframe, delta, is_keyframe
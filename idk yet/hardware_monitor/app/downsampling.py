@@ -0,0 +1,64 @@
+"""
+Reducción de puntos para gráficas (Largest-Triangle-Three-Buckets)
+"""
+
+import numpy as np
+
+def lttb_indices(x, y, threshold):
+    """Índices de los puntos elegidos por LTTB (conserva picos a diferencia de promediar)"""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # threshold - 2 buckets para los puntos interiores (el primero y el último se conservan)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    starts = edges[:-1]
+    sizes = np.diff(edges)
+
+    # Promedio de cada bucket en bloque (una sola pasada sobre los arrays)
+    avg_x = np.add.reduceat(x[:n - 1], starts) / sizes
+    avg_y = np.add.reduceat(y[:n - 1], starts) / sizes
+    # El "siguiente bucket" del último bucket es el último punto
+    next_x = np.append(avg_x[1:], x[-1]).tolist()
+    next_y = np.append(avg_y[1:], y[-1]).tolist()
+    bounds = edges.tolist()
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = bounds[i], bounds[i + 1]
+        ax, ay = float(x[a]), float(y[a])
+        # Área (duplicada) del triángulo con el punto anterior y la media siguiente,
+        # expresada como forma lineal p*y + q*x + r para evaluarla en bloque
+        p = ax - next_x[i]
+        q = next_y[i] - ay
+        area = y[lo:hi] * p
+        area += x[lo:hi] * q
+        area -= p * ay + q * ax
+        np.abs(area, out=area)
+        a = lo + int(area.argmax())
+        selected[i + 1] = a
+    return selected
+
+def downsample(result, points):
+    """Reducir un resultado de historial a `points` puntos con LTTB"""
+    ts = result['ts']
+    values = result['avg']
+    if not points or len(ts) <= points:
+        return result
+
+    # Los huecos (NaN) no participan en la selección
+    valid = ~np.isnan(values)
+    if not valid.all():
+        result = {key: (value[valid] if isinstance(value, np.ndarray) else value)
+                  for key, value in result.items()}
+        ts, values = result['ts'], result['avg']
+
+    indices = lttb_indices(ts, values, points)
+    return {key: (value[indices] if isinstance(value, np.ndarray) else value)
+            for key, value in result.items()}
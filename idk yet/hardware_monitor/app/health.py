@@ -0,0 +1,145 @@
+"""
+Health checks por niveles: baratos desde el snapshot y caros cacheados en segundo plano
+"""
+
+import logging
+import os
+import threading
+import time
+
+import psutil
+
+from app.supervisor import CollectorSupervisor, CollectorUnavailable, collector_supervisor
+from app.logpipeline import log_pipeline
+
+# Configuración desde variables de entorno
+HEALTH_CHECK_INTERVAL = int(os.getenv('HEALTH_CHECK_INTERVAL', 30))  # Segundos entre refrescos caros
+HEALTH_CHECK_TIMEOUT = int(os.getenv('HEALTH_CHECK_TIMEOUT', 5))  # Plazo de cada check caro
+HEALTH_THRESHOLD = 90  # Porcentaje de uso a partir del cual el estado es 'degraded'
+
+def process_check():
+    """Recursos del propio proceso (recorre /proc/self/fd y las tablas de sockets)"""
+    process = health_monitor.process
+    with process.oneshot():
+        return {
+            'memory_mb': round(process.memory_info().rss / 1024 / 1024, 2),
+            # Sin intervalo: % desde el refresco anterior, nunca bloquea
+            'cpu_percent': round(process.cpu_percent(), 1),
+            'threads': process.num_threads(),
+            'open_files': len(process.open_files()),
+            'connections': len(process.connections())
+        }
+
+class HealthMonitor:
+    """Evalúa los checks caros cada `interval` segundos; las sondas solo leen la caché"""
+
+    def __init__(self, interval=HEALTH_CHECK_INTERVAL, timeout=HEALTH_CHECK_TIMEOUT, checks=None):
+        self.interval = max(1, interval)
+        self.checks = checks if checks is not None else {'application': process_check}
+        # Un check colgado o fallido sirve su último resultado y entra en cuarentena
+        self.supervisor = CollectorSupervisor(deadline_ms=timeout * 1000, backoff_base=self.interval,
+                                              backoff_max=self.interval * 10)
+        self.boot_time = psutil.boot_time()
+        self._results = {}
+        self._checked_at = None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._process = None
+
+    @property
+    def process(self):
+        """psutil.Process de este proceso (se recrea tras un fork)"""
+        if self._process is None or self._process.pid != os.getpid():
+            self._process = psutil.Process()
+        return self._process
+
+    def refresh(self):
+        """Ejecutar los checks caros y cachear sus resultados"""
+        results = {}
+        for name, check in self.checks.items():
+            try:
+                value, age = self.supervisor.call(name, check)
+            except CollectorUnavailable as e:
+                results[name] = {'ok': False, 'error': str(e)}
+                continue
+            results[name] = dict(value, ok=True)
+            if age is not None:
+                results[name].update({'stale': True, 'age_seconds': age})
+        with self._lock:
+            self._results = results
+            self._checked_at = time.time()
+
+    def start(self):
+        """Primer refresco síncrono e hilo de fondo (idempotente y seguro tras fork)"""
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        self._pid = os.getpid()
+        self._stop_event.clear()
+        self.refresh()
+        self._thread = threading.Thread(target=self._run, name='health-checks', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Detener el hilo de fondo"""
+        self._stop_event.set()
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                logging.error(f"Error refrescando health checks: {e}")
+
+    def cached(self):
+        """Resultados de los checks caros y su antigüedad en segundos"""
+        self.start()
+        with self._lock:
+            return self._results, round(time.time() - self._checked_at, 1)
+
+    def report(self, snapshot):
+        """Informe completo: checks baratos del snapshot actual más los caros cacheados"""
+        cpu_percent = snapshot.cpu.get('usage', -1)
+        memory_percent = snapshot.ram.get('usage', -1)
+        disk_percent = snapshot.disk.get('usage', -1)
+        net_io = snapshot.network
+        expensive, age = self.cached()
+        application = expensive.get('application', {})
+
+        report = {
+            'seq': snapshot.seq,
+            'system': {
+                'cpu_usage': cpu_percent,
+                'memory_usage': memory_percent,
+                'disk_usage': disk_percent,
+                'uptime_seconds': time.time() - self.boot_time
+            },
+            'application': {key: value for key, value in application.items() if key != 'ok'},
+            'network': {
+                'bytes_sent_mb': net_io.get('sent_mb', -1),
+                'bytes_recv_mb': net_io.get('received_mb', -1),
+                'packets_sent': net_io.get('packets_sent', 0),
+                'packets_recv': net_io.get('packets_recv', 0)
+            },
+            'checks': {
+                'cpu_ok': 0 <= cpu_percent < HEALTH_THRESHOLD,
+                'memory_ok': 0 <= memory_percent < HEALTH_THRESHOLD,
+                'disk_ok': 0 <= disk_percent < HEALTH_THRESHOLD,
+                'process_ok': application.get('ok', False)
+            },
+            'checks_age_seconds': age,
+            # Plazos y cuarentenas de los recolectores (en el proceso que muestrea)
+            'collectors': collector_supervisor.status(),
+            'stale': sorted(name for name in ('cpu', 'ram', 'disk', 'network')
+                            if getattr(snapshot, name).get('stale')),
+            # Cola de logging: registros pendientes y descartados por nivel
+            'logging': log_pipeline.stats()
+        }
+        if disk_percent == -1:
+            report['system']['disk_error'] = 'No se pudo obtener el uso de disco.'
+        report['status'] = 'healthy' if all(report['checks'].values()) else 'degraded'
+        return report
+
+# Instancia global para uso en la aplicación
+health_monitor = HealthMonitor()
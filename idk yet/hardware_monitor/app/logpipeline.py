@@ -0,0 +1,297 @@
+"""
+Logging asíncrono: cola acotada, escritor en segundo plano por lotes y segmentos rotados y comprimidos
+"""
+
+import atexit
+import gzip
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import threading
+from collections import Counter
+
+try:
+    import fcntl
+except ImportError:  # Sin flock (Windows) el único proceso que escribe es el dueño de la rotación
+    fcntl = None
+
+# Configuración desde variables de entorno
+LOG_MAX_SIZE = int(os.getenv('LOG_MAX_SIZE', 10 * 1024 * 1024))  # Bytes por segmento antes de rotar
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 5))  # Segmentos rotados conservados
+LOG_COMPRESS = os.getenv('LOG_COMPRESS', 'true').lower() == 'true'  # gzip de los segmentos rotados
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))  # Registros en cola antes de descartar
+LOG_DROP_LEVEL = os.getenv('LOG_DROP_LEVEL', 'WARNING').upper()  # Con la cola llena se descarta lo inferior
+LOG_BATCH_MAX = int(os.getenv('LOG_BATCH_MAX', 512))  # Registros por escritura
+LOG_ACCESS_SAMPLE = float(os.getenv('LOG_ACCESS_SAMPLE', 1.0))  # Fracción de requests con línea de acceso
+LOG_ROTATE_CHECK = float(os.getenv('LOG_ROTATE_CHECK', 1.0))  # Segundos entre comprobaciones de tamaño sin registros
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s'
+
+def _gzip_file(source, dest):
+    """Comprimir un segmento rotado (en el hilo escritor, nunca en un request)"""
+    with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+class BatchRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """RotatingFileHandler que escribe un lote de registros con una sola escritura y un solo flush
+
+    Varios procesos (workers de Gunicorn) pueden escribir en el mismo fichero, pero solo rota el que
+    tiene el flock de `<fichero>.lock` (el master con --preload); el resto se comporta como un
+    WatchedFileHandler y reabre el fichero cuando el dueño lo rota.
+    """
+
+    def __init__(self, filename, max_bytes=LOG_MAX_SIZE, backup_count=LOG_BACKUP_COUNT, compress=LOG_COMPRESS):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True)
+        self.compress = compress
+        self._lock_file = None
+        self._owner_pid = os.getpid() if self._acquire_rotation() else None
+
+    def _acquire_rotation(self):
+        """Intentar ser el único proceso que rota este fichero"""
+        if fcntl is None:
+            return True
+        lock_file = open(self.baseFilename + '.lock', 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    @property
+    def owns_rotation(self):
+        """Solo el proceso que tomó el lock (no sus hijos tras fork) rota"""
+        return self._owner_pid == os.getpid()
+
+    def _backup_name(self, index):
+        # El segmento .1 queda sin comprimir: otros procesos pueden estar terminando de escribir en él
+        if self.compress and index > 1:
+            return f"{self.baseFilename}.{index}.gz"
+        return f"{self.baseFilename}.{index}"
+
+    def doRollover(self):
+        """Desplazar los segmentos y comprimir el anterior una rotación más tarde (como delaycompress)"""
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        try:
+            if self.backupCount > 0:
+                for index in range(self.backupCount - 1, 0, -1):
+                    source, dest = self._backup_name(index), self._backup_name(index + 1)
+                    if not os.path.exists(source):
+                        continue
+                    if self.compress and index == 1:
+                        _gzip_file(source, dest)
+                    else:
+                        os.replace(source, dest)
+                if os.path.exists(self.baseFilename):
+                    os.replace(self.baseFilename, self._backup_name(1))
+        finally:
+            self.stream = self._open()
+
+    def _size(self):
+        """Tamaño en disco (tell() no ve lo que escriben los demás procesos)"""
+        try:
+            return os.stat(self.baseFilename).st_size
+        except FileNotFoundError:
+            return 0
+
+    def _reopen_if_rotated(self):
+        """Reabrir si el dueño movió el fichero (mismo criterio que WatchedFileHandler)"""
+        try:
+            current = os.stat(self.baseFilename)
+        except FileNotFoundError:
+            current = None
+        opened = os.fstat(self.stream.fileno())
+        if current is None or (current.st_dev, current.st_ino) != (opened.st_dev, opened.st_ino):
+            self.stream.close()
+            self.stream = self._open()
+
+    def maybe_rollover(self):
+        """Rotar por tamaño aunque este proceso no escriba (lo llama el hilo escritor en reposo)"""
+        if not (self.maxBytes and self.owns_rotation):
+            return
+        self.acquire()
+        try:
+            if self._size() >= self.maxBytes:
+                self.doRollover()
+        except Exception:
+            self.handleError(logging.makeLogRecord({'msg': f"No se pudo rotar {self.baseFilename}"}))
+        finally:
+            self.release()
+
+    def emit_batch(self, records):
+        chunks = []
+        for record in records:
+            try:
+                chunks.append(self.format(record) + self.terminator)
+            except Exception:
+                self.handleError(record)
+        if not chunks:
+            return
+        data = ''.join(chunks)
+        self.acquire()
+        try:
+            if self.stream is None:
+                self.stream = self._open()
+            if not self.owns_rotation:
+                self._reopen_if_rotated()
+            elif self.maxBytes:
+                # Rotar antes del lote que desbordaría el segmento (nunca se deja un segmento vacío)
+                size = self._size()
+                if size and size + len(data.encode('utf-8')) >= self.maxBytes:
+                    self.doRollover()
+            self.stream.write(data)
+            self.stream.flush()
+        except Exception:
+            self.handleError(records[-1])
+        finally:
+            self.release()
+
+    def close(self):
+        super().close()
+        if self._lock_file is not None and self.owns_rotation:
+            self._lock_file.close()
+            self._lock_file = None
+
+class LogPipeline:
+    """Cola de registros y un hilo que los escribe por lotes en los handlers de destino"""
+
+    def __init__(self, capacity=LOG_QUEUE_SIZE, drop_level=LOG_DROP_LEVEL, batch_max=LOG_BATCH_MAX):
+        self.capacity = max(1, capacity)
+        self.drop_level = logging.getLevelName(drop_level) if isinstance(drop_level, str) else drop_level
+        self.batch_max = max(1, batch_max)
+        self.handlers = []
+        self.dropped = Counter()  # Registros descartados por nivel
+        self.written = 0
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def enqueue(self, record):
+        """Encolar sin bloquear; con la cola llena se descarta lo de severidad baja"""
+        if self._pid != os.getpid():
+            self.start()
+        size = self._queue.qsize()
+        # Lo importante puede ocupar una reserva de otra `capacity`; más allá también se descarta
+        if size >= self.capacity and (record.levelno < self.drop_level or size >= 2 * self.capacity):
+            self.dropped[record.levelname] += 1
+            return
+        self._queue.put(record)
+
+    def start(self):
+        """Iniciar el hilo escritor de este proceso (idempotente y seguro tras fork)"""
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            if self._pid is not None and self._pid != os.getpid():
+                # Los registros heredados del padre los escribe su propio hilo
+                self._queue = queue.SimpleQueue()
+                self.dropped = Counter()
+                self.written = 0
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                record = self._queue.get(timeout=LOG_ROTATE_CHECK)
+            except queue.Empty:
+                # Sin registros propios: el dueño de la rotación vigila lo que escriben los demás procesos
+                for handler in self.handlers:
+                    if hasattr(handler, 'maybe_rollover'):
+                        handler.maybe_rollover()
+                continue
+            batch = []
+            stop = False
+            while True:
+                if record is None:
+                    stop = True
+                    break
+                batch.append(record)
+                if len(batch) >= self.batch_max:
+                    break
+                try:
+                    record = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            self._write(batch)
+            if stop:
+                return
+
+    def _write(self, batch):
+        if not batch:
+            return
+        for handler in self.handlers:
+            if hasattr(handler, 'emit_batch'):
+                handler.emit_batch([record for record in batch if record.levelno >= handler.level])
+            else:
+                for record in batch:
+                    if record.levelno >= handler.level:
+                        handler.handle(record)
+        self.written += len(batch)
+
+    def stop(self, timeout=5):
+        """Escribir lo pendiente y detener el hilo escritor"""
+        thread = self._thread
+        if thread is not None and self._pid == os.getpid() and thread.is_alive():
+            self._queue.put(None)
+            thread.join(timeout)
+        for handler in self.handlers:
+            try:
+                handler.flush()
+            except (OSError, ValueError):
+                # Al salir, la consola puede estar ya cerrada
+                pass
+
+    def stats(self):
+        """Registros en cola, escritos y descartados por nivel"""
+        return {
+            'queued': self._queue.qsize(),
+            'written': self.written,
+            'dropped': dict(self.dropped)
+        }
+
+class PipelineHandler(logging.handlers.QueueHandler):
+    """Handler del logger raíz: prepara el registro en el hilo que loguea y lo entrega a la cola"""
+
+    def __init__(self, pipeline):
+        super().__init__(pipeline._queue)
+        self.pipeline = pipeline
+
+    def prepare(self, record):
+        # Congelar el mensaje (los args pueden cambiar después); la línea completa la formatea el escritor
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        self.pipeline.enqueue(record)
+
+def configure_logging(level='INFO', log_file=None, pipeline=None):
+    """Enrutar el logging raíz por la cola hacia el fichero rotado y la consola (idempotente)"""
+    pipeline = log_pipeline if pipeline is None else pipeline
+    root = logging.getLogger()
+    root.setLevel(level)
+    if any(isinstance(handler, PipelineHandler) and handler.pipeline is pipeline for handler in root.handlers):
+        return pipeline
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.insert(0, BatchRotatingFileHandler(log_file))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    pipeline.handlers = handlers
+    root.addHandler(PipelineHandler(pipeline))
+    pipeline.start()
+    atexit.register(pipeline.stop)
+    return pipeline
+
+# Instancia global para uso en la aplicación
+log_pipeline = LogPipeline()
@@ -0,0 +1,412 @@
+"""
+Logs de misión: buffer circular en memoria o SQLite WAL compartido entre workers con group commit
+"""
+
+import bisect
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import datetime
+
+# Configuración desde variables de entorno
+MISSION_LOG_CAPACITY = int(os.getenv('MISSION_LOG_CAPACITY', 1000))  # Entradas conservadas en memoria
+MISSION_LOG_PAGE_MAX = int(os.getenv('MISSION_LOG_PAGE_MAX', 200))  # Entradas máximas por página
+MISSION_LOG_DB = os.getenv('MISSION_LOG_DB', '')  # Vacío: solo en memoria (por worker)
+MISSION_LOG_FLUSH_MS = int(os.getenv('MISSION_LOG_FLUSH_MS', 5))  # Ventana de cada group commit
+MISSION_LOG_BATCH_MAX = int(os.getenv('MISSION_LOG_BATCH_MAX', 2000))  # Entradas máximas por commit
+MISSION_LOG_RETENTION_ROWS = int(os.getenv('MISSION_LOG_RETENTION_ROWS', 1_000_000))  # Filas en disco
+MISSION_LOG_BULK_BATCH = int(os.getenv('MISSION_LOG_BULK_BATCH', 500))  # Registros por lote en la ingesta bulk
+MISSION_LOG_MAX_LINE_BYTES = int(os.getenv('MISSION_LOG_MAX_LINE_BYTES', 64 * 1024))  # Tamaño máximo por línea
+MISSION_LOG_MAX_ERRORS = 100  # Errores por línea devueltos en la respuesta
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS mission_logs (
+        id INTEGER PRIMARY KEY,
+        ts REAL NOT NULL,
+        level TEXT NOT NULL,
+        message TEXT NOT NULL,
+        request_id TEXT
+    )""",
+    # Páginas por nivel a partir de un cursor y filtros por tiempo (y nivel)
+    "CREATE INDEX IF NOT EXISTS mission_logs_level ON mission_logs (level, id)",
+    "CREATE INDEX IF NOT EXISTS mission_logs_ts ON mission_logs (ts, level)",
+)
+
+class _LevelIndex:
+    """Cursores de un nivel (y sus instantes) en orden creciente; descarta por la cabeza en O(1) amortizado"""
+
+    def __init__(self):
+        self.cursors = []
+        self.times = []  # Instante de cada cursor, para bisect sin `key=` (Python 3.9)
+        self.head = 0
+
+    def __len__(self):
+        return len(self.cursors) - self.head
+
+    def append(self, cursor, timestamp):
+        self.cursors.append(cursor)
+        self.times.append(timestamp)
+
+    def popleft(self):
+        self.head += 1
+        # Compactar cuando la mitad de la lista ya está descartada
+        if self.head > 64 and self.head * 2 > len(self.cursors):
+            del self.cursors[:self.head]
+            del self.times[:self.head]
+            self.head = 0
+
+class MissionLogStore:
+    """Logs de misión en un buffer circular; escrituras O(1) y lecturas O(página)"""
+
+    def __init__(self, capacity=MISSION_LOG_CAPACITY):
+        self.capacity = max(1, capacity)
+        self._entries = [None] * self.capacity  # Entrada del cursor c en la posición c % capacity
+        self._times = [0.0] * self.capacity  # Instante unix de cada entrada (índice por tiempo)
+        self._levels = {}  # nivel -> _LevelIndex
+        self._next = 1  # Cursor de la próxima entrada (0 = antes de la primera)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._next - self._oldest()
+
+    def _oldest(self):
+        """Cursor de la entrada más antigua conservada"""
+        return max(1, self._next - self.capacity)
+
+    def append(self, level, message, request_id=None, timestamp=None):
+        """Añadir una entrada y devolverla con su cursor"""
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            return self._append(level.upper(), message, request_id, timestamp)
+
+    def extend(self, records):
+        """Añadir un lote de (nivel, mensaje, request_id) con un único lock"""
+        timestamp = time.time()
+        with self._lock:
+            for level, message, request_id in records:
+                self._append(level.upper(), message, request_id, timestamp)
+
+    def _append(self, level, message, request_id, timestamp):
+        """Escribir la entrada siguiente (con el lock tomado)"""
+        cursor = self._next
+        position = cursor % self.capacity
+        evicted = self._entries[position]
+        if evicted is not None:
+            # La entrada sobrescrita es la más antigua de su nivel
+            index = self._levels[evicted['level']]
+            index.popleft()
+            if not index:
+                del self._levels[evicted['level']]
+        entry = {
+            'cursor': cursor,
+            'timestamp': datetime.fromtimestamp(timestamp).isoformat(),
+            'level': level,
+            'message': message,
+            'request_id': request_id
+        }
+        self._entries[position] = entry
+        self._times[position] = timestamp
+        self._levels.setdefault(level, _LevelIndex()).append(cursor, timestamp)
+        self._next = cursor + 1
+        return entry
+
+    def _first_since(self, start, since):
+        """Primer cursor desde `start` con instante >= since (el tiempo crece con el cursor)"""
+        first = start % self.capacity
+        # Los cursores [start, _next) ocupan uno o dos tramos contiguos del buffer circular
+        split = min(self._next, start + self.capacity - first)
+        position = bisect.bisect_left(self._times, since, first, first + split - start)
+        if position < first + split - start or split == self._next:
+            return start + position - first
+        return split + bisect.bisect_left(self._times, since, 0, self._next - split)
+
+    def page(self, after=0, level=None, since=None, limit=50):
+        """Entradas posteriores al cursor `after` (filtradas por nivel y tiempo) y cursor siguiente"""
+        limit = max(1, limit)
+        with self._lock:
+            start = max(after + 1, self._oldest())
+            if level is None:
+                # Los cursores conservados son contiguos: la página es un rango
+                cursors = range(start, self._next)
+                lo = 0 if since is None else self._first_since(start, since) - start
+            else:
+                index = self._levels.get(level.upper())
+                if index is None:
+                    return [], after, False
+                cursors = index.cursors
+                lo = bisect.bisect_left(cursors, start, index.head)
+                if since is not None:
+                    # Las entradas se añaden en orden de llegada: el tiempo también es creciente
+                    lo = bisect.bisect_left(index.times, since, lo)
+            selected = cursors[lo:lo + limit]
+            entries = [self._entries[cursor % self.capacity] for cursor in selected]
+            has_more = lo + limit < len(cursors)
+        next_cursor = entries[-1]['cursor'] if entries else max(after, start - 1)
+        return entries, next_cursor, has_more
+
+def iter_ndjson(stream, max_line=MISSION_LOG_MAX_LINE_BYTES):
+    """Recorrer un cuerpo NDJSON línea a línea sin cargarlo entero: (línea, objeto, error)"""
+    number = 0
+    while True:
+        line = stream.readline(max_line + 1)
+        if not line:
+            return
+        number += 1
+        if len(line) > max_line and not line.endswith(b'\n'):
+            # Descartar el resto de la línea en trozos acotados
+            while line and not line.endswith(b'\n'):
+                line = stream.readline(max_line)
+            yield number, None, f"línea de más de {max_line} bytes"
+            continue
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield number, json.loads(line), None
+        except ValueError as e:
+            yield number, None, f"JSON inválido: {e}"
+
+def parse_record(record, request_id=None):
+    """Validar un registro de log y devolver (nivel, mensaje, request_id); ValueError si no es válido"""
+    if not isinstance(record, dict):
+        raise ValueError("se espera un objeto JSON")
+    message = record.get('message')
+    if not isinstance(message, str) or not message.strip():
+        raise ValueError("'message' es obligatorio")
+    level = record.get('level', 'INFO')
+    if not isinstance(level, str) or not level.strip():
+        raise ValueError("'level' debe ser un texto no vacío")
+    return level.strip().upper(), message, request_id
+
+def ingest_ndjson(store, stream, request_id=None, batch_size=MISSION_LOG_BULK_BATCH,
+                  max_line=MISSION_LOG_MAX_LINE_BYTES):
+    """Insertar los registros válidos de un cuerpo NDJSON en lotes; los inválidos se reportan por línea"""
+    accepted = rejected = 0
+    errors = []
+    batch = []
+
+    def reject(number, error):
+        nonlocal rejected
+        rejected += 1
+        if len(errors) < MISSION_LOG_MAX_ERRORS:
+            errors.append({'line': number, 'error': error})
+
+    number = 0
+    try:
+        for number, record, error in iter_ndjson(stream, max_line):
+            if error is None:
+                try:
+                    batch.append(parse_record(record, request_id))
+                except ValueError as e:
+                    error = str(e)
+            if error is not None:
+                reject(number, error)
+                continue
+            if len(batch) >= batch_size:
+                store.extend(batch)
+                accepted += len(batch)
+                batch = []
+    except (OSError, EOFError, zlib.error) as e:
+        # Cuerpo gzip truncado o corrupto: se conserva lo ya leído
+        reject(number + 1, f"cuerpo ilegible: {e}")
+    if batch:
+        store.extend(batch)
+        accepted += len(batch)
+    return {
+        'accepted': accepted,
+        'rejected': rejected,
+        'errors': errors,
+        'errors_truncated': rejected > len(errors)
+    }
+
+def _row_entry(row):
+    """Fila de SQLite con el mismo formato que las entradas en memoria"""
+    cursor, timestamp, level, message, request_id = row
+    return {
+        'cursor': cursor,
+        'timestamp': datetime.fromtimestamp(timestamp).isoformat(),
+        'level': level,
+        'message': message,
+        'request_id': request_id
+    }
+
+class SQLiteMissionLog:
+    """Logs de misión en SQLite (WAL): un hilo escritor por proceso agrupa inserts en cada commit"""
+
+    def __init__(self, path=MISSION_LOG_DB, flush_ms=MISSION_LOG_FLUSH_MS, batch_max=MISSION_LOG_BATCH_MAX,
+                 retention_rows=MISSION_LOG_RETENTION_ROWS):
+        self.path = path
+        self.flush_interval = max(0, flush_ms) / 1000
+        self.batch_max = max(1, batch_max)
+        self.retention_rows = retention_rows
+        self.commits = 0
+        self.written = 0
+        self._queue = queue.Queue()
+        self._readers = threading.local()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._initialized = False
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        # En WAL, NORMAL solo sincroniza en los checkpoints: un fallo del proceso no pierde commits
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    def _reader(self):
+        """Conexión de lectura del hilo actual (se recrea tras un fork)"""
+        connection = getattr(self._readers, 'connection', None)
+        if connection is None or self._readers.pid != os.getpid():
+            self._ensure_schema()
+            connection = self._connect()
+            self._readers.connection = connection
+            self._readers.pid = os.getpid()
+        return connection
+
+    def _ensure_schema(self):
+        if self._initialized:
+            return
+        with self._lock:
+            if not self._initialized:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                connection = self._connect()
+                try:
+                    for statement in SCHEMA:
+                        connection.execute(statement)
+                finally:
+                    connection.close()
+                self._initialized = True
+
+    def start(self):
+        """Iniciar el hilo escritor de este proceso (idempotente y seguro tras fork)"""
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                # La cola heredada del padre pertenece a su escritor
+                self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='mission-log-writer', daemon=True)
+            self._thread.start()
+
+    def append(self, level, message, request_id=None, timestamp=None):
+        """Encolar una entrada sin esperar al disco; su cursor (id de la fila) se asigna en el commit"""
+        timestamp = time.time() if timestamp is None else timestamp
+        level = level.upper()
+        self.start()
+        self._queue.put([(timestamp, level, message, request_id)])
+        return {
+            'cursor': None,
+            'timestamp': datetime.fromtimestamp(timestamp).isoformat(),
+            'level': level,
+            'message': message,
+            'request_id': request_id
+        }
+
+    def extend(self, records):
+        """Encolar un lote de (nivel, mensaje, request_id); se confirma en una sola transacción"""
+        timestamp = time.time()
+        self.start()
+        self._queue.put([(timestamp, level.upper(), message, request_id) for level, message, request_id in records])
+
+    def _run(self):
+        self._ensure_schema()
+        connection = self._connect()
+        stop = False
+        try:
+            while not stop:
+                batch, items = [], 0
+                # Group commit: lo que llegue durante la ventana viaja en la misma transacción
+                item = self._queue.get()
+                deadline = time.monotonic() + self.flush_interval
+                while True:
+                    if item is None:
+                        # Centinela de close(): confirmar el lote y terminar
+                        self._queue.task_done()
+                        stop = True
+                        break
+                    batch.extend(item)
+                    items += 1
+                    if len(batch) >= self.batch_max:
+                        break
+                    try:
+                        item = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                if not batch:
+                    continue
+                try:
+                    self._commit(connection, batch)
+                except sqlite3.Error as e:
+                    logging.error(f"Error guardando {len(batch)} logs de misión: {e}")
+                finally:
+                    for _ in range(items):
+                        self._queue.task_done()
+        finally:
+            connection.close()
+
+    def _commit(self, connection, batch):
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany(
+                'INSERT INTO mission_logs (ts, level, message, request_id) VALUES (?, ?, ?, ?)', batch)
+            if self.retention_rows:
+                # Los ids son contiguos: la retención borra un prefijo por clave primaria
+                connection.execute('DELETE FROM mission_logs WHERE id <= (SELECT max(id) FROM mission_logs) - ?',
+                                   (self.retention_rows,))
+            connection.execute('COMMIT')
+        except sqlite3.Error:
+            connection.execute('ROLLBACK')
+            raise
+        self.commits += 1
+        self.written += len(batch)
+
+    def flush(self, timeout=10):
+        """Esperar a que se confirmen las entradas encoladas por este proceso"""
+        deadline = time.monotonic() + timeout
+        while (self._queue.unfinished_tasks and self._thread is not None and self._thread.is_alive()
+               and time.monotonic() < deadline):
+            time.sleep(self.flush_interval or 0.001)
+
+    def close(self):
+        """Confirmar lo pendiente y detener el hilo escritor"""
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=10)
+        self._thread = None
+
+    def __len__(self):
+        # Sin huecos en los ids: el total sale de la clave primaria sin recorrer la tabla
+        low, high = self._reader().execute('SELECT min(id), max(id) FROM mission_logs').fetchone()
+        return 0 if high is None else high - low + 1
+
+    def page(self, after=0, level=None, since=None, limit=50):
+        """Entradas confirmadas posteriores al cursor `after` (filtradas por nivel y tiempo)"""
+        limit = max(1, limit)
+        conditions, params = ['id > ?'], [after]
+        if level is not None:
+            conditions.append('level = ?')
+            params.append(level.upper())
+        if since is not None:
+            conditions.append('ts >= ?')
+            params.append(since)
+        rows = self._reader().execute(
+            f"SELECT id, ts, level, message, request_id FROM mission_logs "
+            f"WHERE {' AND '.join(conditions)} ORDER BY id LIMIT ?", params + [limit + 1]).fetchall()
+        entries = [_row_entry(row) for row in rows[:limit]]
+        next_cursor = entries[-1]['cursor'] if entries else after
+        return entries, next_cursor, len(rows) > limit
+
+# Instancia global para uso en la aplicación
+mission_logs = SQLiteMissionLog() if MISSION_LOG_DB else MissionLogStore()
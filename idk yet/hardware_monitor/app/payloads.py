@@ -0,0 +1,98 @@
+"""
+Cuerpos JSON serializados una vez por muestra con variantes gzip y brotli comprimidas una sola vez
+"""
+
+import gzip
+import json
+import os
+import threading
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional (lo instala flask-compress)
+    brotli = None
+
+# Configuración desde variables de entorno (se comprime una vez por muestra: niveles altos)
+STATS_GZIP_LEVEL = int(os.getenv('STATS_GZIP_LEVEL', 9))
+STATS_BROTLI_QUALITY = int(os.getenv('STATS_BROTLI_QUALITY', 9))
+
+# Preferencia de codificación: la variante más pequeña primero
+ENCODING_PREFERENCE = ('br', 'gzip')
+
+def render_stats(snapshot):
+    """Cuerpo de /api/stats de un snapshot (sin campos por request)"""
+    return json.dumps({
+        'cpu': snapshot.cpu,
+        'ram': snapshot.ram,
+        'disk': snapshot.disk,
+        'network': snapshot.network,
+        'seq': snapshot.seq,
+        'sampled_at': snapshot.timestamp,
+        'missing': [name for name in ('cpu', 'ram', 'disk', 'network')
+                    if getattr(snapshot, name).get('missing')],
+        'success': True
+    }, separators=(',', ':')).encode()
+
+class EncodedPayload:
+    """Cuerpo de un snapshot en identity, gzip y (si está disponible) br, comprimido al pedirse"""
+
+    def __init__(self, snapshot, body, gzip_level=STATS_GZIP_LEVEL, brotli_quality=STATS_BROTLI_QUALITY):
+        self.snapshot = snapshot
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.encodings = tuple(encoding for encoding in ENCODING_PREFERENCE if encoding != 'br' or brotli)
+        self.variants = {'identity': body}
+        self._lock = threading.Lock()
+
+    def encode(self, encoding):
+        """Variante en `encoding` (se comprime solo la primera vez que se pide)"""
+        body = self.variants.get(encoding)
+        if body is not None:
+            return body
+        with self._lock:
+            body = self.variants.get(encoding)
+            if body is None:
+                identity = self.variants['identity']
+                if encoding == 'gzip':
+                    body = gzip.compress(identity, self.gzip_level, mtime=0)
+                else:
+                    body = brotli.compress(identity, quality=self.brotli_quality)
+                self.variants[encoding] = body
+            return body
+
+    def precompress(self):
+        """Comprimir todas las variantes de antemano (desde el sampler, fuera de los requests)"""
+        for encoding in self.encodings:
+            self.encode(encoding)
+
+    def negotiate(self, accept_encodings):
+        """(codificación, bytes) de la mejor variante que acepta el cliente"""
+        for encoding in self.encodings:
+            if accept_encodings[encoding] > 0:
+                return encoding, self.encode(encoding)
+        return 'identity', self.variants['identity']
+
+class PayloadCache:
+    """Memoiza las variantes del último snapshot: N clientes, una sola serialización"""
+
+    def __init__(self, render=render_stats):
+        self.render = render
+        self._payload = None
+        self._lock = threading.Lock()
+
+    def for_snapshot(self, snapshot):
+        """Variantes del snapshot (se codifican solo la primera vez)"""
+        payload = self._payload
+        if payload is not None and payload.snapshot is snapshot:
+            return payload
+        with self._lock:
+            if self._payload is None or self._payload.snapshot is not snapshot:
+                self._payload = EncodedPayload(snapshot, self.render(snapshot))
+            return self._payload
+
+    def publish(self, snapshot):
+        """Codificar y comprimir cada snapshot al publicarse (callback del sampler en segundo plano)"""
+        self.for_snapshot(snapshot).precompress()
+
+# Instancia global para uso en la aplicación
+stats_payload = PayloadCache()
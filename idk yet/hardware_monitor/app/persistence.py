@@ -0,0 +1,302 @@
+"""
+Historial persistente en disco: segmentos de registros fijos mapeados en memoria
+"""
+
+import bisect
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+
+import numpy as np
+
+from app.timeseries import HISTORY_MAX_SERIES, snapshot_metrics
+
+# Configuración desde variables de entorno
+HISTORY_DIR = os.getenv('HISTORY_DIR', '')  # Vacío: sin persistencia
+HISTORY_SEGMENT_SECONDS = int(os.getenv('HISTORY_SEGMENT_SECONDS', 3600))  # Duración de cada segmento
+HISTORY_SEGMENT_RECORDS = int(os.getenv('HISTORY_SEGMENT_RECORDS', 3600))  # Registros preasignados
+HISTORY_RETENTION_SECONDS = int(os.getenv('HISTORY_RETENTION_SECONDS', 7 * 86400))
+HISTORY_RETENTION_BYTES = int(os.getenv('HISTORY_RETENTION_BYTES', 512 * 1024 * 1024))
+HISTORY_RESTORE_WINDOW = int(os.getenv('HISTORY_RESTORE_WINDOW', 86400))  # Segundos a recargar al arrancar
+
+# Cabecera de 32 bytes: magic | versión | columnas | inicio | capacidad | registros escritos
+SEGMENT_HEADER = struct.Struct('<4sHHdII8x')
+SEGMENT_COUNT = struct.Struct('<I')
+SEGMENT_COUNT_OFFSET = 20
+SEGMENT_MAGIC = b'HMTS'
+SEGMENT_VERSION = 1
+SERIES_FILE = 'series.json'
+
+def record_dtype(max_series):
+    """Registro binario fijo: timestamp float64 + una columna float32 por serie"""
+    return np.dtype([('ts', '<f8'), ('values', '<f4', (max_series,))])
+
+def segment_filename(start):
+    """Nombre de fichero ordenable a partir del inicio del segmento (ms)"""
+    return f"segment-{int(start * 1000):015d}.bin"
+
+class Segment:
+    """Fichero preasignado y mapeado en memoria con registros de tamaño fijo"""
+
+    def __init__(self, path, start=None, max_series=HISTORY_MAX_SERIES, capacity=HISTORY_SEGMENT_RECORDS):
+        self.path = path
+        self._file = None
+        self._mmap = None
+        self.records = None
+
+        if start is not None:
+            # Segmento nuevo: preasignar el fichero completo de una vez
+            self.start = start
+            self.max_series = max_series
+            self.capacity = capacity
+            size = SEGMENT_HEADER.size + capacity * record_dtype(max_series).itemsize
+            with open(path, 'wb') as f:
+                f.truncate(size)
+                f.write(SEGMENT_HEADER.pack(SEGMENT_MAGIC, SEGMENT_VERSION, max_series, start, capacity, 0))
+            self.count = 0
+        else:
+            with open(path, 'rb') as f:
+                magic, version, self.max_series, self.start, self.capacity, self.count = \
+                    SEGMENT_HEADER.unpack(f.read(SEGMENT_HEADER.size))
+            if magic != SEGMENT_MAGIC or version != SEGMENT_VERSION:
+                raise ValueError(f"Segmento de historial inválido: {path}")
+
+    def size_bytes(self):
+        """Tamaño del fichero en disco"""
+        return SEGMENT_HEADER.size + self.capacity * record_dtype(self.max_series).itemsize
+
+    def open(self, writable=False):
+        """Mapear el fichero (lectura o escritura)"""
+        if self._mmap is None:
+            self._file = open(self.path, 'r+b' if writable else 'rb')
+            access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=access)
+            self.records = np.frombuffer(self._mmap, dtype=record_dtype(self.max_series),
+                                         count=self.capacity, offset=SEGMENT_HEADER.size)
+            if not writable:
+                # El escritor puede haber avanzado desde que se leyó la cabecera
+                self.count = SEGMENT_COUNT.unpack_from(self._mmap, SEGMENT_COUNT_OFFSET)[0]
+        return self
+
+    def close(self):
+        """Desmapear el fichero (el sistema operativo vuelca las páginas sucias)"""
+        if self._mmap is not None:
+            self.records = None
+            self._mmap.close()
+            self._file.close()
+            self._mmap = None
+            self._file = None
+
+    def full(self):
+        return self.count >= self.capacity
+
+    def append(self, timestamp, vector):
+        """Escribir un registro en el mapa (sin fsync: no bloquea al llamador)"""
+        record = self.records[self.count]
+        record['ts'] = timestamp
+        record['values'] = vector
+        self.count += 1
+        # El contador se publica después del registro: un corte deja como mucho un registro sin contar
+        SEGMENT_COUNT.pack_into(self._mmap, SEGMENT_COUNT_OFFSET, self.count)
+
+    def last_timestamp(self):
+        """Timestamp del último registro escrito (None si está vacío)"""
+        if not self.count:
+            return None
+        return float(self.records['ts'][self.count - 1])
+
+    def read(self, since=None, until=None):
+        """Copiar los registros en [since, until] con búsqueda binaria"""
+        timestamps = self.records['ts'][:self.count]
+        lo = 0 if since is None else int(np.searchsorted(timestamps, since, side='left'))
+        hi = self.count if until is None else int(np.searchsorted(timestamps, until, side='right'))
+        return self.records[lo:hi].copy()
+
+class SegmentStore:
+    """Segmentos rotados por tiempo con índice ordenado por inicio y retención por edad o tamaño"""
+
+    def __init__(self, directory=HISTORY_DIR, max_series=HISTORY_MAX_SERIES,
+                 segment_seconds=HISTORY_SEGMENT_SECONDS, segment_records=HISTORY_SEGMENT_RECORDS,
+                 retention_seconds=HISTORY_RETENTION_SECONDS, retention_bytes=HISTORY_RETENTION_BYTES):
+        self.directory = directory
+        self.max_series = max(1, max_series)
+        self.segment_seconds = max(1, segment_seconds)
+        self.segment_records = max(1, segment_records)
+        self.retention_seconds = retention_seconds
+        self.retention_bytes = retention_bytes
+        self._lock = threading.Lock()
+        self._series = {}
+        self._segments = []  # Índice ordenado por inicio
+        self._starts = []
+        self._active = None
+        self._loaded = False
+        self.read_only = False  # Los workers solo leen: escribe el proceso de muestreo
+
+    @property
+    def enabled(self):
+        return bool(self.directory)
+
+    def _load(self):
+        """Cargar el índice de segmentos y el mapa de series del directorio"""
+        if self._loaded:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        series_path = os.path.join(self.directory, SERIES_FILE)
+        if os.path.exists(series_path):
+            with open(series_path, 'r', encoding='utf-8') as f:
+                self._series = {name: column for column, name in enumerate(json.load(f)['series'])}
+
+        for filename in sorted(os.listdir(self.directory)):
+            if not (filename.startswith('segment-') and filename.endswith('.bin')):
+                continue
+            try:
+                segment = Segment(os.path.join(self.directory, filename))
+            except (ValueError, struct.error) as e:
+                logging.warning(f"Ignorando segmento de historial dañado {filename}: {e}")
+                continue
+            if segment.max_series != self.max_series:
+                logging.warning(f"Ignorando segmento {filename} con {segment.max_series} columnas")
+                continue
+            self._segments.append(segment)
+        self._starts = [segment.start for segment in self._segments]
+        self._loaded = True
+
+    def _save_series(self):
+        """Guardar el orden de columnas (solo cuando aparece una serie nueva)"""
+        names = sorted(self._series, key=self._series.get)
+        path = os.path.join(self.directory, SERIES_FILE)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'series': names}, f)
+        os.replace(path + '.tmp', path)
+
+    def series_names(self):
+        """Métricas con datos persistidos"""
+        with self._lock:
+            self._load()
+            return list(self._series)
+
+    def _roll(self, timestamp):
+        """Abrir un segmento nuevo alineado a la duración configurada"""
+        if self._active is not None:
+            self._active.close()
+        elif self._segments:
+            last = self._segments[-1]
+            if not last.full() and last.start <= timestamp < last.start + self.segment_seconds:
+                # Reinicio dentro de la ventana del último segmento: seguir escribiendo en él
+                self._active = last.open(writable=True)
+                return
+        start = timestamp - timestamp % self.segment_seconds
+        if self._segments and start <= self._segments[-1].start:
+            # Segmento lleno antes de acabar su ventana: continuar en el mismo instante
+            start = timestamp
+        segment = Segment(os.path.join(self.directory, segment_filename(start)),
+                          start, self.max_series, self.segment_records)
+        self._segments.append(segment)
+        self._starts.append(segment.start)
+        self._active = segment.open(writable=True)
+        self._enforce_retention(timestamp)
+
+    def _enforce_retention(self, now):
+        """Borrar los segmentos más antiguos que excedan la edad o el tamaño máximos"""
+        total = sum(segment.size_bytes() for segment in self._segments)
+        while len(self._segments) > 1:
+            oldest, following = self._segments[0], self._segments[1]
+            too_old = self.retention_seconds and following.start <= now - self.retention_seconds
+            too_big = self.retention_bytes and total > self.retention_bytes
+            if not (too_old or too_big):
+                break
+            oldest.close()
+            try:
+                os.remove(oldest.path)
+            except FileNotFoundError:
+                pass
+            total -= oldest.size_bytes()
+            del self._segments[0]
+            del self._starts[0]
+
+    def append(self, timestamp, metrics):
+        """Persistir una muestra {'grupo.campo': valor}"""
+        if self.read_only:
+            raise RuntimeError(f"Historial {self.directory} abierto solo para lectura")
+        with self._lock:
+            self._load()
+            vector = np.full(self.max_series, np.nan, dtype=np.float32)
+            new_series = False
+            for name, value in metrics.items():
+                column = self._series.get(name)
+                if column is None:
+                    if len(self._series) >= self.max_series:
+                        continue
+                    column = self._series[name] = len(self._series)
+                    new_series = True
+                vector[column] = value
+            if new_series:
+                self._save_series()
+
+            active = self._active
+            if (active is None or active.full()
+                    or timestamp >= active.start + self.segment_seconds):
+                self._roll(timestamp)
+            elif active.count and timestamp < active.last_timestamp():
+                timestamp = active.last_timestamp()
+            self._active.append(timestamp, vector)
+
+    def append_snapshot(self, snapshot):
+        """Persistir un snapshot del sampler (callback)"""
+        self.append(snapshot.timestamp, snapshot_metrics(snapshot))
+
+    def read(self, since=None, until=None):
+        """Registros en [since, until]: (timestamps, {métrica: valores})"""
+        with self._lock:
+            self._load()
+            # Primer segmento que puede contener `since`: búsqueda binaria en el índice
+            first = 0 if since is None else max(0, bisect.bisect_right(self._starts, since) - 1)
+            chunks = []
+            for segment in self._segments[first:]:
+                if until is not None and segment.start > until:
+                    break
+                opened = segment is not self._active
+                if opened:
+                    segment.open()
+                try:
+                    chunks.append(segment.read(since, until))
+                finally:
+                    if opened:
+                        segment.close()
+            series = dict(self._series)
+
+        records = np.concatenate(chunks) if chunks else np.empty(0, dtype=record_dtype(self.max_series))
+        return records['ts'], {name: records['values'][:, column] for name, column in series.items()}
+
+    def reload(self, read_only=True):
+        """Olvidar el estado heredado tras fork; la próxima lectura vuelve a escanear el directorio"""
+        # El lock heredado pudo quedar tomado por un hilo que no existe en este proceso
+        self._lock = threading.Lock()
+        with self._lock:
+            if self._active is not None:
+                self._active.close()
+                self._active = None
+            self._series = {}
+            self._segments = []
+            self._starts = []
+            self._loaded = False
+            self.read_only = read_only
+
+    def disk_bytes(self):
+        """Espacio ocupado por los segmentos"""
+        with self._lock:
+            self._load()
+            return sum(segment.size_bytes() for segment in self._segments)
+
+    def close(self):
+        """Cerrar el segmento activo"""
+        with self._lock:
+            if self._active is not None:
+                self._active.close()
+                self._active = None
+
+# Instancia global para uso en la aplicación
+history_segments = SegmentStore()
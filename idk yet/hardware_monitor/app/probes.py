@@ -0,0 +1,78 @@
+"""
+Sondas /livez y /readyz a nivel WSGI, por delante de Flask y de todo su middleware
+"""
+
+import os
+import threading
+
+LIVENESS_PATH = '/livez'
+READINESS_PATH = '/readyz'
+# Segundos que un worker sigue atendiendo con /readyz en 503 antes de parar (menor que graceful_timeout)
+READINESS_DRAIN_SECONDS = float(os.getenv('READINESS_DRAIN_SECONDS', 5))
+
+# Cabeceras precalculadas: la sonda no construye nada por request
+_HEADERS = [('Content-Type', 'text/plain; charset=utf-8'), ('Cache-Control', 'no-store')]
+
+class Readiness:
+    """Bandera de disponibilidad en memoria (lectura sin lock desde las sondas)"""
+
+    def __init__(self):
+        self.ready = False
+        self.reason = 'iniciando'
+        self._lock = threading.Lock()
+
+    def mark_ready(self):
+        with self._lock:
+            self.ready = True
+            self.reason = None
+
+    def mark_not_ready(self, reason):
+        with self._lock:
+            self.ready = False
+            self.reason = reason
+
+class ProbeMiddleware:
+    """Responde las sondas sin pasar por rate limiting, logging, Talisman, Compress ni métricas"""
+
+    def __init__(self, wsgi_app, readiness):
+        self.wsgi_app = wsgi_app
+        self.readiness = readiness
+
+    @staticmethod
+    def _respond(start_response, status, body, environ):
+        start_response(status, _HEADERS + [('Content-Length', str(len(body)))])
+        return [b''] if environ.get('REQUEST_METHOD') == 'HEAD' else [body]
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO')
+        if path == LIVENESS_PATH:
+            # Vivo mientras el proceso pueda atender requests
+            return self._respond(start_response, '200 OK', b'ok\n', environ)
+        if path == READINESS_PATH:
+            if self.readiness.ready:
+                return self._respond(start_response, '200 OK', b'ready\n', environ)
+            body = f"not ready: {self.readiness.reason}\n".encode()
+            return self._respond(start_response, '503 SERVICE UNAVAILABLE', body, environ)
+        return self.wsgi_app(environ, start_response)
+
+def drain_handler(stop, readiness, delay=READINESS_DRAIN_SECONDS):
+    """Manejador de señal: bajar /readyz ya y llamar a `stop(signum, frame)` pasado `delay`"""
+    draining = threading.Event()
+
+    def handler(signum, frame):
+        readiness.mark_not_ready('apagando')
+        if draining.is_set():
+            return
+        draining.set()
+        if delay <= 0:
+            stop(signum, frame)
+            return
+        # En un hilo aparte: el bucle del worker sigue aceptando mientras el balanceador ve el 503
+        timer = threading.Timer(delay, stop, args=(signum, frame))
+        timer.daemon = True
+        timer.start()
+
+    return handler
+
+# Instancia global para uso en la aplicación
+readiness = Readiness()
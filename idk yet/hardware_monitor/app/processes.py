@@ -0,0 +1,110 @@
+"""
+Tabla de procesos top-N con iteración incremental y lecturas agrupadas con oneshot()
+"""
+
+import heapq
+import os
+import threading
+import time
+from collections import deque
+from operator import itemgetter
+
+import psutil
+
+# Configuración desde variables de entorno
+PROCESS_SAMPLE_BUDGET_MS = int(os.getenv('PROCESS_SAMPLE_BUDGET_MS', 200))  # Tiempo máximo por muestra
+PROCESS_MIN_INTERVAL = float(os.getenv('PROCESS_MIN_INTERVAL', 1.0))  # Segundos entre muestras
+PROCESS_MAX_TRACKED = int(os.getenv('PROCESS_MAX_TRACKED', 10000))  # Procesos con estado guardado
+PROCESS_TOP_MAX = int(os.getenv('PROCESS_TOP_MAX', 100))  # Límite máximo de `limit`
+
+# Criterio de ordenación -> campo de cada fila
+SORT_FIELDS = {'cpu': 'cpu_percent', 'memory': 'memory_rss', 'threads': 'num_threads'}
+
+class ProcessCollector:
+    """Conserva los psutil.Process entre muestras: el % de CPU sale del delta sin bloquear"""
+
+    def __init__(self, budget_ms=PROCESS_SAMPLE_BUDGET_MS, min_interval=PROCESS_MIN_INTERVAL,
+                 max_tracked=PROCESS_MAX_TRACKED):
+        self.budget = budget_ms / 1000.0
+        self.min_interval = min_interval
+        self.max_tracked = max_tracked
+        self._processes = {}  # pid -> psutil.Process (guarda la base de cpu_percent)
+        self._rows = {}  # pid -> última fila leída
+        self._pending = deque()  # pids que faltan en la pasada en curso
+        self._lock = threading.Lock()
+        self._last_sample = None
+        self.total = 0
+        self.sample_ms = 0.0
+
+    def _read(self, pid, memory_total):
+        """Fila de un proceso con todos los atributos leídos en un solo oneshot()"""
+        process = self._processes.get(pid)
+        if process is None:
+            if len(self._processes) >= self.max_tracked:
+                return None
+            # Primera vez: cpu_percent() devuelve 0.0 y fija la base para la siguiente muestra
+            process = self._processes[pid] = psutil.Process(pid)
+        with process.oneshot():
+            rss = process.memory_info().rss
+            return {
+                'pid': pid,
+                'name': process.name(),
+                'status': process.status(),
+                'cpu_percent': round(process.cpu_percent(None), 1),
+                'memory_rss': rss,
+                'memory_percent': round(rss / memory_total * 100, 2) if memory_total else 0.0,
+                'num_threads': process.num_threads()
+            }
+
+    def _forget(self, pid):
+        self._processes.pop(pid, None)
+        self._rows.pop(pid, None)
+
+    def sample(self, force=False):
+        """Refrescar procesos hasta agotar el presupuesto; la pasada sigue en la próxima muestra"""
+        with self._lock:
+            started = time.monotonic()
+            if not force and self._last_sample is not None and started - self._last_sample < self.min_interval:
+                return
+            self._last_sample = started
+
+            pids = psutil.pids()
+            alive = set(pids)
+            self.total = len(pids)
+            for pid in [pid for pid in self._processes if pid not in alive]:
+                self._forget(pid)
+            if not self._pending:
+                # Nueva pasada sobre todos los procesos vivos (incluye los recién creados)
+                self._pending = deque(pids)
+
+            memory_total = psutil.virtual_memory().total
+            deadline = started + self.budget
+            while self._pending and time.monotonic() < deadline:
+                pid = self._pending.popleft()
+                if pid not in alive:
+                    continue
+                try:
+                    row = self._read(pid, memory_total)
+                except (psutil.NoSuchProcess, psutil.ZombieProcess):
+                    self._forget(pid)
+                    continue
+                except psutil.AccessDenied:
+                    continue
+                if row is not None:
+                    self._rows[pid] = row
+            self.sample_ms = round((time.monotonic() - started) * 1000, 2)
+
+    def top(self, sort='cpu', limit=20):
+        """Los `limit` procesos con mayor valor del criterio (heap, sin ordenar todo)"""
+        field = SORT_FIELDS[sort]
+        with self._lock:
+            rows = list(self._rows.values())
+            complete = not self._pending
+        return heapq.nlargest(max(1, min(limit, PROCESS_TOP_MAX)), rows, key=itemgetter(field)), complete
+
+    def tracked(self):
+        """Procesos con estado guardado (acotado por max_tracked)"""
+        return len(self._processes)
+
+# Instancia global para uso en la aplicación
+process_collector = ProcessCollector()
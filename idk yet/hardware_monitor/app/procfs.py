@@ -0,0 +1,259 @@
+"""
+Lectura directa de /proc en Linux (sin psutil) con descriptores abiertos y buffers reutilizados
+"""
+
+import logging
+import os
+import re
+import select
+import sys
+import threading
+from collections import namedtuple
+
+# Configuración desde variables de entorno
+PROCFS_FAST_PATH = os.getenv('PROCFS_FAST_PATH', 'true').lower() == 'true'
+PROCFS_ROOT = os.getenv('PROCFS_ROOT', '/proc')
+DISK_EXCLUDE_FSTYPES = [fstype.strip() for fstype in os.getenv('DISK_EXCLUDE_FSTYPES', 'squashfs').split(',')
+                        if fstype.strip()]
+
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+# Mismos campos que psutil.cpu_times(percpu=True) en Linux
+CpuTimes = namedtuple('CpuTimes', ['user', 'nice', 'system', 'idle', 'iowait', 'irq',
+                                   'softirq', 'steal', 'guest', 'guest_nice'])
+
+MEMINFO_FIELDS = (b'MemTotal', b'MemFree', b'MemAvailable', b'Buffers', b'Cached', b'SReclaimable')
+
+# Punto de montaje de un sistema de ficheros real (major:minor enlaza con /proc/diskstats)
+Mount = namedtuple('Mount', ['device', 'mountpoint', 'fstype', 'major_minor'])
+
+# mountinfo escapa espacios y otros caracteres como \ooo (octal)
+MOUNTINFO_ESCAPE = re.compile(rb'\\([0-7]{3})')
+
+# Serializa la reapertura tras fork; se recrea en el hijo (el del padre pudo heredarse tomado)
+_fork_lock = threading.RLock()
+
+def _reset_fork_lock():
+    global _fork_lock
+    _fork_lock = threading.RLock()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_fork_lock)
+
+class ProcFile:
+    """Fichero de /proc abierto una vez y releído con pread sobre un buffer reutilizado"""
+
+    def __init__(self, path, size=4096):
+        self.path = path
+        self._fd = os.open(path, os.O_RDONLY)
+        self._pid = os.getpid()
+        self._buffer = bytearray(size)
+        self._lock = threading.Lock()
+
+    def reopen_after_fork(self):
+        """Abrir un descriptor propio si este proceso es un hijo (True si se reabrió)"""
+        if self._pid == os.getpid():
+            return False
+        with _fork_lock:
+            if self._pid == os.getpid():
+                return False
+            # La descripción heredada se comparte con el padre y los demás workers
+            # (posición y eventos de poll); el lock pudo heredarse tomado
+            self._lock = threading.Lock()
+            try:
+                os.close(self._fd)
+            except OSError:
+                pass
+            self._fd = os.open(self.path, os.O_RDONLY)
+            self._pid = os.getpid()
+            return True
+
+    def read(self):
+        """Contenido actual del fichero (pread desde el offset 0 hasta EOF, sin reabrir)"""
+        self.reopen_after_fork()
+        with self._lock:
+            offset = 0
+            while True:
+                if offset == len(self._buffer):
+                    # Buffer lleno: duplicarlo conservando lo ya leído
+                    buffer = bytearray(len(self._buffer) * 2)
+                    buffer[:offset] = self._buffer
+                    self._buffer = buffer
+                # Los seq_file (maps, smaps, mountinfo...) devuelven como mucho una página por
+                # lectura: una lectura corta no es EOF, solo 0 lo es
+                if hasattr(os, 'preadv'):
+                    length = os.preadv(self._fd, [memoryview(self._buffer)[offset:]], offset)
+                else:
+                    data = os.pread(self._fd, len(self._buffer) - offset, offset)
+                    length = len(data)
+                    self._buffer[offset:offset + length] = data
+                if not length:
+                    return bytes(memoryview(self._buffer)[:offset])
+                offset += length
+
+    def fileno(self):
+        self.reopen_after_fork()
+        return self._fd
+
+    def close(self):
+        os.close(self._fd)
+
+class MountTable:
+    """Tabla de montajes cacheada: solo se relee cuando el kernel señala un cambio en mountinfo"""
+
+    def __init__(self, root=PROCFS_ROOT, exclude_fstypes=()):
+        self._file = ProcFile(os.path.join(root, 'self', 'mountinfo'), 16384)
+        self._pid = None
+        self._poller = None
+        with open(os.path.join(root, 'filesystems'), 'rb') as f:
+            # Sistemas de ficheros con dispositivo de bloques (sin la marca 'nodev')
+            self._real_fstypes = {line.split()[-1].decode() for line in f.read().split(b'\n')
+                                  if line.strip() and not line.startswith(b'nodev')}
+        self._exclude_fstypes = set(exclude_fstypes)
+        self._mounts = None
+        self._lock = threading.Lock()
+        self.refreshes = 0
+
+    def invalidate(self):
+        """Forzar la relectura en la próxima consulta"""
+        self._mounts = None
+
+    def _watch(self):
+        """Poller propio de cada proceso: un evento de mountinfo lo consume quien lo sondea"""
+        if self._pid == os.getpid():
+            return
+        with _fork_lock:
+            if self._pid == os.getpid():
+                return
+            self._lock = threading.Lock()
+            self._file.reopen_after_fork()
+            # El kernel marca POLLPRI/POLLERR en mountinfo al montar o desmontar
+            self._poller = select.poll()
+            self._poller.register(self._file.fileno(), select.POLLPRI | select.POLLERR)
+            self._mounts = None
+            self._pid = os.getpid()
+
+    def mounts(self):
+        """Sistemas de ficheros reales montados (uno por dispositivo)"""
+        self._watch()
+        with self._lock:
+            if self._mounts is None or self._poller.poll(0):
+                self._mounts = self._parse(self._file.read())
+                self.refreshes += 1
+            return self._mounts
+
+    def _parse(self, data):
+        """Interpretar mountinfo: 'id padre maj:min raíz punto opciones [...] - tipo origen ...'"""
+        mounts = []
+        seen = set()
+        for line in data.split(b'\n'):
+            left, separator, right = line.partition(b' - ')
+            if not separator:
+                continue
+            fields = left.split()
+            fstype, source = right.split()[:2]
+            fstype = fstype.decode()
+            mountpoint = MOUNTINFO_ESCAPE.sub(lambda m: bytes([int(m.group(1), 8)]), fields[4]).decode(errors='replace')
+            real = fstype in self._real_fstypes and fstype not in self._exclude_fstypes
+            if not (real or mountpoint == '/') or fields[2] in seen:
+                continue
+            # Bind mounts del mismo dispositivo: conservar solo el primero
+            seen.add(fields[2])
+            mounts.append(Mount(source.decode(errors='replace'), mountpoint, fstype, fields[2].decode()))
+        return mounts
+
+class ProcfsCollector:
+    """Backend Linux: solo analiza los campos que usan los recolectores"""
+
+    def __init__(self, root=PROCFS_ROOT):
+        self._stat = ProcFile(os.path.join(root, 'stat'), 16384)
+        self._meminfo = ProcFile(os.path.join(root, 'meminfo'), 8192)
+        self._net_dev = ProcFile(os.path.join(root, 'net', 'dev'), 4096)
+        self._diskstats = ProcFile(os.path.join(root, 'diskstats'), 8192)
+        self.device_numbers = {}  # 'major:minor' -> nombre del dispositivo
+        self.mount_table = MountTable(root, DISK_EXCLUDE_FSTYPES)
+
+    def cpu_times(self):
+        """Tiempos por núcleo en segundos (equivalente a psutil.cpu_times(percpu=True))"""
+        data = self._stat.read()
+        # Las líneas 'cpuN' van al principio; lo demás (intr, ctxt...) no se analiza
+        end = data.find(b'\nintr')
+        times = []
+        for line in data[:end if end > 0 else len(data)].split(b'\n')[1:]:
+            if not line.startswith(b'cpu'):
+                break
+            values = line.split()[1:11]
+            values += [b'0'] * (10 - len(values))
+            times.append(CpuTimes(*[int(value) / CLOCK_TICKS for value in values]))
+        return times
+
+    def memory(self):
+        """(total, used, free, porcentaje) con el mismo criterio que psutil.virtual_memory()"""
+        fields = {}
+        for line in self._meminfo.read().split(b'\n'):
+            key, _, rest = line.partition(b':')
+            if key in MEMINFO_FIELDS:
+                fields[key] = int(rest.split()[0]) * 1024
+                if len(fields) == len(MEMINFO_FIELDS):
+                    break
+
+        total = fields[b'MemTotal']
+        free = fields[b'MemFree']
+        cached = fields.get(b'Cached', 0) + fields.get(b'SReclaimable', 0)
+        available = fields.get(b'MemAvailable', free + cached)
+        used = total - free - cached - fields.get(b'Buffers', 0)
+        if used < 0:
+            used = total - free
+        percent = (total - available) / total * 100 if total else 0.0
+        return total, used, free, percent
+
+    def net_pernic(self):
+        """Contadores por interfaz en el mismo orden que psutil.net_io_counters(pernic=True)"""
+        counters = {}
+        # Las dos primeras líneas son cabeceras
+        for line in self._net_dev.read().split(b'\n')[2:]:
+            name, colon, values = line.partition(b':')
+            if not colon:
+                continue
+            fields = values.split()
+            counters[name.strip().decode()] = (
+                int(fields[8]), int(fields[0]), int(fields[9]), int(fields[1]),
+                int(fields[2]), int(fields[10]), int(fields[3]), int(fields[11])
+            )
+        return counters
+
+    def diskstats(self):
+        """Contadores de /proc/diskstats: {dispositivo: [lecturas, ..., ms ponderados]}"""
+        stats = {}
+        numbers = {}
+        for line in self._diskstats.read().split(b'\n'):
+            fields = line.split()
+            if len(fields) >= 14:
+                name = fields[2].decode()
+                stats[name] = [int(value) for value in fields[3:14]]
+                numbers[f"{fields[0].decode()}:{fields[1].decode()}"] = name
+        self.device_numbers = numbers
+        return stats
+
+    @staticmethod
+    def disk_usage(path):
+        """(total, used, free, porcentaje) vía statvfs, con el mismo cálculo que psutil"""
+        st = os.statvfs(path)
+        total = st.f_blocks * st.f_frsize
+        free = st.f_bavail * st.f_frsize
+        used = (st.f_blocks - st.f_bfree) * st.f_frsize
+        percent = used / (used + free) * 100 if used + free else 0.0
+        return total, used, free, percent
+
+def create_procfs_collector():
+    """Backend /proc si estamos en Linux y está habilitado (None: usar psutil)"""
+    if not PROCFS_FAST_PATH or not sys.platform.startswith('linux'):
+        return None
+    try:
+        return ProcfsCollector()
+    except OSError as e:
+        logging.warning(f"/proc no disponible, se usa psutil: {e}")
+        return None
+
+# Instancia global para uso en la aplicación
+procfs = create_procfs_collector()
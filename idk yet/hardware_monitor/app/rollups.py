@@ -0,0 +1,179 @@
+"""
+Agregados por niveles de resolución (rollups) para historial largo
+"""
+
+import os
+
+import numpy as np
+
+def parse_tiers(spec):
+    """Interpretar 'resolución:capacidad,...' (segundos y número de buckets)"""
+    tiers = []
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        resolution, capacity = item.split(':')
+        tiers.append((int(resolution), int(capacity)))
+    return sorted(tiers)
+
+# Por defecto: 10 s durante 24 h, 1 min durante 7 días y 1 h durante 90 días
+ROLLUP_TIERS = parse_tiers(os.getenv('ROLLUP_TIERS', '10:8640,60:10080,3600:2160'))
+
+class RollupTier:
+    """Nivel de agregación con min/max/sum/count/last por bucket y por serie"""
+
+    def __init__(self, resolution, capacity, max_series):
+        self.resolution = resolution
+        self.capacity = max(1, capacity)
+        self._start = np.zeros(self.capacity, dtype=np.float64)
+        self._min = np.full((max_series, self.capacity), np.nan, dtype=np.float32)
+        self._max = np.full((max_series, self.capacity), np.nan, dtype=np.float32)
+        self._last = np.full((max_series, self.capacity), np.nan, dtype=np.float32)
+        self._sum = np.zeros((max_series, self.capacity), dtype=np.float64)
+        self._count = np.zeros((max_series, self.capacity), dtype=np.int32)
+        self._buckets = 0  # Total de buckets abiertos (cursor monótono)
+
+    def memory_bytes(self):
+        """Memoria ocupada por los arrays del nivel"""
+        return sum(array.nbytes for array in (self._start, self._min, self._max,
+                                              self._last, self._sum, self._count))
+
+    def __len__(self):
+        return min(self._buckets, self.capacity)
+
+    def oldest(self):
+        """Inicio del bucket más antiguo conservado (None si está vacío)"""
+        if not self._buckets:
+            return None
+        return float(self._start[(self._buckets - len(self)) % self.capacity])
+
+    def add(self, timestamp, vector):
+        """Incorporar una muestra (vector con una posición por serie) en O(series)"""
+        start = timestamp - timestamp % self.resolution
+        current = (self._buckets - 1) % self.capacity
+        if not self._buckets or start > self._start[current]:
+            # Abrir un bucket nuevo reutilizando la columna más antigua
+            current = self._buckets % self.capacity
+            self._start[current] = start
+            self._min[:, current] = np.nan
+            self._max[:, current] = np.nan
+            self._last[:, current] = np.nan
+            self._sum[:, current] = 0.0
+            self._count[:, current] = 0
+            self._buckets += 1
+
+        present = ~np.isnan(vector)
+        self._min[:, current] = np.fmin(self._min[:, current], vector)
+        self._max[:, current] = np.fmax(self._max[:, current], vector)
+        self._last[present, current] = vector[present]
+        self._sum[present, current] += vector[present]
+        self._count[present, current] += 1
+
+    def extend(self, timestamps, matrix):
+        """Incorporar en bloque muestras ordenadas (matriz series x muestras), p. ej. al recargar"""
+        starts = timestamps - timestamps % self.resolution
+        # Las muestras que caen en el bucket abierto se agregan una a una
+        if self._buckets:
+            current = self._start[(self._buckets - 1) % self.capacity]
+            overlap = int(np.searchsorted(starts, current, side='right'))
+            for index in range(overlap):
+                self.add(float(timestamps[index]), matrix[:, index])
+            starts, matrix = starts[overlap:], matrix[:, overlap:]
+        if not len(starts):
+            return
+
+        # Un bucket por cada cambio de inicio; solo caben los `capacity` más recientes
+        first_index = np.concatenate(([0], np.flatnonzero(np.diff(starts)) + 1))
+        if len(first_index) > self.capacity:
+            cut = first_index[-self.capacity]
+            starts, matrix = starts[cut:], matrix[:, cut:]
+            first_index = first_index[-self.capacity:] - cut
+
+        present = ~np.isnan(matrix)
+        positions = np.where(present, np.arange(matrix.shape[1]), -1)
+        last_index = np.maximum.reduceat(positions, first_index, axis=1)
+        rows = np.arange(matrix.shape[0])[:, None]
+        last = np.where(last_index >= 0, matrix[rows, np.maximum(last_index, 0)], np.nan)
+
+        columns = (self._buckets + np.arange(len(first_index))) % self.capacity
+        self._start[columns] = starts[first_index]
+        self._min[:, columns] = np.fmin.reduceat(matrix, first_index, axis=1)
+        self._max[:, columns] = np.fmax.reduceat(matrix, first_index, axis=1)
+        self._last[:, columns] = last
+        self._sum[:, columns] = np.add.reduceat(np.where(present, matrix, 0.0).astype(np.float64),
+                                                first_index, axis=1)
+        self._count[:, columns] = np.add.reduceat(present.astype(np.int32), first_index, axis=1)
+        self._buckets += len(first_index)
+
+    def _slice(self, array, start, stop):
+        """Copiar el rango lógico [start, stop) de un array circular"""
+        length = stop - start
+        start %= self.capacity
+        end = start + length
+        if end <= self.capacity:
+            return array[..., start:end].copy()
+        return np.concatenate((array[..., start:], array[..., :end - self.capacity]), axis=-1)
+
+    def range(self, column, since=None, until=None):
+        """Buckets de una serie cuyo inicio cae en [since, until]"""
+        size = len(self)
+        first = self._buckets - size
+        starts = self._slice(self._start, first, first + size)
+        lo = 0 if since is None else int(np.searchsorted(starts, since - since % self.resolution))
+        hi = size if until is None else int(np.searchsorted(starts, until, side='right'))
+        hi = max(lo, hi)
+
+        count = self._slice(self._count[column], first + lo, first + hi)
+        total = self._slice(self._sum[column], first + lo, first + hi)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            avg = np.where(count > 0, total / np.maximum(count, 1), np.nan)
+        return {
+            'ts': starts[lo:hi],
+            'avg': avg,
+            'min': self._slice(self._min[column], first + lo, first + hi),
+            'max': self._slice(self._max[column], first + lo, first + hi),
+            'last': self._slice(self._last[column], first + lo, first + hi),
+            'count': count,
+        }
+
+class RollupStore:
+    """Conjunto de niveles actualizados incrementalmente con cada muestra"""
+
+    def __init__(self, tiers=ROLLUP_TIERS):
+        self.tiers_spec = list(tiers)
+        self.tiers = []
+
+    def bind(self, max_series):
+        """Preasignar los niveles para el número de series del almacén"""
+        self.tiers = [RollupTier(resolution, capacity, max_series)
+                      for resolution, capacity in self.tiers_spec]
+
+    def memory_bytes(self):
+        """Memoria total de todos los niveles"""
+        return sum(tier.memory_bytes() for tier in self.tiers)
+
+    def add(self, timestamp, vector):
+        """Actualizar todos los niveles con una muestra, sin reescanear"""
+        for tier in self.tiers:
+            tier.add(timestamp, vector)
+
+    def extend(self, timestamps, matrix):
+        """Actualizar todos los niveles con un bloque de muestras ordenadas"""
+        for tier in self.tiers:
+            tier.extend(timestamps, matrix)
+
+    def covering(self, since):
+        """Niveles que conservan datos desde `since`, del más fino al más grueso"""
+        return [tier for tier in self.tiers
+                if tier.oldest() is not None and tier.oldest() <= since]
+
+    def select(self, since, until, points):
+        """Nivel más grueso que aún ofrece al menos `points` puntos en el rango"""
+        if points < 1:
+            raise ValueError("points debe ser un entero mayor o igual que 1")
+        duration = until - since
+        for tier in reversed(self.covering(since)):
+            if duration / tier.resolution >= points:
+                return tier
+        return None
@@ -2,17 +2,28 @@
 Rutas de la aplicación
 """
 
+import gzip
 import logging
+import math
 import time
-import psutil
 import os
 from functools import wraps
-from flask import Blueprint, render_template, jsonify, request, g, current_app
+from flask import Blueprint, render_template, jsonify, request, g, current_app, Response
 from flask_jwt_extended import create_access_token, jwt_required
 from flask_limiter.util import get_remote_address
 from flask_limiter import Limiter
 from flask_httpauth import HTTPBasicAuth
-from app.utils import get_cpu_usage, get_ram_usage, get_disk_usage, get_network_stats, sanitize_output, military_error_handler
+from app.utils import military_error_handler
+from app.sampler import hardware_sampler, ON_DEMAND_BUDGET_MS
+from app.timeseries import metrics_store, to_json_columns, HISTORY_DEFAULT_WINDOW
+from app.downsampling import downsample
+from app.streaming import stream_hub, STREAM_HEARTBEAT
+from app.sketches import percentiles, shared_percentiles, summarize
+from app.health import health_monitor
+from app.payloads import stats_payload
+from app.conditional import is_not_modified, apply_cache_headers
+from app.processes import process_collector, SORT_FIELDS, PROCESS_TOP_MAX
+from app.missionlog import mission_logs, ingest_ndjson, MISSION_LOG_PAGE_MAX
 import os
 
 # Crear blueprint principal
@@ -85,6 +96,21 @@ def login():
             'success': False
         }), 401
 
+def snapshot_response(snapshot, build):
+    """304 si el cliente ya tiene el snapshot; si no, la respuesta de build() con ETag y Cache-Control"""
+    # Sin sampler cada request es una muestra nueva: nada que cachear
+    interval = hardware_sampler.interval if hardware_sampler.enabled else 0
+    if is_not_modified(snapshot, request.if_none_match):
+        return apply_cache_headers(Response(status=304), snapshot, interval)
+    response, encoding = build()
+    return apply_cache_headers(response, snapshot, interval, encoding)
+
+@main_bp.route('/api/auth/verify')
+@jwt_required()
+def api_auth_verify():
+    """Validar el token sin cuerpo (auth_request del micro-caché de nginx)"""
+    return '', 204
+
 @main_bp.route('/api/stats')
 @jwt_required()
 @handle_exceptions
@@ -93,35 +119,27 @@ def api_stats():
     try:
         start_time = time.time()
         
-        # Obtener datos de hardware
-        cpu_usage = get_cpu_usage()
-        ram_usage = get_ram_usage()
-        try:
-            disk_usage = get_disk_usage()
-        except Exception as disk_error:
-            disk_usage = {'usage': -1, 'error': str(disk_error), 'timestamp': time.time()}
-            logging.error(f"Error obteniendo disk usage en stats: {disk_error}")
-        network_stats = get_network_stats()
-        
-        # Sanitizar outputs
-        cpu_usage = sanitize_output(cpu_usage)
-        ram_usage = sanitize_output(ram_usage)
-        disk_usage = sanitize_output(disk_usage)
-        network_stats = sanitize_output(network_stats)
-        
-        # Calcular tiempo de respuesta
-        response_time = round((time.time() - start_time) * 1000, 2)
-        
-        # Retornar datos en formato JSON con request_id
-        return jsonify({
-            'cpu': cpu_usage,
-            'ram': ram_usage,
-            'disk': disk_usage,
-            'network': network_stats,
-            'request_id': getattr(g, 'request_id', 'unknown'),
-            'response_time_ms': response_time,
-            'success': True
-        })
+        # Leer el último snapshot publicado por el sampler (ya sanitizado); sin sampler se
+        # recolecta bajo demanda en paralelo dentro de `budget_ms`
+        budget_ms = request.args.get('budget_ms', ON_DEMAND_BUDGET_MS, type=float)
+        if not math.isfinite(budget_ms):
+            return jsonify({'error': 'budget_ms debe ser un número finito', 'success': False}), 400
+        # El cliente solo puede acortar el presupuesto, nunca alargar la espera del worker
+        snapshot = hardware_sampler.get_snapshot(budget_ms=min(max(0.0, budget_ms), ON_DEMAND_BUDGET_MS))
+        
+        def build():
+            # Cuerpo serializado y comprimido una vez por muestra; request_id va en X-Request-ID
+            encoding, body = stats_payload.for_snapshot(snapshot).negotiate(request.accept_encodings)
+            response = Response(body, mimetype='application/json')
+            if encoding != 'identity':
+                # Con Content-Encoding fijado Flask-Compress no vuelve a comprimir
+                response.headers['Content-Encoding'] = encoding
+            response.vary.add('Accept-Encoding')
+            return response, encoding
+        
+        response = snapshot_response(snapshot, build)
+        response.headers['Server-Timing'] = f"app;dur={(time.time() - start_time) * 1000:.2f}"
+        return response
     except Exception as e:
         return jsonify({
             'error': str(e),
@@ -135,61 +153,14 @@ def api_stats():
 def api_health():
     """Endpoint de salud avanzado con métricas detalladas"""
     try:
-        # Métricas básicas del sistema
-        cpu_percent = psutil.cpu_percent(interval=0.1)
-        memory = psutil.virtual_memory()
-        
-        # Usar la función mejorada de disco
-        try:
-            disk_data = get_disk_usage()
-            disk_percent = disk_data.get('usage', -1)
-        except Exception as disk_error:
-            disk_percent = -1
-            logging.error(f"Error obteniendo disk usage en health: {disk_error}")
-        
-        # Información del proceso
-        process = psutil.Process()
-        
-        # Métricas de red
-        net_io = psutil.net_io_counters()
-        
-        health_data = {
-            'status': 'healthy',
+        # Checks baratos desde el snapshot actual; los caros (descriptores, sockets) se leen
+        # de la caché que refresca HealthMonitor cada HEALTH_CHECK_INTERVAL segundos
+        snapshot = hardware_sampler.get_snapshot()
+        health_data = health_monitor.report(snapshot)
+        health_data.update({
             'timestamp': time.time(),
-            'request_id': getattr(g, 'request_id', 'unknown'),
-            'system': {
-                'cpu_usage': round(cpu_percent, 1),
-                'memory_usage': round(memory.percent, 1),
-                'disk_usage': disk_percent,
-                'uptime_seconds': time.time() - psutil.boot_time()
-            },
-            'application': {
-                'memory_mb': round(process.memory_info().rss / 1024 / 1024, 2),
-                'cpu_percent': round(process.cpu_percent(), 1),
-                'threads': process.num_threads(),
-                'open_files': len(process.open_files()),
-                'connections': len(process.connections())
-            },
-            'network': {
-                'bytes_sent_mb': round(net_io.bytes_sent / 1024 / 1024, 2),
-                'bytes_recv_mb': round(net_io.bytes_recv / 1024 / 1024, 2),
-                'packets_sent': net_io.packets_sent,
-                'packets_recv': net_io.packets_recv
-            },
-            'checks': {
-                'cpu_ok': cpu_percent < 90,
-                'memory_ok': memory.percent < 90,
-                'disk_ok': disk_percent >= 0 and disk_percent < 90,
-                'process_ok': process.is_running()
-            }
-        }
-        
-        if disk_percent == -1:
-            health_data['system']['disk_error'] = 'No se pudo obtener el uso de disco.'
-            
-        # Determinar estado general
-        all_checks_ok = all(health_data['checks'].values())
-        health_data['status'] = 'healthy' if all_checks_ok else 'degraded'
+            'request_id': getattr(g, 'request_id', 'unknown')
+        })
         return jsonify(health_data)
     except Exception as e:
         return jsonify({
@@ -225,67 +196,37 @@ def api_mission_status():
         
         mission_elapsed = time.time() - mission_start
         
-        # Health checks del sistema
+        # Health checks del sistema a partir del snapshot compartido
+        snapshot = hardware_sampler.get_snapshot()
         health_checks = {}
         
-        # CPU Check
-        try:
-            cpu_percent = psutil.cpu_percent(interval=0.1)
-            health_checks['cpu'] = {
-                'status': 'OPERATIONAL' if cpu_percent < 90 else 'DEGRADED',
-                'value': round(cpu_percent, 1),
-                'threshold': 90
-            }
-        except Exception as e:
-            health_checks['cpu'] = {
-                'status': 'OFFLINE',
-                'error': str(e),
-                'value': -1
-            }
-        
-        # Memory Check
-        try:
-            memory = psutil.virtual_memory()
-            health_checks['memory'] = {
-                'status': 'OPERATIONAL' if memory.percent < 90 else 'DEGRADED',
-                'value': round(memory.percent, 1),
-                'threshold': 90
-            }
-        except Exception as e:
-            health_checks['memory'] = {
-                'status': 'OFFLINE',
-                'error': str(e),
-                'value': -1
-            }
-        
-        # Disk Check
-        try:
-            disk_data = get_disk_usage()
-            disk_percent = disk_data.get('usage', -1)
-            health_checks['disk'] = {
-                'status': 'OPERATIONAL' if disk_percent >= 0 and disk_percent < 90 else 'DEGRADED',
-                'value': disk_percent,
-                'threshold': 90
-            }
-        except Exception as e:
-            health_checks['disk'] = {
-                'status': 'OFFLINE',
-                'error': str(e),
-                'value': -1
-            }
+        # CPU, Memory y Disk Checks
+        for name, data in (('cpu', snapshot.cpu), ('memory', snapshot.ram), ('disk', snapshot.disk)):
+            value = data.get('usage', -1)
+            if 'error' in data or value < 0:
+                health_checks[name] = {
+                    'status': 'OFFLINE',
+                    'error': data.get('error', 'Sin datos'),
+                    'value': -1
+                }
+            else:
+                health_checks[name] = {
+                    'status': 'OPERATIONAL' if value < 90 else 'DEGRADED',
+                    'value': value,
+                    'threshold': 90
+                }
         
         # Network Check
-        try:
-            net_io = psutil.net_io_counters()
+        if 'error' in snapshot.network:
             health_checks['network'] = {
-                'status': 'OPERATIONAL',
-                'bytes_sent': net_io.bytes_sent,
-                'bytes_recv': net_io.bytes_recv
+                'status': 'OFFLINE',
+                'error': snapshot.network['error']
             }
-        except Exception as e:
+        else:
             health_checks['network'] = {
-                'status': 'OFFLINE',
-                'error': str(e)
+                'status': 'OPERATIONAL',
+                'bytes_sent': snapshot.network.get('bytes_sent', 0),
+                'bytes_recv': snapshot.network.get('bytes_recv', 0)
             }
         
         # Determinar estado general de la misión
@@ -313,6 +254,7 @@ def api_mission_status():
             'mission_start': datetime.fromtimestamp(mission_start).isoformat(),
             'current_time': datetime.now().isoformat(),
             'request_id': getattr(g, 'request_id', 'unknown'),
+            'seq': snapshot.seq,
             'health_checks': health_checks,
             'summary': {
                 'operational': operational_count,
@@ -336,35 +278,24 @@ def api_mission_status():
 @jwt_required()
 @handle_exceptions
 def api_mission_logs():
-    """Endpoint para obtener logs de misión militar"""
+    """Endpoint para obtener logs de misión militar (paginado por cursor)"""
     try:
         from datetime import datetime
         
-        # Simular logs de misión (en producción, esto vendría de una base de datos o archivo)
-        mission_logs = getattr(current_app, 'mission_logs', [])
-        
-        # Agregar log de la consulta actual
-        current_log = {
-            'timestamp': datetime.now().isoformat(),
-            'level': 'INFO',
-            'message': f'MISSION LOGS REQUESTED - Request ID: {getattr(g, "request_id", "unknown")}',
-            'request_id': getattr(g, 'request_id', 'unknown')
-        }
-        
-        if not hasattr(current_app, 'mission_logs'):
-            setattr(current_app, 'mission_logs', [])
-        
-        mission_logs = getattr(current_app, 'mission_logs', [])
-        mission_logs.append(current_log)
-        setattr(current_app, 'mission_logs', mission_logs)
-        
-        # Mantener solo los últimos 100 logs
-        if len(mission_logs) > 100:
-            mission_logs = mission_logs[-100:]
-            setattr(current_app, 'mission_logs', mission_logs)
-        
+        try:
+            after = request.args.get('after', 0, type=int)
+            since = parse_time_arg('since')
+        except ValueError as e:
+            return jsonify({'error': str(e), 'success': False}), 400
+        level = request.args.get('level') or None
+        limit = min(max(request.args.get('limit', 50, type=int), 1), MISSION_LOG_PAGE_MAX)
+        
+        # La consulta no escribe en el log: solo lee la página pedida
+        logs, next_cursor, has_more = mission_logs.page(after, level, since, limit)
         return jsonify({
-            'logs': mission_logs,
+            'logs': logs,
+            'next_cursor': next_cursor,
+            'has_more': has_more,
             'total_logs': len(mission_logs),
             'request_id': getattr(g, 'request_id', 'unknown'),
             'timestamp': datetime.now().isoformat()
@@ -382,8 +313,6 @@ def api_mission_logs():
 def api_add_mission_log():
     """Endpoint para agregar logs de misión militar"""
     try:
-        from datetime import datetime
-        
         data = request.get_json()
         log_level = data.get('level', 'INFO')
         message = data.get('message', '')
@@ -391,25 +320,8 @@ def api_add_mission_log():
         if not message:
             return jsonify({'error': 'Message is required'}), 400
         
-        # Crear log de misión
-        mission_log = {
-            'timestamp': datetime.now().isoformat(),
-            'level': log_level.upper(),
-            'message': message,
-            'request_id': getattr(g, 'request_id', 'unknown')
-        }
-        
-        if not hasattr(current_app, 'mission_logs'):
-            setattr(current_app, 'mission_logs', [])
-        
-        mission_logs = getattr(current_app, 'mission_logs', [])
-        mission_logs.append(mission_log)
-        setattr(current_app, 'mission_logs', mission_logs)
-        
-        # Mantener solo los últimos 100 logs
-        if len(mission_logs) > 100:
-            mission_logs = mission_logs[-100:]
-            setattr(current_app, 'mission_logs', mission_logs)
+        # Crear log de misión (el almacén descarta el más antiguo al llenarse)
+        mission_log = mission_logs.append(log_level, message, getattr(g, 'request_id', 'unknown'))
         
         # Log también en el sistema de logging de Python
         if log_level.upper() == 'ERROR':
@@ -431,51 +343,294 @@ def api_add_mission_log():
             'request_id': getattr(g, 'request_id', 'unknown')
         }), 500
 
+@main_bp.route('/api/mission-logs/bulk', methods=['POST'])
+@jwt_required()
+@handle_exceptions
+def api_bulk_mission_logs():
+    """Ingesta de logs de misión en NDJSON (opcionalmente gzip), leída en streaming y por lotes"""
+    request_id = getattr(g, 'request_id', 'unknown')
+    encoding = request.headers.get('Content-Encoding', 'identity').lower()
+    if encoding not in ('identity', 'gzip'):
+        return jsonify({'error': f'Content-Encoding no soportado: {encoding}', 'success': False}), 415
+    
+    # El cuerpo se descomprime y se parsea línea a línea: memoria acotada sea cual sea su tamaño
+    stream = gzip.GzipFile(fileobj=request.stream) if encoding == 'gzip' else request.stream
+    result = ingest_ndjson(mission_logs, stream, request_id)
+    logging.info(f"MISSION LOG BULK: {result['accepted']} aceptados, {result['rejected']} rechazados")
+    
+    status = 400 if not result['accepted'] else 200
+    if not result['accepted'] and not result['rejected']:
+        result['error'] = 'El cuerpo no contiene registros'
+    return jsonify(dict(result, request_id=request_id, success=status == 200)), status
+
+def parse_time_arg(name, default=None):
+    """Leer un parámetro de tiempo (segundos unix) de la query string"""
+    value = request.args.get(name)
+    if value is None or value == '':
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"Parámetro '{name}' inválido: se espera un timestamp unix")
+
+@main_bp.route('/api/history')
+@jwt_required()
+@handle_exceptions
+def api_history():
+    """Historial de una métrica en formato columnar (ts + values)"""
+    metric = request.args.get('metric')
+    if not metric:
+        # Sin métrica: describir el contenido del almacén
+        return jsonify({
+            'metrics': metrics_store.series_names(),
+            'capacity': metrics_store.capacity,
+            'size': len(metrics_store),
+            'memory_bytes': metrics_store.memory_bytes(),
+            'request_id': getattr(g, 'request_id', 'unknown'),
+            'success': True
+        })
+    
+    try:
+        until = parse_time_arg('until')
+        since = parse_time_arg('since', (until or time.time()) - HISTORY_DEFAULT_WINDOW)
+        points = request.args.get('points')
+        if points is not None:
+            if not points.isdigit() or int(points) < 1:
+                raise ValueError("points debe ser un entero mayor o igual que 1")
+            points = int(points)
+    except ValueError as e:
+        return jsonify({'error': str(e), 'success': False}), 400
+    
+    try:
+        result = metrics_store.query(metric, since, until, points)
+    except KeyError:
+        return jsonify({
+            'error': f'Métrica desconocida: {metric}',
+            'available': metrics_store.series_names(),
+            'success': False
+        }), 404
+    
+    # LTTB sobre el nivel elegido: el tamaño depende de N, no de la duración del rango
+    result = downsample(result, points)
+    
+    ts_list, value_list = to_json_columns(result['ts'], result['avg'])
+    response = {
+        'metric': metric,
+        'since': since,
+        'until': until,
+        'resolution': result['resolution'],
+        'count': len(ts_list),
+        'ts': ts_list,
+        'values': value_list,
+        'request_id': getattr(g, 'request_id', 'unknown'),
+        'success': True
+    }
+    if result['resolution']:
+        # Datos agregados: incluir también los extremos de cada bucket
+        response['min'] = to_json_columns(result['ts'], result['min'])[1]
+        response['max'] = to_json_columns(result['ts'], result['max'])[1]
+    return jsonify(response)
+
+@main_bp.route('/api/query')
+@jwt_required()
+@handle_exceptions
+def api_query():
+    """Agregado por rango (sum/avg/min/max/count/increase/rate/pNN) sin reescanear muestras"""
+    metric = request.args.get('metric')
+    fn = request.args.get('fn', 'avg')
+    try:
+        until = parse_time_arg('to')
+        since = parse_time_arg('from', (until or time.time()) - HISTORY_DEFAULT_WINDOW)
+        step = request.args.get('step', type=float)
+        if step is not None and step <= 0:
+            raise ValueError("step debe ser positivo")
+        result = metrics_store.aggregate(metric, fn, since, until, step)
+    except ValueError as e:
+        return jsonify({'error': str(e), 'success': False}), 400
+    except KeyError:
+        return jsonify({
+            'error': f'Métrica desconocida: {metric}',
+            'available': metrics_store.series_names(),
+            'success': False
+        }), 404
+    
+    return jsonify({
+        'metric': metric,
+        'fn': fn,
+        'from': result['from'],
+        'to': result['to'],
+        'step': step,
+        'ts': result['ts'],
+        'values': [None if value is None else round(value, 3) for value in result['values']],
+        'request_id': getattr(g, 'request_id', 'unknown'),
+        'success': True
+    })
+
+@main_bp.route('/api/processes')
+@jwt_required()
+@handle_exceptions
+def api_processes():
+    """Top-N de procesos por CPU, memoria o hilos"""
+    sort = request.args.get('sort', 'cpu')
+    if sort not in SORT_FIELDS:
+        return jsonify({'error': f"sort debe ser uno de {', '.join(SORT_FIELDS)}", 'success': False}), 400
+    limit = min(max(request.args.get('limit', 20, type=int), 1), PROCESS_TOP_MAX)
+    
+    # Muestra incremental con presupuesto fijo (se reutiliza si la anterior es reciente)
+    process_collector.sample()
+    processes, complete = process_collector.top(sort, limit)
+    return jsonify({
+        'processes': processes,
+        'sort': sort,
+        'total': process_collector.total,
+        'tracked': process_collector.tracked(),
+        'complete': complete,
+        'sample_ms': process_collector.sample_ms,
+        'request_id': getattr(g, 'request_id', 'unknown'),
+        'success': True
+    })
+
+@main_bp.route('/api/percentiles')
+@jwt_required()
+@handle_exceptions
+def api_percentiles():
+    """Percentiles p50/p95/p99 por ventana (5m, 1h, 24h) de métricas del host y latencias"""
+    metric = request.args.get('metric') or None
+    window = request.args.get('window') or None
+    output = request.args.get('format', 'summary')
+    if output not in ('summary', 'sketch'):
+        return jsonify({'error': "format debe ser 'summary' o 'sketch'", 'success': False}), 400
+    
+    hardware_sampler.get_snapshot()
+    try:
+        # Con PERCENTILE_SHARE_DIR las latencias son las de todos los workers; sin él, las de este
+        sketches, workers = shared_percentiles.sketches(metric, window)
+    except KeyError:
+        return jsonify({
+            'error': f'Métrica desconocida: {metric}',
+            'available': shared_percentiles.metric_names(),
+            'success': False
+        }), 404
+    
+    if output == 'sketch':
+        # Sketches serializados: fusionables entre workers y hosts con merge_exports()
+        data = {name: {label: sketch.to_dict() for label, sketch in windows.items()}
+                for name, windows in sketches.items()}
+    else:
+        data = summarize(sketches, percentiles.quantiles)
+    return jsonify({
+        'percentiles': data,
+        'format': output,
+        'scope': 'host' if shared_percentiles.enabled else 'worker',
+        'workers': workers,
+        'pid': os.getpid(),
+        'request_id': getattr(g, 'request_id', 'unknown'),
+        'success': True
+    })
+
+@main_bp.route('/api/stream')
+@jwt_required(locations=['headers', 'query_string'])
+def api_stream():
+    """Stream SSE de snapshots (EventSource no permite headers: token en ?jwt=)"""
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    
+    encoding = request.args.get('encoding', 'full')
+    if encoding not in ('full', 'delta'):
+        return jsonify({'error': "encoding debe ser 'full' o 'delta'", 'success': False}), 400
+    
+    # Asegurar que el sampler está publicando en este proceso
+    hardware_sampler.get_snapshot()
+    
+    subscription = stream_hub.subscribe(last_event_id, encoding)
+    if subscription is None:
+        return jsonify({
+            'error': 'Demasiados clientes de streaming conectados',
+            'request_id': getattr(g, 'request_id', 'unknown'),
+            'success': False
+        }), 503
+    
+    response = Response(stream_hub.stream(subscription), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Desactivar buffering en nginx
+    return response
+
+@main_bp.route('/api/stats/delta')
+@jwt_required()
+@handle_exceptions
+def api_stats_delta():
+    """Long-poll delta: cambios desde `since` o un keyframe si el cliente perdió la sincronía"""
+    since = request.args.get('since', type=int)
+    epoch = request.args.get('epoch')
+    if request.args.get('keyframe', '').lower() in ('1', 'true'):
+        since = None
+    if epoch and epoch != hardware_sampler.epoch:
+        # El cursor pertenece a otro espacio de secuencias (worker reciclado o sampler reiniciado)
+        since = None
+    wait = min(max(request.args.get('wait', 0, type=float), 0.0), STREAM_HEARTBEAT)
+    
+    hardware_sampler.get_snapshot()
+    if since is not None and wait:
+        stream_hub.wait_for_new(since, wait)
+    
+    message = stream_hub.delta_since(since)
+    if message is None:
+        # Sin muestras nuevas desde `since`
+        return '', 204
+    return jsonify(dict(message, epoch=hardware_sampler.epoch))
+
 # Endpoints individuales para lazy loading
 @main_bp.route('/api/cpu')
 @jwt_required()
 @handle_exceptions
 def api_cpu():
     """Endpoint específico para datos de CPU"""
-    cpu_data = sanitize_output(get_cpu_usage())
-    return jsonify({
-        'cpu': cpu_data,
+    snapshot = hardware_sampler.get_snapshot()
+    return snapshot_response(snapshot, lambda: (jsonify({
+        'cpu': snapshot.cpu,
+        'seq': snapshot.seq,
         'request_id': getattr(g, 'request_id', 'unknown'),
         'success': True
-    })
+    }), None))
 
 @main_bp.route('/api/ram')
 @jwt_required()
 @handle_exceptions
 def api_ram():
     """Endpoint específico para datos de RAM"""
-    ram_data = sanitize_output(get_ram_usage())
-    return jsonify({
-        'ram': ram_data,
+    snapshot = hardware_sampler.get_snapshot()
+    return snapshot_response(snapshot, lambda: (jsonify({
+        'ram': snapshot.ram,
+        'seq': snapshot.seq,
         'request_id': getattr(g, 'request_id', 'unknown'),
         'success': True
-    })
+    }), None))
 
 @main_bp.route('/api/disk')
 @jwt_required()
 @handle_exceptions
 def api_disk():
     """Endpoint específico para datos de disco"""
-    disk_data = sanitize_output(get_disk_usage())
-    return jsonify({
-        'disk': disk_data,
+    snapshot = hardware_sampler.get_snapshot()
+    return snapshot_response(snapshot, lambda: (jsonify({
+        'disk': snapshot.disk,
+        'seq': snapshot.seq,
         'request_id': getattr(g, 'request_id', 'unknown'),
         'success': True
-    })
+    }), None))
 
 @main_bp.route('/api/network')
 @jwt_required()
 @handle_exceptions
 def api_network():
     """Endpoint específico para datos de red"""
-    network_data = sanitize_output(get_network_stats())
-    return jsonify({
-        'network': network_data,
+    snapshot = hardware_sampler.get_snapshot()
+    return snapshot_response(snapshot, lambda: (jsonify({
+        'network': snapshot.network,
+        'seq': snapshot.seq,
         'request_id': getattr(g, 'request_id', 'unknown'),
         'success': True
-    }) 
\ No newline at end of file
+    }), None))
@@ -0,0 +1,259 @@
+"""
+Muestreador de hardware en segundo plano
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from app.shared_snapshot import SharedSnapshotReader, SHARED_SNAPSHOT_NAME, SHARED_SNAPSHOT_POLL
+from app.supervisor import collector_supervisor, CollectorUnavailable, mark_stale
+from app.utils import get_cpu_usage, get_ram_usage, get_disk_usage, get_network_stats, sanitize_output
+
+# Configuración desde variables de entorno
+UPDATE_INTERVAL = int(os.getenv('UPDATE_INTERVAL', 5000))  # Milisegundos
+SAMPLER_ENABLED = os.getenv('SAMPLER_ENABLED', 'true').lower() == 'true'
+COLLECTOR_POOL_SIZE = int(os.getenv('COLLECTOR_POOL_SIZE', 4))  # Hilos compartidos para recolectar en paralelo
+ON_DEMAND_BUDGET_MS = int(os.getenv('ON_DEMAND_BUDGET_MS', 1000))  # Presupuesto por defecto sin sampler
+
+COLLECTOR_GROUPS = (('cpu', get_cpu_usage), ('ram', get_ram_usage),
+                    ('disk', get_disk_usage), ('network', get_network_stats))
+
+# Snapshot inmutable: los diccionarios publicados no deben mutarse después de publicarse
+Snapshot = namedtuple('Snapshot', ['seq', 'timestamp', 'cpu', 'ram', 'disk', 'network'])
+
+class HardwareSampler:
+    """Muestreador único por proceso que publica snapshots consistentes de hardware"""
+
+    def __init__(self, interval_ms=UPDATE_INTERVAL, enabled=SAMPLER_ENABLED, shared_name=SHARED_SNAPSHOT_NAME,
+                 collectors=COLLECTOR_GROUPS, supervisor=collector_supervisor):
+        self.interval = max(0.1, interval_ms / 1000.0)
+        self.enabled = enabled
+        self.collectors = collectors
+        self.supervisor = supervisor
+        # Con un segmento compartido este proceso solo sigue al sampler del master
+        self.shared_name = shared_name
+        self._reader = SharedSnapshotReader(shared_name) if shared_name else None
+        self._snapshot = None
+        self._seq = 0
+        self._publish_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._listeners = []
+        self._pool = None
+        self._pool_pid = None
+        self._pool_lock = threading.Lock()
+        self._epoch = None
+        self._epoch_pid = None
+        self._last_notify = None  # time.monotonic() de la última muestra bajo demanda entregada
+
+    @property
+    def epoch(self):
+        """Identificador del espacio de secuencias: cambia si `seq` vuelve a empezar (otro proceso)"""
+        if self.shared_name:
+            # Todos los workers siguen al mismo master: misma secuencia
+            return self.shared_name
+        if self._epoch_pid != os.getpid():
+            self._epoch_pid = os.getpid()
+            self._epoch = f"{os.getpid():x}-{time.time_ns():x}"
+        return self._epoch
+
+    def add_listener(self, callback):
+        """Registrar un callback que recibe cada snapshot publicado (idempotente)"""
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+
+    def _collect_group(self, name, func):
+        """Recolectar un grupo con plazo; si falla o se cuelga se sirve el último valor bueno"""
+        try:
+            value, age = self.supervisor.call(name, func, failed=lambda data: 'error' in data)
+        except CollectorUnavailable as e:
+            logging.error(f"Recolector {name} sin datos: {e}")
+            return {'usage': -1, 'error': str(e)}
+        return mark_stale(value, age)
+
+    def _executor(self):
+        """Pool compartido y acotado (se recrea tras un fork: los hilos no sobreviven)"""
+        with self._pool_lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ThreadPoolExecutor(max_workers=COLLECTOR_POOL_SIZE, thread_name_prefix='collector')
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def collect(self, budget_ms=None):
+        """Recolectar los cuatro grupos en paralelo con un timestamp único y presupuesto opcional"""
+        timestamp = time.time()
+
+        # La latencia total es la del recolector más lento, no la suma
+        pool = self._executor()
+        futures = {name: pool.submit(self._collect_group, name, func) for name, func in self.collectors}
+        wait(futures.values(), timeout=budget_ms / 1000.0 if budget_ms is not None else None)
+
+        groups = []
+        for name, future in futures.items():
+            if future.done():
+                data = sanitize_output(future.result())
+            else:
+                # Sigue en curso: su resultado actualiza el último valor bueno del supervisor
+                data = {'usage': -1, 'error': f'Fuera del presupuesto de {budget_ms:g} ms', 'missing': True}
+            data['timestamp'] = timestamp
+            groups.append(data)
+        return timestamp, groups
+
+    def sample_once(self, budget_ms=None, notify=True):
+        """Tomar una muestra y publicarla como nuevo snapshot"""
+        timestamp, (cpu, ram, disk, network) = self.collect(budget_ms)
+        with self._publish_lock:
+            self._seq += 1
+            snapshot = Snapshot(self._seq, timestamp, cpu, ram, disk, network)
+            # Publicación atómica: los lectores solo ven el snapshot completo
+            self._snapshot = snapshot
+        if notify:
+            self._notify(snapshot)
+        return snapshot
+
+    def _due_on_demand(self, snapshot):
+        """Bajo demanda solo se entrega a los consumidores una muestra completa por intervalo"""
+        if any(getattr(snapshot, name).get('missing') for name in ('cpu', 'ram', 'disk', 'network')):
+            return False
+        now = time.monotonic()
+        with self._publish_lock:
+            if self._last_notify is not None and now - self._last_notify < self.interval:
+                return False
+            self._last_notify = now
+            return True
+
+    def follow_shared(self):
+        """Adoptar el snapshot compartido si el master publicó uno nuevo"""
+        result = self._reader.read()
+        if result is None or result[0] == self._seq:
+            return None
+
+        seq, timestamp, payload = result
+        with self._publish_lock:
+            self._seq = seq
+            snapshot = Snapshot(seq, timestamp, payload['cpu'], payload['ram'],
+                                payload['disk'], payload['network'])
+            self._snapshot = snapshot
+        self._notify(snapshot)
+        return snapshot
+
+    def _notify(self, snapshot):
+        """Entregar el snapshot a los consumidores registrados"""
+        for callback in list(self._listeners):
+            try:
+                callback(snapshot)
+            except Exception as e:
+                logging.error(f"Error en consumidor del sampler {getattr(callback, '__name__', callback)}: {e}")
+
+    def start(self):
+        """Iniciar el hilo de muestreo (idempotente y seguro tras fork)"""
+        if not self.enabled or self.is_running():
+            return
+
+        self._pid = os.getpid()
+        self._stop_event.clear()
+        if self._reader is not None:
+            self.follow_shared()
+            self._thread = threading.Thread(target=self._follow, name='hardware-follower', daemon=True)
+            self._thread.start()
+            logging.info(f"Sampler de hardware siguiendo el snapshot compartido '{self._reader.name}' (pid {self._pid})")
+            return
+
+        if self._snapshot is None:
+            # Primera muestra síncrona para que los endpoints nunca vean un snapshot vacío
+            self.sample_once()
+
+        self._thread = threading.Thread(target=self._run, name='hardware-sampler', daemon=True)
+        self._thread.start()
+        logging.info(f"Sampler de hardware iniciado (intervalo {self.interval}s, pid {self._pid})")
+
+    def stop(self, timeout=None):
+        """Detener el hilo de muestreo"""
+        self._stop_event.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout)
+        self._thread = None
+
+    def is_running(self):
+        """Indica si el hilo de muestreo está vivo en este proceso"""
+        # Tras un fork (gunicorn --preload) el hilo no existe en el proceso hijo
+        return (self._thread is not None
+                and self._pid == os.getpid()
+                and self._thread.is_alive())
+
+    def get_snapshot(self, budget_ms=ON_DEMAND_BUDGET_MS):
+        """Obtener el último snapshot publicado"""
+        if not self.enabled:
+            # Sin muestreo en segundo plano: recolectar bajo demanda dentro del presupuesto. El
+            # historial, los sketches y el SSE siguen la cadencia del intervalo, no la de los requests
+            snapshot = self.sample_once(budget_ms, notify=False)
+            if self._due_on_demand(snapshot):
+                self._notify(snapshot)
+            return snapshot
+
+        if not self.is_running():
+            self.start()
+        if self._snapshot is None:
+            # El proceso de muestreo aún no publicó: muestra local sin publicar (seq 0)
+            timestamp, (cpu, ram, disk, network) = self.collect(budget_ms)
+            return Snapshot(0, timestamp, cpu, ram, disk, network)
+        return self._snapshot
+
+    def _run(self):
+        """Bucle de muestreo con cadencia fija"""
+        next_deadline = time.monotonic() + self.interval
+        while not self._stop_event.wait(max(0.0, next_deadline - time.monotonic())):
+            try:
+                self.sample_once()
+            except Exception as e:
+                logging.error(f"Error en el sampler de hardware: {e}")
+
+            next_deadline += self.interval
+            now = time.monotonic()
+            if next_deadline < now:
+                # Si una muestra tardó más que el intervalo, no acumular atrasos
+                next_deadline = now + self.interval
+
+    def _follow(self):
+        """Bucle que sondea el segmento compartido (solo lectura de la cabecera si no cambia)"""
+        while not self._stop_event.wait(SHARED_SNAPSHOT_POLL):
+            try:
+                self.follow_shared()
+            except Exception as e:
+                logging.error(f"Error leyendo el snapshot compartido: {e}")
+
+def run_shared_sampler(name, stop_event, parent_pid=None):
+    """Cuerpo del proceso dedicado que muestrea el host, publica en `name` y escribe el historial
+
+    Corre en un proceso propio para que el master de Gunicorn no tenga hilos (ni locks tomados)
+    cuando hace fork de los workers.
+    """
+    from app.persistence import history_segments
+    from app.shared_snapshot import SharedSnapshotWriter
+
+    writer = SharedSnapshotWriter(name)
+    # Sin nombre compartido: este proceso recolecta de verdad, no se sigue a sí mismo
+    sampler = HardwareSampler(shared_name='')
+    sampler.add_listener(writer.publish)
+    if history_segments.enabled:
+        # Solo este proceso escribe el historial en disco
+        sampler.add_listener(history_segments.append_snapshot)
+    sampler.start()
+    logging.info(f"Snapshot compartido '{name}' publicado por el proceso de muestreo (pid {os.getpid()})")
+    try:
+        while not stop_event.wait(1.0):
+            if parent_pid is not None and os.getppid() != parent_pid:
+                logging.warning("El master terminó: deteniendo el proceso de muestreo")
+                break
+    finally:
+        sampler.stop(timeout=5)
+        writer.close()
+        history_segments.close()
+
+# Instancia global para uso en la aplicación
+hardware_sampler = HardwareSampler()
@@ -0,0 +1,119 @@
+"""
+Snapshot compartido entre workers mediante memoria compartida y seqlock
+"""
+
+import json
+import logging
+import os
+import struct
+import time
+from multiprocessing import shared_memory
+
+# Configuración desde variables de entorno
+SHARED_SNAPSHOT_NAME = os.getenv('SHARED_SNAPSHOT_NAME', '')
+SHARED_SNAPSHOT_SIZE = int(os.getenv('SHARED_SNAPSHOT_SIZE', 256 * 1024))  # Bytes de payload
+SHARED_SNAPSHOT_POLL = float(os.getenv('SHARED_SNAPSHOT_POLL', 0.05))  # Segundos
+
+# Layout binario fijo de la cabecera (little endian, 32 bytes):
+#   generation u64 | seq u64 | timestamp f64 | length u32 | writer_pid u32
+# seguido de `length` bytes de payload JSON. `generation` es el contador del
+# seqlock: impar mientras el writer escribe, par cuando el contenido es consistente.
+# Solo la cabecera tiene layout fijo y se lee sin copias en cada sondeo: el snapshot
+# tiene forma variable (núcleos, particiones, interfaces, errores por grupo), así que el
+# cuerpo va en JSON y cada worker lo decodifica una única vez por `seq` nueva.
+GENERATION = struct.Struct('<Q')
+HEADER = struct.Struct('<QQdII')
+SEQLOCK_RETRIES = 100
+
+class SharedSnapshotWriter:
+    """Escritor único (proceso master) que publica cada snapshot en el segmento"""
+
+    def __init__(self, name, size=SHARED_SNAPSHOT_SIZE):
+        self.name = name
+        self.capacity = size
+        self._shm = shared_memory.SharedMemory(name=name, create=True, size=HEADER.size + size)
+        HEADER.pack_into(self._shm.buf, 0, 0, 0, 0.0, 0, os.getpid())
+
+    def write(self, seq, timestamp, payload):
+        """Escribir un payload bajo el seqlock"""
+        body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        if len(body) > self.capacity:
+            logging.error(f"Snapshot de {len(body)} bytes excede el segmento compartido ({self.capacity})")
+            return False
+
+        buf = self._shm.buf
+        generation = GENERATION.unpack_from(buf, 0)[0]
+        GENERATION.pack_into(buf, 0, generation + 1)  # Impar: escritura en curso
+        buf[HEADER.size:HEADER.size + len(body)] = body
+        HEADER.pack_into(buf, 0, generation + 1, seq, timestamp, len(body), os.getpid())
+        GENERATION.pack_into(buf, 0, generation + 2)  # Par: contenido consistente
+        return True
+
+    def publish(self, snapshot):
+        """Publicar un snapshot del sampler (callback)"""
+        self.write(snapshot.seq, snapshot.timestamp, snapshot._asdict())
+
+    def close(self, unlink=True):
+        """Liberar el segmento (el master lo elimina al terminar)"""
+        self._shm.close()
+        if unlink:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+
+class SharedSnapshotReader:
+    """Lector sin copias de la cabecera; el payload solo se decodifica si cambia la secuencia"""
+
+    def __init__(self, name):
+        self.name = name
+        self._shm = None
+        self._cached = None
+
+    def _attach(self):
+        """Adjuntarse al segmento (puede no existir aún durante el arranque)"""
+        if self._shm is None:
+            try:
+                self._shm = shared_memory.SharedMemory(name=self.name)
+            except FileNotFoundError:
+                return None
+        return self._shm.buf
+
+    def current_seq(self):
+        """Secuencia publicada leída directamente de la memoria compartida"""
+        buf = self._attach()
+        if buf is None:
+            return 0
+        return HEADER.unpack_from(buf, 0)[1]
+
+    def read(self):
+        """Leer (seq, timestamp, payload) consistente; None si aún no hay datos"""
+        buf = self._attach()
+        if buf is None:
+            return None
+
+        for _ in range(SEQLOCK_RETRIES):
+            generation, seq, timestamp, length, _ = HEADER.unpack_from(buf, 0)
+            if generation & 1:
+                # El writer está a mitad de escritura: reintentar
+                time.sleep(0)
+                continue
+            if seq == 0:
+                return None
+            cached = self._cached is not None and self._cached[0] == seq
+            body = None if cached else bytes(buf[HEADER.size:HEADER.size + length])
+            if GENERATION.unpack_from(buf, 0)[0] == generation:
+                break
+        else:
+            logging.warning("Snapshot compartido inconsistente tras varios reintentos")
+            return self._cached
+
+        if body is not None:
+            self._cached = (seq, timestamp, json.loads(body))
+        return self._cached
+
+    def close(self):
+        """Soltar la referencia al segmento sin eliminarlo"""
+        if self._shm is not None:
+            self._shm.close()
+            self._shm = None
@@ -0,0 +1,366 @@
+"""
+Percentiles en streaming con DDSketch por ventanas deslizantes (fusionables entre procesos)
+"""
+
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from app.rollups import parse_tiers
+
+# Configuración desde variables de entorno
+PERCENTILE_ACCURACY = float(os.getenv('PERCENTILE_ACCURACY', 0.01))  # Error relativo garantizado
+PERCENTILE_MAX_BINS = int(os.getenv('PERCENTILE_MAX_BINS', 1024))  # Memoria máxima por sketch
+# ventana_s:sub-sketches (por defecto 5 min, 1 h y 24 h)
+PERCENTILE_WINDOWS = parse_tiers(os.getenv('PERCENTILE_WINDOWS', '300:10,3600:12,86400:24'))
+PERCENTILE_QUANTILES = (0.5, 0.95, 0.99)
+# Directorio común donde cada worker vuelca sus latencias (vacío: percentiles del propio worker)
+PERCENTILE_SHARE_DIR = os.getenv('PERCENTILE_SHARE_DIR', '')
+PERCENTILE_SHARE_INTERVAL = float(os.getenv('PERCENTILE_SHARE_INTERVAL', 5))  # Segundos entre volcados
+PERCENTILE_SHARE_TTL = float(os.getenv('PERCENTILE_SHARE_TTL', 60))  # Volcados más viejos: worker muerto
+
+# Métricas del host que se resumen en cada snapshot del sampler
+PERCENTILE_HOST_METRICS = (('cpu', 'usage'), ('cpu', 'iowait'), ('ram', 'usage'), ('disk', 'usage'))
+
+# Valores por debajo de este umbral (incluidos 0 y negativos) van al bucket cero
+MIN_INDEXABLE_VALUE = 1e-9
+
+def window_label(seconds):
+    """Etiqueta legible de una ventana: 300 -> '5m', 3600 -> '1h'"""
+    if seconds % 3600 == 0:
+        return f"{seconds // 3600}h"
+    if seconds % 60 == 0:
+        return f"{seconds // 60}m"
+    return f"{seconds}s"
+
+def quantile_label(quantile):
+    """Etiqueta de un cuantil: 0.95 -> 'p95', 0.999 -> 'p99.9'"""
+    return f"p{quantile * 100:g}"
+
+class DDSketch:
+    """Sketch de cuantiles con error relativo acotado y buckets logarítmicos"""
+
+    def __init__(self, relative_accuracy=PERCENTILE_ACCURACY, max_bins=PERCENTILE_MAX_BINS):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.max_bins = max_bins
+        self.bins = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _index(self, value):
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _value(self, index):
+        """Representante del bucket con error relativo <= relative_accuracy"""
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def add(self, value, count=1):
+        """Añadir una observación en O(1)"""
+        if value != value:
+            return
+        if value < MIN_INDEXABLE_VALUE:
+            self.zero_count += count
+        else:
+            index = self._index(value)
+            self.bins[index] = self.bins.get(index, 0) + count
+            if len(self.bins) > self.max_bins:
+                self._collapse()
+        self.count += count
+        self.sum += value * count
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def extend(self, values):
+        """Añadir un array de observaciones en bloque (vectorizado, ignora NaN)"""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        indexable = values >= MIN_INDEXABLE_VALUE
+        indexes, counts = np.unique(np.ceil(np.log(values[indexable]) / self._log_gamma).astype(np.int64),
+                                    return_counts=True)
+        for index, count in zip(indexes.tolist(), counts.tolist()):
+            self.bins[index] = self.bins.get(index, 0) + count
+        if len(self.bins) > self.max_bins:
+            self._collapse()
+        self.zero_count += int(len(values) - indexable.sum())
+        self.count += len(values)
+        self.sum += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def _collapse(self):
+        """Fusionar los buckets más bajos: los cuantiles altos conservan su precisión"""
+        keys = sorted(self.bins)
+        excess = len(keys) - self.max_bins
+        target = keys[excess]
+        for key in keys[:excess]:
+            self.bins[target] += self.bins.pop(key)
+
+    def merge(self, other):
+        """Fusionar otro sketch con la misma precisión (sin datos crudos)"""
+        if abs(other.gamma - self.gamma) > 1e-12:
+            raise ValueError("Solo se pueden fusionar sketches con la misma precisión relativa")
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        if len(self.bins) > self.max_bins:
+            self._collapse()
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, quantile):
+        """Estimar un cuantil (None si no hay observaciones)"""
+        if not self.count:
+            return None
+        rank = quantile * (self.count - 1)
+        if rank < self.zero_count:
+            return self.min
+        seen = self.zero_count
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                return min(max(self._value(index), self.min), self.max)
+        return self.max
+
+    def to_dict(self):
+        """Representación serializable para fusionar entre workers u hosts"""
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'bins': {str(index): count for index, count in self.bins.items()},
+            'zero_count': self.zero_count,
+            'count': self.count,
+            'sum': self.sum,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data, max_bins=PERCENTILE_MAX_BINS):
+        """Reconstruir un sketch exportado con to_dict()"""
+        sketch = cls(data['relative_accuracy'], max_bins)
+        sketch.bins = {int(index): count for index, count in data['bins'].items()}
+        sketch.zero_count = data['zero_count']
+        sketch.count = data['count']
+        sketch.sum = data['sum']
+        if sketch.count:
+            sketch.min = data['min']
+            sketch.max = data['max']
+        return sketch
+
+class WindowedSketch:
+    """Ventana deslizante formada por sub-sketches de duración fija (memoria acotada)"""
+
+    def __init__(self, window, slices, relative_accuracy=PERCENTILE_ACCURACY, max_bins=PERCENTILE_MAX_BINS):
+        self.window = window
+        self.slice_seconds = window / max(1, slices)
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self._slices = deque(maxlen=max(1, slices))  # (inicio, sketch)
+
+    def add(self, value, timestamp):
+        """Añadir al sub-sketch del instante (abre uno nuevo al cambiar de tramo)"""
+        start = timestamp - timestamp % self.slice_seconds
+        if not self._slices or start > self._slices[-1][0]:
+            self._slices.append((start, DDSketch(self.relative_accuracy, self.max_bins)))
+        self._slices[-1][1].add(value)
+
+    def merged(self, now):
+        """Sketch de la ventana que termina en `now` (granularidad de un tramo)"""
+        result = DDSketch(self.relative_accuracy, self.max_bins)
+        for start, sketch in self._slices:
+            if start + self.slice_seconds > now - self.window:
+                result.merge(sketch)
+        return result
+
+class PercentileRegistry:
+    """Sketches por métrica y ventana, actualizados por muestra o por request"""
+
+    def __init__(self, windows=PERCENTILE_WINDOWS, quantiles=PERCENTILE_QUANTILES,
+                 relative_accuracy=PERCENTILE_ACCURACY, max_bins=PERCENTILE_MAX_BINS):
+        self.windows = list(windows)
+        self.quantiles = tuple(quantiles)
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def metric_names(self):
+        """Métricas con observaciones"""
+        return sorted(self._metrics)
+
+    def observe(self, name, value, timestamp=None):
+        """Registrar una observación en todas las ventanas"""
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            windows = self._metrics.get(name)
+            if windows is None:
+                windows = self._metrics[name] = {
+                    window_label(window): WindowedSketch(window, slices, self.relative_accuracy, self.max_bins)
+                    for window, slices in self.windows
+                }
+            for sketch in windows.values():
+                sketch.add(value, timestamp)
+
+    def observe_snapshot(self, snapshot):
+        """Registrar las métricas del host de un snapshot (callback del sampler)"""
+        for group_name, field in PERCENTILE_HOST_METRICS:
+            group = getattr(snapshot, group_name)
+            value = group.get(field)
+            if 'error' not in group and isinstance(value, (int, float)) and value >= 0:
+                self.observe(f'{group_name}.{field}', value, snapshot.timestamp)
+
+    def sketches(self, name=None, window=None, now=None):
+        """Sketches fusionados por ventana: {métrica: {ventana: DDSketch}}"""
+        now = time.time() if now is None else now
+        with self._lock:
+            names = [name] if name is not None else list(self._metrics)
+            result = {}
+            for metric in names:
+                windows = self._metrics.get(metric)
+                if windows is None:
+                    raise KeyError(metric)
+                result[metric] = {label: sketch.merged(now) for label, sketch in windows.items()
+                                  if window is None or label == window}
+            return result
+
+    def summary(self, name=None, window=None, now=None):
+        """Cuantiles por métrica y ventana"""
+        return summarize(self.sketches(name, window, now), self.quantiles)
+
+    def export(self, name=None, window=None, now=None):
+        """Sketches serializados para fusionarlos en otro proceso u host"""
+        return {metric: {label: sketch.to_dict() for label, sketch in windows.items()}
+                for metric, windows in self.sketches(name, window, now).items()}
+
+def summarize(sketches, quantiles=PERCENTILE_QUANTILES):
+    """Convertir {métrica: {ventana: DDSketch}} en cuantiles JSON"""
+    summary = {}
+    for metric, windows in sketches.items():
+        summary[metric] = {}
+        for label, sketch in windows.items():
+            entry = {'count': sketch.count}
+            if sketch.count:
+                entry.update({quantile_label(q): round(sketch.quantile(q), 3) for q in quantiles})
+                entry['min'] = round(sketch.min, 3)
+                entry['max'] = round(sketch.max, 3)
+                entry['mean'] = round(sketch.sum / sketch.count, 3)
+            summary[metric][label] = entry
+    return summary
+
+def merge_exports(exports):
+    """Fusionar exportaciones de varios workers u hosts en {métrica: {ventana: DDSketch}}"""
+    merged = {}
+    for export in exports:
+        for metric, windows in export.items():
+            target = merged.setdefault(metric, {})
+            for label, data in windows.items():
+                sketch = DDSketch.from_dict(data)
+                if label in target:
+                    target[label].merge(sketch)
+                else:
+                    target[label] = sketch
+    return merged
+
+class SharedPercentiles:
+    """Latencias de todos los workers: cada uno vuelca su exportación y la consulta las fusiona"""
+
+    # Las métricas del host son idénticas en todos los workers (mismo snapshot): solo se comparten latencias
+    PREFIX = 'latency.'
+
+    def __init__(self, registry, directory=PERCENTILE_SHARE_DIR, interval=PERCENTILE_SHARE_INTERVAL,
+                 ttl=PERCENTILE_SHARE_TTL):
+        self.registry = registry
+        self.directory = directory
+        self.interval = interval
+        self.ttl = ttl
+        self._published = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self.directory)
+
+    def publish(self, now=None, force=False):
+        """Volcar las latencias de este worker (como mucho una vez por intervalo salvo `force`)"""
+        if not self.enabled:
+            return
+        now = time.time() if now is None else now
+        with self._lock:
+            if not force and now - self._published < self.interval:
+                return
+            self._published = now
+            names = [name for name in self.registry.metric_names() if name.startswith(self.PREFIX)]
+            export = {}
+            for name in names:
+                export.update(self.registry.export(name, now=now))
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"{os.getpid()}.json")
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(export, f, separators=(',', ':'))
+            os.replace(path + '.tmp', path)
+
+    def publish_snapshot(self, snapshot):
+        """Volcado periódico aunque el worker no reciba requests (callback del sampler)"""
+        self.publish(snapshot.timestamp)
+
+    def _exports(self, now):
+        """Volcados vigentes de todos los workers (los caducados se borran)"""
+        exports = []
+        for filename in os.listdir(self.directory):
+            if not filename.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, filename)
+            try:
+                if os.stat(path).st_mtime < now - self.ttl:
+                    os.remove(path)
+                    continue
+                with open(path, 'r', encoding='utf-8') as f:
+                    exports.append(json.load(f))
+            except (OSError, ValueError) as e:
+                logging.warning(f"Ignorando volcado de percentiles {filename}: {e}")
+        return exports
+
+    def sketches(self, name=None, window=None, now=None):
+        """Como PercentileRegistry.sketches, con las latencias fusionadas de todos los workers vivos"""
+        if not self.enabled:
+            return self.registry.sketches(name, window, now), 1
+        now = time.time() if now is None else now
+        self.publish(now, force=True)
+        exports = self._exports(now)
+        merged = merge_exports(exports)
+        names = [name] if name is not None else sorted(set(self.registry.metric_names()) | set(merged))
+        result = {}
+        for metric in names:
+            if not metric.startswith(self.PREFIX):
+                result.update(self.registry.sketches(metric, window, now))
+            elif metric in merged:
+                result[metric] = {label: sketch for label, sketch in merged[metric].items()
+                                  if window is None or label == window}
+            else:
+                raise KeyError(metric)
+        return result, len(exports)
+
+    def metric_names(self):
+        """Métricas con observaciones en este worker o en los volcados de los demás"""
+        if not self.enabled:
+            return self.registry.metric_names()
+        return sorted(set(self.registry.metric_names()) | set(merge_exports(self._exports(time.time()))))
+
+# Instancias globales para uso en la aplicación
+percentiles = PercentileRegistry()
+shared_percentiles = SharedPercentiles(percentiles)
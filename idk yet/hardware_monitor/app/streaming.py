@@ -0,0 +1,221 @@
+"""
+Difusión de snapshots a clientes mediante Server-Sent Events
+"""
+
+import json
+import logging
+import os
+import threading
+from collections import deque, namedtuple
+
+from app.delta import DeltaEncoder, merge_patches
+
+# Configuración desde variables de entorno
+STREAM_QUEUE_SIZE = int(os.getenv('STREAM_QUEUE_SIZE', 16))  # Eventos pendientes por cliente
+STREAM_REPLAY_SIZE = int(os.getenv('STREAM_REPLAY_SIZE', 120))  # Eventos recientes para reanudar
+STREAM_HEARTBEAT = float(os.getenv('STREAM_HEARTBEAT', 15))  # Segundos
+WEB_THREADS = int(os.getenv('WEB_THREADS', 32))  # Hilos gthread por worker (gunicorn.conf.py)
+STREAM_RESERVED_THREADS = int(os.getenv('STREAM_RESERVED_THREADS', WEB_THREADS // 2))
+
+def stream_client_limit(threads, reserved, requested=None):
+    """Clientes SSE por worker: cada uno ocupa un hilo y se reservan `reserved` para el resto de requests"""
+    available = max(1, threads - reserved)
+    return available if requested is None else max(1, min(requested, available))
+
+STREAM_MAX_CLIENTS = stream_client_limit(WEB_THREADS, STREAM_RESERVED_THREADS,
+                                         int(os.getenv('STREAM_MAX_CLIENTS', WEB_THREADS)))
+STREAM_RETRY_MS = int(os.getenv('STREAM_RETRY_MS', 3000))
+
+SNAPSHOT_GROUPS = ('cpu', 'ram', 'disk', 'network')
+
+# Variantes de un mismo evento, serializadas una sola vez por muestra
+StreamEvent = namedtuple('StreamEvent', ['seq', 'sample', 'keyframe', 'delta',
+                                         'is_keyframe', 'keyframe_message', 'delta_message'])
+
+def snapshot_payload(snapshot):
+    """Representación JSON-serializable de un snapshot"""
+    return {
+        'seq': snapshot.seq,
+        'timestamp': snapshot.timestamp,
+        'cpu': snapshot.cpu,
+        'ram': snapshot.ram,
+        'disk': snapshot.disk,
+        'network': snapshot.network,
+    }
+
+def format_event(seq, data, event='sample'):
+    """Formatear un evento SSE con id igual a la secuencia del snapshot"""
+    return f"id: {seq}\nevent: {event}\ndata: {data}\n\n"
+
+class Subscription:
+    """Cola acotada de un cliente: si se llena se descarta el evento más antiguo"""
+
+    def __init__(self, maxlen=STREAM_QUEUE_SIZE, encoding='full', last_seq=None):
+        self._queue = deque(maxlen=maxlen)
+        self._condition = threading.Condition()
+        self.encoding = encoding
+        self.last_seq = last_seq  # Último evento que el cliente tiene aplicado
+        self.dropped = 0
+        self.closed = False
+
+    def push(self, event):
+        """Encolar un evento sin bloquear al publicador"""
+        with self._condition:
+            if len(self._queue) == self._queue.maxlen:
+                self.dropped += 1
+            self._queue.append(event)
+            self._condition.notify()
+
+    def get(self, timeout):
+        """Esperar el siguiente evento (None si vence el timeout o se cerró)"""
+        with self._condition:
+            if not self._queue and not self.closed:
+                self._condition.wait(timeout)
+            if self._queue:
+                return self._queue.popleft()
+            return None
+
+    def close(self):
+        """Despertar al consumidor para que termine"""
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+class BroadcastHub:
+    """Hub único que serializa cada muestra una vez y la reparte a todos los clientes"""
+
+    def __init__(self, queue_size=STREAM_QUEUE_SIZE, replay_size=STREAM_REPLAY_SIZE,
+                 max_clients=STREAM_MAX_CLIENTS):
+        self.queue_size = queue_size
+        self.max_clients = max_clients
+        self._subscribers = set()
+        self._replay = deque(maxlen=replay_size)
+        self._lock = threading.Lock()
+        self._new_event = threading.Condition(self._lock)
+        self._encoder = DeltaEncoder()
+
+    def client_count(self):
+        """Número de clientes conectados"""
+        return len(self._subscribers)
+
+    def publish(self, snapshot):
+        """Difundir un snapshot (callback del sampler)"""
+        payload = snapshot_payload(snapshot)
+        groups = {name: payload[name] for name in SNAPSHOT_GROUPS}
+        with self._lock:
+            if self._replay and snapshot.seq <= self._replay[-1].seq:
+                # La secuencia volvió a empezar (otro sampler): los eventos anteriores ya no encadenan
+                self._replay.clear()
+                self._encoder = DeltaEncoder()
+            keyframe, delta, is_keyframe = self._encoder.encode(snapshot.seq, snapshot.timestamp, groups)
+            event = StreamEvent(
+                snapshot.seq,
+                format_event(snapshot.seq, json.dumps(payload, separators=(',', ':'))),
+                format_event(snapshot.seq, json.dumps(keyframe, separators=(',', ':')), 'keyframe'),
+                format_event(snapshot.seq, json.dumps(delta, separators=(',', ':')), 'delta') if delta else None,
+                is_keyframe,
+                keyframe,
+                delta
+            )
+            self._replay.append(event)
+            subscribers = list(self._subscribers)
+            self._new_event.notify_all()
+        for subscription in subscribers:
+            subscription.push(event)
+
+    def subscribe(self, last_event_id=None, encoding='full'):
+        """Registrar un cliente; con Last-Event-ID se reenvían los eventos perdidos"""
+        with self._lock:
+            if len(self._subscribers) >= self.max_clients:
+                return None
+            subscription = Subscription(self.queue_size, encoding, last_event_id)
+            if last_event_id is None or (self._replay and last_event_id > self._replay[-1].seq):
+                # Cliente nuevo (o con un id de una secuencia anterior): empezar por el más reciente
+                backlog = list(self._replay)[-1:]
+            else:
+                backlog = [event for event in self._replay if event.seq > last_event_id]
+            for event in backlog:
+                subscription.push(event)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Eliminar un cliente del hub"""
+        with self._lock:
+            self._subscribers.discard(subscription)
+        subscription.close()
+
+    def wait_for_new(self, since, timeout):
+        """Esperar (long-poll) hasta que exista un evento posterior a `since`"""
+        with self._new_event:
+            return self._new_event.wait_for(
+                lambda: self._replay and self._replay[-1].seq > since, timeout)
+
+    def delta_since(self, since=None):
+        """Mensaje para un cliente con estado en `since`: delta compuesto o keyframe"""
+        with self._lock:
+            events = list(self._replay)
+        if not events:
+            return None
+        latest = events[-1]
+        if since is not None and since > latest.seq:
+            # Cursor de una secuencia anterior (reinicio del sampler): resincronizar
+            return latest.keyframe_message
+        if since == latest.seq:
+            return None
+
+        chain = [event for event in events if since is not None and event.seq > since]
+        base = since
+        changes = {}
+        for event in chain:
+            if event.delta_message is None or event.delta_message['base'] != base:
+                # Eslabón perdido (fuera del replay o reinicio): resincronizar con keyframe
+                return latest.keyframe_message
+            changes = merge_patches(changes, event.delta_message['changes'])
+            base = event.seq
+        if not chain:
+            return latest.keyframe_message
+        return {'type': 'delta', 'seq': latest.seq, 'base': since,
+                'timestamp': latest.keyframe_message['timestamp'], 'changes': changes}
+
+    def render(self, subscription, event):
+        """Texto SSE adecuado para el cliente según su codificación"""
+        if subscription.encoding != 'delta':
+            return event.sample
+        if (event.delta is not None and not event.is_keyframe
+                and event.delta_message['base'] == subscription.last_seq):
+            text = event.delta
+        else:
+            # Primer evento, keyframe periódico o cadena rota por descartes
+            text = event.keyframe
+        subscription.last_seq = event.seq
+        return text
+
+    def close_all(self):
+        """Cerrar todas las conexiones (shutdown)"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self._subscribers.clear()
+        for subscription in subscribers:
+            subscription.close()
+
+    def stream(self, subscription, heartbeat=STREAM_HEARTBEAT):
+        """Generador SSE para una respuesta Flask"""
+        try:
+            yield f"retry: {STREAM_RETRY_MS}\n\n"
+            while not subscription.closed:
+                event = subscription.get(heartbeat)
+                if event is None and subscription.closed:
+                    break
+                if event is None:
+                    # Comentario SSE: mantiene viva la conexión a través de proxies
+                    yield ": heartbeat\n\n"
+                else:
+                    yield self.render(subscription, event)
+        finally:
+            self.unsubscribe(subscription)
+            if subscription.dropped:
+                logging.info(f"Cliente SSE desconectado con {subscription.dropped} eventos descartados")
+
+# Instancia global para uso en la aplicación
+stream_hub = BroadcastHub()
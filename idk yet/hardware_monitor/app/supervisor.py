@@ -0,0 +1,171 @@
+"""
+Supervisión de recolectores: plazo por recolector, cuarentena con backoff y último valor bueno
+"""
+
+import logging
+import os
+import threading
+import time
+
+# Configuración desde variables de entorno
+COLLECTOR_DEADLINE_MS = int(os.getenv('COLLECTOR_DEADLINE_MS', 1000))  # Plazo por recolector
+COLLECTOR_BACKOFF_BASE = float(os.getenv('COLLECTOR_BACKOFF_BASE', 5))  # Segundos
+COLLECTOR_BACKOFF_MAX = float(os.getenv('COLLECTOR_BACKOFF_MAX', 300))  # Segundos
+
+class CollectorUnavailable(Exception):
+    """El recolector falló y todavía no hay un valor bueno que servir"""
+
+class _Call:
+    """Llamada a un recolector; quien llegue mientras está en curso espera su resultado"""
+
+    def __init__(self):
+        self.thread = None
+        self.settled = threading.Event()  # Resultado decidido (a tiempo o al vencer su plazo)
+        self.outcome = None  # (valor, antigüedad) o la excepción a relanzar
+
+class _CollectorState:
+    """Estado de un recolector: último valor bueno, fallos y llamada en curso"""
+
+    def __init__(self):
+        self.value = None
+        self.updated = None  # time.time() del último valor bueno
+        self.failures = 0
+        self.quarantined_until = 0.0
+        self.last_error = None
+        self.inflight = None  # Última llamada (su hilo puede seguir colgado)
+        self.lock = threading.Lock()  # Serializa las llamadas al mismo recolector
+
+class CollectorSupervisor:
+    """Ejecuta cada recolector en un hilo aparte con plazo; los colgados no bloquean al llamador"""
+
+    def __init__(self, deadline_ms=COLLECTOR_DEADLINE_MS, backoff_base=COLLECTOR_BACKOFF_BASE,
+                 backoff_max=COLLECTOR_BACKOFF_MAX):
+        self.deadline = deadline_ms / 1000.0
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def _state(self, name):
+        with self._lock:
+            state = self._states.get(name)
+            if state is None:
+                state = self._states[name] = _CollectorState()
+            return state
+
+    def _quarantine(self, name, state, error):
+        """Registrar un fallo y aplazar el próximo intento con backoff exponencial"""
+        state.failures += 1
+        state.last_error = error
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (state.failures - 1))
+        state.quarantined_until = time.monotonic() + delay
+        logging.warning(f"Recolector {name} en cuarentena {delay:.0f}s (fallo {state.failures}): {error}")
+
+    def _stale(self, name, state):
+        """Último valor bueno y su antigüedad; sin él no hay nada que servir"""
+        if state.updated is None:
+            raise CollectorUnavailable(f"{name}: {state.last_error or 'sin datos'}")
+        return state.value, round(time.time() - state.updated, 1)
+
+    def call(self, name, func, failed=None):
+        """Ejecutar `func` con plazo: devuelve (valor, antigüedad), con antigüedad None si es fresco"""
+        state = self._state(name)
+        with state.lock:
+            if time.monotonic() < state.quarantined_until:
+                return self._stale(name, state)
+            call = state.inflight
+            if call is not None and not call.settled.is_set():
+                # Otra petición ya está recolectando dentro de su plazo: compartir su resultado
+                owner = False
+            elif call is not None and call.thread.is_alive():
+                # La llamada anterior venció su plazo y sigue colgada: no apilar hilos sobre el recurso
+                self._quarantine(name, state, 'llamada anterior todavía en curso')
+                return self._stale(name, state)
+            else:
+                call = state.inflight = _Call()
+                owner = True
+
+        if not owner:
+            # Quien lanzó la llamada la resuelve como mucho al vencer su plazo
+            if not call.settled.wait(self.deadline * 2):
+                return self._stale(name, state)
+            if isinstance(call.outcome, Exception):
+                raise call.outcome
+            return call.outcome
+
+        result = {}
+        done = threading.Event()
+
+        def target():
+            try:
+                result['value'] = func()
+            except Exception as e:
+                result['error'] = str(e)
+            finally:
+                done.set()
+
+        call.thread = threading.Thread(target=target, name=f'collector-{name}', daemon=True)
+        call.thread.start()
+        finished = done.wait(self.deadline)
+        with state.lock:
+            try:
+                call.outcome = self._settle(name, state, result if finished else None, failed)
+            except CollectorUnavailable as e:
+                call.outcome = e
+            call.settled.set()
+        if isinstance(call.outcome, Exception):
+            raise call.outcome
+        return call.outcome
+
+    def _settle(self, name, state, result, failed):
+        """Aplicar el resultado de una llamada al estado (una sola vez por llamada)"""
+        if result is None:
+            self._quarantine(name, state, f'sin respuesta en {self.deadline * 1000:.0f} ms')
+            return self._stale(name, state)
+
+        if 'error' in result:
+            self._quarantine(name, state, result['error'])
+            return self._stale(name, state)
+        value = result['value']
+        if failed is not None and failed(value):
+            error = value.get('error') if isinstance(value, dict) else None
+            self._quarantine(name, state, error or 'resultado inválido')
+            if state.updated is None:
+                # Sin valor bueno previo se devuelve el resultado con error tal cual
+                return value, None
+            return self._stale(name, state)
+
+        state.value = value
+        state.updated = time.time()
+        state.failures = 0
+        state.last_error = None
+        return value, None
+
+    def status(self):
+        """Estado de cada recolector para diagnóstico"""
+        now = time.monotonic()
+        with self._lock:
+            states = dict(self._states)
+        return {
+            name: {
+                'quarantined': now < state.quarantined_until,
+                'retry_in_seconds': round(max(0.0, state.quarantined_until - now), 1),
+                'failures': state.failures,
+                'last_error': state.last_error,
+                'age_seconds': round(time.time() - state.updated, 1) if state.updated else None
+            }
+            for name, state in states.items()
+        }
+
+def mark_stale(value, age):
+    """Copia de un resultado servido desde la caché con `stale: true` y su antigüedad"""
+    if age is None:
+        return value
+    value = dict(value)
+    value['stale'] = True
+    value['age_seconds'] = age
+    return value
+
+# Instancias globales: grupos del sampler y, con plazo menor, cada punto de montaje
+collector_supervisor = CollectorSupervisor()
+mount_supervisor = CollectorSupervisor(deadline_ms=COLLECTOR_DEADLINE_MS // 4)
@@ -0,0 +1,295 @@
+"""
+Almacén de series temporales en memoria (buffer circular columnar)
+"""
+
+import logging
+import math
+import os
+import threading
+
+import numpy as np
+
+from app.aggregates import RangeIndex, parse_function, QUERY_MAX_POINTS
+from app.rollups import RollupStore
+
+# Configuración desde variables de entorno
+HISTORY_CAPACITY = int(os.getenv('HISTORY_CAPACITY', 86400))  # 24 h a 1 muestra/s
+HISTORY_MAX_SERIES = int(os.getenv('HISTORY_MAX_SERIES', 50))
+HISTORY_DEFAULT_WINDOW = int(os.getenv('HISTORY_DEFAULT_WINDOW', 3600))  # Segundos
+
+# Campos numéricos que se guardan en el historial, por grupo del snapshot
+SNAPSHOT_FIELDS = (
+    ('cpu', ('usage', 'user', 'system', 'iowait', 'steal')),
+    ('ram', ('usage', 'used', 'free')),
+    ('disk', ('usage', 'used', 'free')),
+    ('network', ('bytes_sent', 'bytes_recv', 'packets_sent', 'packets_recv',
+                 'bytes_sent_per_s', 'bytes_recv_per_s')),
+)
+
+def snapshot_metrics(snapshot):
+    """Aplanar un snapshot en un diccionario {'grupo.campo': valor}"""
+    metrics = {}
+    for group_name, fields in SNAPSHOT_FIELDS:
+        group = getattr(snapshot, group_name)
+        if 'error' in group:
+            # Grupo sin datos válidos: se registra como hueco (NaN)
+            continue
+        for field in fields:
+            value = group.get(field)
+            if isinstance(value, (int, float)):
+                metrics[f'{group_name}.{field}'] = value
+
+    # Los núcleos van al final: solo ocupan las columnas que queden libres
+    if 'error' not in snapshot.cpu:
+        for index, value in enumerate(snapshot.cpu.get('per_core', [])):
+            metrics[f'cpu.core{index}'] = value
+    return metrics
+
+class RingBufferStore:
+    """Buffer circular preasignado con una columna float32 por métrica"""
+
+    def __init__(self, capacity=HISTORY_CAPACITY, max_series=HISTORY_MAX_SERIES, rollups=None, aggregates=None):
+        self.capacity = max(1, capacity)
+        self.max_series = max(1, max_series)
+        self.rollups = rollups
+        self.aggregates = aggregates
+        if rollups is not None:
+            rollups.bind(self.max_series)
+        # Memoria acotada y conocida de antemano: timestamps + matriz de valores
+        self._ts = np.zeros(self.capacity, dtype=np.float64)
+        self._values = np.full((self.max_series, self.capacity), np.nan, dtype=np.float32)
+        self._series = {}
+        self._count = 0  # Total de muestras añadidas (cursor monótono)
+        self._lock = threading.Lock()
+        self._dropped_series = set()
+
+    def memory_bytes(self):
+        """Memoria ocupada por los arrays del buffer (y de los rollups)"""
+        total = self._ts.nbytes + self._values.nbytes
+        if self.rollups is not None:
+            total += self.rollups.memory_bytes()
+        if self.aggregates is not None:
+            total += self.aggregates.memory_bytes()
+        return total
+
+    def series_names(self):
+        """Nombres de las métricas registradas"""
+        return list(self._series)
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    def _column(self, name):
+        """Columna asignada a una métrica (la registra si hay espacio)"""
+        column = self._series.get(name)
+        if column is None:
+            if len(self._series) >= self.max_series:
+                if name not in self._dropped_series:
+                    self._dropped_series.add(name)
+                    logging.warning(f"Historial lleno ({self.max_series} series): se descarta {name}")
+                return None
+            column = len(self._series)
+            self._series[name] = column
+        return column
+
+    def append(self, timestamp, metrics):
+        """Añadir una muestra en O(1)"""
+        with self._lock:
+            position = self._count % self.capacity
+            # Los timestamps deben ser no decrecientes para la búsqueda binaria
+            if self._count and timestamp < self._ts[(self._count - 1) % self.capacity]:
+                timestamp = self._ts[(self._count - 1) % self.capacity]
+            self._ts[position] = timestamp
+            self._values[:, position] = np.nan
+            for name, value in metrics.items():
+                column = self._column(name)
+                if column is not None:
+                    self._values[column, position] = value
+            self._count += 1
+            if self.rollups is not None:
+                # Agregación incremental: cada nivel solo toca su bucket actual
+                self.rollups.add(timestamp, self._values[:, position])
+            if self.aggregates is not None:
+                # Índices de consulta por rango: O(log n) por métrica indexada
+                self.aggregates.add(timestamp, self._values[:, position], self.oldest_timestamp())
+
+    def append_snapshot(self, snapshot):
+        """Añadir un snapshot del sampler"""
+        self.append(snapshot.timestamp, snapshot_metrics(snapshot))
+
+    def clear(self):
+        """Vaciar el buffer, las series y los índices derivados"""
+        with self._lock:
+            self._ts[:] = 0
+            self._values[:] = np.nan
+            self._series = {}
+            self._count = 0
+            self._dropped_series = set()
+            if self.rollups is not None:
+                self.rollups.bind(self.max_series)
+            if self.aggregates is not None:
+                self.aggregates.reset()
+
+    def restore(self, segments, since=None):
+        """Recargar la ventana más reciente del historial persistente (arranque)"""
+        timestamps, columns = segments.read(since)
+        keep = min(len(timestamps), self.capacity)
+        if not keep:
+            return 0
+
+        with self._lock:
+            positions = (self._count + np.arange(keep)) % self.capacity
+            self._ts[positions] = timestamps[-keep:]
+            self._values[:, positions] = np.nan
+            for name, values in columns.items():
+                column = self._column(name)
+                if column is not None:
+                    self._values[column, positions] = values[-keep:]
+            self._count += keep
+            if self.rollups is not None:
+                self.rollups.extend(self._ts[positions], self._values[:, positions])
+            if self.aggregates is not None:
+                # Los índices se reconstruyen en la próxima consulta
+                self.aggregates.reset()
+        return keep
+
+    def _bisect(self, first, size, timestamp, right=False):
+        """Búsqueda binaria sobre el orden lógico del buffer"""
+        lo, hi = 0, size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            value = self._ts[(first + mid) % self.capacity]
+            if value < timestamp or (right and value == timestamp):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _slice(self, array, start, stop):
+        """Copiar el rango lógico [start, stop) de un array circular"""
+        length = stop - start
+        start %= self.capacity
+        end = start + length
+        if end <= self.capacity:
+            return array[..., start:end].copy()
+        return np.concatenate((array[..., start:], array[..., :end - self.capacity]), axis=-1)
+
+    def range(self, name, since=None, until=None):
+        """Timestamps y valores de una métrica en [since, until] en O(log n + k)"""
+        with self._lock:
+            column = self._series.get(name)
+            if column is None:
+                raise KeyError(name)
+
+            size = len(self)
+            first = self._count - size
+            lo = 0 if since is None else self._bisect(first, size, since)
+            hi = size if until is None else self._bisect(first, size, until, right=True)
+            if hi <= lo:
+                return np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float32)
+
+            timestamps = self._slice(self._ts, first + lo, first + hi)
+            values = self._slice(self._values[column], first + lo, first + hi)
+            return timestamps, values
+
+    def query(self, name, since, until=None, points=None):
+        """Historial de una métrica desde la fuente más adecuada (raw o rollup)"""
+        if name not in self._series:
+            raise KeyError(name)
+
+        with self._lock:
+            raw_oldest = self.oldest_timestamp()
+            tier = None
+            if self.rollups is not None and raw_oldest is not None:
+                effective_until = until if until is not None else self.latest_timestamp()
+                # No pedir datos anteriores a los que existen en alguna fuente
+                tier_oldest = [t.oldest() for t in self.rollups.tiers if t.oldest() is not None]
+                effective_since = max(since, min([raw_oldest] + tier_oldest))
+                if points is not None:
+                    tier = self.rollups.select(effective_since, effective_until, points)
+                if tier is None and self._count > self.capacity and effective_since < raw_oldest:
+                    # El buffer crudo ya descartó parte del rango: usar el nivel más fino que lo cubra
+                    covering = self.rollups.covering(effective_since)
+                    tier = covering[0] if covering else None
+
+            if tier is not None:
+                result = tier.range(self._series[name], since, until)
+                result['resolution'] = tier.resolution
+                return result
+
+        timestamps, values = self.range(name, since, until)
+        return {'ts': timestamps, 'avg': values, 'resolution': 0}
+
+    def aggregate(self, name, fn, since, until=None, step=None):
+        """Agregado de una métrica en [since, until), completo o por buckets de `step` segundos"""
+        quantile = parse_function(fn)
+        if self.aggregates is None:
+            raise ValueError("Este historial no tiene índices de consulta por rango")
+
+        with self._lock:
+            column = self._series.get(name)
+            if column is None:
+                raise KeyError(name)
+            if not self._count:
+                return {'ts': [], 'values': [], 'from': since, 'to': until}
+
+            size = len(self)
+            first = self._count - size
+            latest = self.latest_timestamp()
+            start = max(since, self.oldest_timestamp())
+            end = until if until is not None else float(np.nextafter(latest, np.inf))
+            if step:
+                # Buckets alineados a múltiplos de step: ventanas deslizantes reutilizan los memoizados
+                aligned = math.floor(start / step) * step
+                buckets = int(math.ceil((end - aligned) / step))
+                if buckets > QUERY_MAX_POINTS:
+                    raise ValueError(f"Demasiados buckets ({buckets}); máximo {QUERY_MAX_POINTS}")
+                labels = [aligned + i * step for i in range(max(0, buckets))]
+                ranges = [(max(start, label), min(end, label + step)) for label in labels]
+            else:
+                labels, ranges = [start], [(start, end)]
+
+            index = self.aggregates.index(column, self.capacity, lambda index: index.backfill(
+                self._slice(self._ts, first, self._count), self._slice(self._values[column], first, self._count),
+                self._count))
+
+            def raw(lo_ts, hi_ts):
+                lo, hi = self._bisect(first, size, lo_ts), self._bisect(first, size, hi_ts)
+                return self._slice(self._values[column], first + lo, first + max(lo, hi))
+
+            def compute(lo_ts, hi_ts):
+                if hi_ts <= lo_ts:
+                    return 0 if fn == 'count' else None
+                if quantile is not None:
+                    return index.quantile(quantile, lo_ts, hi_ts, raw)
+                lo = first + self._bisect(first, size, lo_ts)
+                hi = first + self._bisect(first, size, hi_ts)
+                return index.reduce(fn, lo, hi, lambda k: float(self._ts[k % self.capacity]))
+
+            # Un bucket que termina antes de la última muestra ya no puede cambiar
+            values = [self.aggregates.memoized((column, fn, lo_ts, hi_ts), hi_ts <= latest,
+                                               lambda lo_ts=lo_ts, hi_ts=hi_ts: compute(lo_ts, hi_ts))
+                      for lo_ts, hi_ts in ranges]
+            return {'ts': labels, 'values': values, 'from': start, 'to': end}
+
+    def oldest_timestamp(self):
+        """Timestamp de la muestra más antigua conservada (None si está vacío)"""
+        if not self._count:
+            return None
+        return float(self._ts[(self._count - len(self)) % self.capacity])
+
+    def latest_timestamp(self):
+        """Timestamp de la muestra más reciente (None si está vacío)"""
+        if not self._count:
+            return None
+        return float(self._ts[(self._count - 1) % self.capacity])
+
+def to_json_columns(timestamps, values, decimals=3):
+    """Convertir arrays a listas JSON (NaN se convierte en null)"""
+    ts_list = np.round(timestamps, decimals).tolist()
+    value_list = [None if value != value else value
+                  for value in np.round(values.astype(np.float64), decimals).tolist()]
+    return ts_list, value_list
+
+# Instancia global para uso en la aplicación
+metrics_store = RingBufferStore(rollups=RollupStore(), aggregates=RangeIndex())
@@ -7,9 +7,12 @@ import time
 import logging
 import os
 import re
+import threading
 from functools import wraps
 from datetime import datetime
 from flask import g
+from app.procfs import procfs
+from app.supervisor import mount_supervisor, CollectorUnavailable
 
 def sanitize_output(data):
     """Sanitizar outputs para evitar exponer información sensible"""
@@ -71,17 +74,197 @@ MAX_RETRIES_NORMAL = int(os.getenv('MAX_RETRIES_NORMAL', '2'))
 RETRY_DELAY = int(os.getenv('RETRY_DELAY', '1'))
 USE_EXPONENTIAL_BACKOFF = os.getenv('USE_EXPONENTIAL_BACKOFF', 'true').lower() == 'true'
 
-@retry_on_failure(max_retries=MAX_RETRIES_CRITICAL, delay=RETRY_DELAY, exponential_backoff=USE_EXPONENTIAL_BACKOFF)
+class CpuTimesCollector:
+    """Calcula el uso de CPU a partir de deltas de cpu_times sin bloquear"""
+    
+    # Delta mínimo (segundos de CPU por núcleo) para considerar fiable una medición
+    MIN_DELTA_SECONDS = 0.05
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._previous = None
+        self._result = None  # Última medición válida (uso, por núcleo, desglose)
+        self.prime()
+    
+    def prime(self):
+        """Tomar la lectura base para que la primera medición no sea falsa"""
+        with self._lock:
+            self._previous = self._read_times()
+    
+    @staticmethod
+    def _read_times():
+        """Tiempos por núcleo: /proc/stat directo en Linux, psutil en otras plataformas"""
+        if procfs is not None:
+            return procfs.cpu_times()
+        return psutil.cpu_times(percpu=True)
+    
+    @staticmethod
+    def _busy_split(times_list):
+        """Agregar tiempos por campo y calcular el total de una lista de cpu_times"""
+        fields = {'user': 0.0, 'system': 0.0, 'idle': 0.0, 'iowait': 0.0, 'steal': 0.0}
+        total = 0.0
+        for times in times_list:
+            # guest y guest_nice ya están incluidos en user y nice (Linux)
+            total += sum(times) - getattr(times, 'guest', 0.0) - getattr(times, 'guest_nice', 0.0)
+            for name in fields:
+                fields[name] += getattr(times, name, 0.0)
+        return total, fields
+    
+    @classmethod
+    def _usage(cls, times_list):
+        """Porcentajes de uso total y por tipo a partir de tiempos (acumulados o deltas)"""
+        total, fields = cls._busy_split(times_list)
+        if total <= 0:
+            return 0.0, {name: 0.0 for name in fields}
+        idle = fields['idle'] + fields['iowait']
+        usage = max(0.0, min(100.0, (total - idle) / total * 100))
+        split = {name: round(max(0.0, min(100.0, value / total * 100)), 1)
+                 for name, value in fields.items() if name != 'idle'}
+        return usage, split
+    
+    def _measure(self, force=False):
+        """Medición desde la base; None si el delta es demasiado pequeño y no hay una anterior"""
+        current = self._read_times()
+        with self._lock:
+            previous = self._previous
+            # Restar campo a campo; el número de núcleos puede cambiar (hotplug)
+            if previous is not None and len(previous) == len(current):
+                deltas = [type(cur)(*(max(0.0, c - p) for c, p in zip(cur, prev)))
+                          for cur, prev in zip(current, previous)]
+            else:
+                deltas = None
+            
+            if deltas is None:
+                # Sin base comparable: la lectura actual pasa a serlo
+                self._previous = current
+            elif force or self._busy_split(deltas)[0] >= self.MIN_DELTA_SECONDS * len(current):
+                self._previous = current
+                usage, split = self._usage(deltas)
+                per_core = [round(self._usage([core])[0], 1) for core in deltas]
+                self._result = (usage, per_core, split)
+            # Delta demasiado pequeño (llamadas muy seguidas): conservar la base y repetir la
+            # última medición; nunca los contadores acumulados desde el arranque
+            return self._result
+    
+    def sample(self):
+        """Medir el uso de CPU desde la lectura anterior"""
+        result = self._measure()
+        if result is None:
+            # Sin medición previa: esperar una vez el intervalo mínimo en vez de inventar un valor
+            time.sleep(self.MIN_DELTA_SECONDS)
+            result = self._measure(force=True)
+        if result is None:
+            usage, split = self._usage([])
+            result = (usage, [], split)
+        return result
+
+# Instancia global, cebada al importar el módulo
+cpu_collector = CpuTimesCollector()
+
+# Filtros de interfaces de red (expresiones regulares sobre el nombre completo)
+NETWORK_INTERFACES_INCLUDE = os.getenv('NETWORK_INTERFACES_INCLUDE', '')  # Vacío: todas
+NETWORK_INTERFACES_EXCLUDE = os.getenv(
+    'NETWORK_INTERFACES_EXCLUDE', r'lo|veth.*|docker\d*|br-.*|virbr.*|vnet\d*|cni\d*|flannel.*|ifb\d*'
+)
+# Tráfico máximo creíble por interfaz (10 Gbit/s): acota qué retroceso puede ser un desborde de 32 bits
+NETWORK_MAX_BYTES_PER_S = float(os.getenv('NETWORK_MAX_BYTES_PER_S', 1.25e9))
+
+class NetworkRateCollector:
+    """Calcula tasas por interfaz a partir de deltas de contadores con reloj monótono"""
+    
+    # Intervalo mínimo entre mediciones; por debajo se reutilizan las últimas tasas
+    MIN_INTERVAL_SECONDS = 0.05
+    COUNTER_WRAP = 2 ** 32
+    MIN_FRAME_BYTES = 64  # Paquetes/s máximos = bytes/s máximos / trama mínima
+    RATE_FIELDS = ('bytes_sent_per_s', 'bytes_recv_per_s', 'packets_sent_per_s', 'packets_recv_per_s',
+                   'errors_in_per_s', 'errors_out_per_s', 'drops_in_per_s', 'drops_out_per_s')
+    
+    def __init__(self, include=NETWORK_INTERFACES_INCLUDE, exclude=NETWORK_INTERFACES_EXCLUDE,
+                 max_bytes_per_s=NETWORK_MAX_BYTES_PER_S):
+        self._include = re.compile(include) if include else None
+        self._exclude = re.compile(exclude) if exclude else None
+        max_packets_per_s = max_bytes_per_s / self.MIN_FRAME_BYTES
+        # Mismo orden que RATE_FIELDS: bytes, paquetes, errores y descartes (acotados por paquetes)
+        self._max_rates = (max_bytes_per_s,) * 2 + (max_packets_per_s,) * 6
+        self._lock = threading.Lock()
+        self._previous = None
+        self._rates = {}
+        self.prime()
+    
+    def prime(self):
+        """Tomar la lectura base para que la primera medición ya tenga tasas"""
+        with self._lock:
+            self._previous = (time.monotonic(), self._read_counters())
+    
+    @staticmethod
+    def _read_counters():
+        """Contadores por interfaz: /proc/net/dev directo en Linux, psutil en otras plataformas"""
+        if procfs is not None:
+            return procfs.net_pernic()
+        return {name: tuple(counters) for name, counters in psutil.net_io_counters(pernic=True).items()}
+    
+    def accepts(self, name):
+        """Indica si una interfaz pasa los filtros (p. ej. excluir loopback y virtuales)"""
+        if self._include is not None and not self._include.fullmatch(name):
+            return False
+        return self._exclude is None or not self._exclude.fullmatch(name)
+    
+    @classmethod
+    def _delta(cls, current, previous, max_delta):
+        """Incremento de un contador teniendo en cuenta desbordes de 32 bits y reinicios"""
+        if current >= previous:
+            return current - previous
+        wrapped = current + cls.COUNTER_WRAP - previous
+        if cls.COUNTER_WRAP // 2 <= previous < cls.COUNTER_WRAP and wrapped <= max_delta:
+            # Contador de 32 bits cerca del tope que dio la vuelta con un incremento creíble
+            return wrapped
+        # Cualquier otro retroceso es un reinicio (interfaz recreada, driver recargado): sin tasa fiable
+        return None
+    
+    def sample(self):
+        """Medir contadores y tasas por interfaz desde la lectura anterior"""
+        counters = self._read_counters()
+        now = time.monotonic()
+        with self._lock:
+            previous_time, previous = self._previous
+            elapsed = now - previous_time
+            if elapsed < self.MIN_INTERVAL_SECONDS:
+                # Llamadas muy seguidas: conservar la base y las tasas ya calculadas
+                return counters, self._rates
+            
+            rates = {}
+            for name, values in counters.items():
+                if not self.accepts(name):
+                    continue
+                old = previous.get(name)
+                if old is None:
+                    # Interfaz nueva: todavía no hay base para calcular tasas
+                    rates[name] = {field: 0.0 for field in self.RATE_FIELDS}
+                    continue
+                deltas = [self._delta(cur, prev, max_rate * elapsed)
+                          for cur, prev, max_rate in zip(values, old, self._max_rates)]
+                rates[name] = {field: round(delta / elapsed, 1) if delta is not None else 0.0
+                               for field, delta in zip(self.RATE_FIELDS, deltas)}
+            self._previous = (now, counters)
+            self._rates = rates
+        return counters, rates
+
+# Instancia global, cebada al importar el módulo
+network_collector = NetworkRateCollector()
+
 def get_cpu_usage():
-    """Obtener uso de CPU en porcentaje"""
+    """Obtener uso de CPU en porcentaje (total, por núcleo y por tipo de tiempo)"""
     try:
-        # Obtener uso de CPU con intervalo de 1 segundo para mayor precisión
-        cpu_percent = psutil.cpu_percent(interval=1)
-        # Validar rango
-        cpu_percent = max(0.0, min(100.0, cpu_percent))
+        # Medición por deltas desde la muestra anterior, sin dormir el hilo
+        cpu_percent, per_core, split = cpu_collector.sample()
         return {
             'usage': round(cpu_percent, 1),
             'cores': psutil.cpu_count(),
+            'per_core': per_core,
+            'user': split['user'],
+            'system': split['system'],
+            'iowait': split['iowait'],
+            'steal': split['steal'],
             'timestamp': time.time()
         }
     except Exception as e:
@@ -90,22 +273,26 @@ def get_cpu_usage():
         return {
             'usage': -1,
             'cores': 0,
+            'per_core': [],
             'error': 'Error interno del sistema',
             'timestamp': time.time()
         }
 
-@retry_on_failure(max_retries=MAX_RETRIES_CRITICAL, delay=RETRY_DELAY, exponential_backoff=USE_EXPONENTIAL_BACKOFF)
 def get_ram_usage():
     """Obtener uso de RAM en porcentaje"""
     try:
-        memory = psutil.virtual_memory()
+        if procfs is not None:
+            total, used, free, percent = procfs.memory()
+        else:
+            memory = psutil.virtual_memory()
+            total, used, free, percent = memory.total, memory.used, memory.free, memory.percent
         # Validar rango
-        usage_percent = max(0.0, min(100.0, memory.percent))
+        usage_percent = max(0.0, min(100.0, percent))
         return {
             'usage': round(usage_percent, 1),
-            'total': max(0, memory.total),
-            'used': max(0, memory.used),
-            'free': max(0, memory.free),
+            'total': max(0, total),
+            'used': max(0, used),
+            'free': max(0, free),
             'timestamp': time.time()
         }
     except Exception as e:
@@ -119,75 +306,169 @@ def get_ram_usage():
             'timestamp': time.time()
         }
 
-@retry_on_failure(max_retries=MAX_RETRIES_CRITICAL, delay=RETRY_DELAY, exponential_backoff=USE_EXPONENTIAL_BACKOFF)
+# Dispositivos de bloques que no se reportan (regex sobre el nombre completo)
+DISK_DEVICES_EXCLUDE = os.getenv('DISK_DEVICES_EXCLUDE', r'loop\d+|ram\d+|zram\d+|sr\d+|fd\d+')
+
+class DiskCollector:
+    """Uso de todas las particiones reales y carga de I/O por dispositivo a partir de deltas"""
+    
+    MIN_INTERVAL_SECONDS = 0.05
+    SECTOR_SIZE = 512
+    IN_FLIGHT = 8  # Campo de /proc/diskstats que es un nivel (I/O en curso), no un contador
+    # Sin mountinfo (otras plataformas) la tabla de particiones se cachea por tiempo
+    PARTITIONS_CACHE_SECONDS = 60
+    
+    def __init__(self, exclude_devices=DISK_DEVICES_EXCLUDE):
+        self._exclude = re.compile(exclude_devices) if exclude_devices else None
+        self._lock = threading.Lock()
+        self._partitions = None
+        self._partitions_time = 0.0
+        self._previous = None
+        self._rates = {}
+        self.prime()
+    
+    def prime(self):
+        """Tomar la lectura base de contadores de I/O"""
+        with self._lock:
+            self._previous = (time.monotonic(), self._read_counters())
+    
+    def partitions(self):
+        """Sistemas de ficheros reales montados, sin enumerar particiones en cada muestra"""
+        if procfs is not None:
+            return procfs.mount_table.mounts()
+        now = time.monotonic()
+        if self._partitions is None or now - self._partitions_time > self.PARTITIONS_CACHE_SECONDS:
+            self._partitions = psutil.disk_partitions()
+            self._partitions_time = now
+        return self._partitions
+    
+    def usage(self):
+        """Uso de cada partición (las inaccesibles se omiten)"""
+        result = []
+        for partition in self.partitions():
+            # Nombre del dispositivo en /proc/diskstats (resuelve orígenes como /dev/root)
+            device = os.path.basename(partition.device)
+            if procfs is not None:
+                device = procfs.device_numbers.get(partition.major_minor, device)
+            entry = {'mountpoint': partition.mountpoint, 'device': device, 'fstype': partition.fstype}
+            try:
+                # Cada montaje con su propio plazo: un NFS/FUSE colgado solo degrada su entrada
+                (total, used, free, percent), age = mount_supervisor.call(
+                    f"disk:{partition.mountpoint}", lambda mountpoint=partition.mountpoint: self._statvfs(mountpoint))
+            except CollectorUnavailable as e:
+                entry.update({'usage': -1, 'error': str(e)})
+                result.append(entry)
+                continue
+            entry.update({
+                'usage': round(max(0.0, min(100.0, percent)), 1),
+                'total': max(0, total),
+                'used': max(0, used),
+                'free': max(0, free)
+            })
+            if age is not None:
+                entry.update({'stale': True, 'age_seconds': age})
+            result.append(entry)
+        return result
+    
+    @staticmethod
+    def _statvfs(mountpoint):
+        """(total, used, free, porcentaje) de un punto de montaje"""
+        if procfs is not None:
+            return procfs.disk_usage(mountpoint)
+        usage = psutil.disk_usage(mountpoint)
+        return usage.total, usage.used, usage.free, usage.percent
+    
+    @classmethod
+    def _read_counters(cls):
+        """Contadores por dispositivo con el layout de /proc/diskstats"""
+        if procfs is not None:
+            return procfs.diskstats()
+        counters = {}
+        for name, io in (psutil.disk_io_counters(perdisk=True) or {}).items():
+            # lecturas, fusionadas, sectores, ms | escrituras, fusionadas, sectores, ms | en curso, ms I/O, ponderado
+            counters[name] = [io.read_count, 0, io.read_bytes // cls.SECTOR_SIZE, io.read_time,
+                              io.write_count, 0, io.write_bytes // cls.SECTOR_SIZE, io.write_time,
+                              0, getattr(io, 'busy_time', 0), 0]
+        return counters
+    
+    def io_rates(self):
+        """IOPS, throughput, await medio y %util por dispositivo desde la lectura anterior"""
+        counters = self._read_counters()
+        now = time.monotonic()
+        with self._lock:
+            previous_time, previous = self._previous
+            elapsed = now - previous_time
+            if elapsed < self.MIN_INTERVAL_SECONDS:
+                return self._rates
+            
+            rates = {}
+            for name, values in counters.items():
+                if self._exclude is not None and self._exclude.fullmatch(name):
+                    continue
+                old = previous.get(name)
+                deltas = None
+                if old is not None:
+                    deltas = [cur - prev for cur, prev in zip(values, old)]
+                    # Que baje el número de I/O en curso no es un reinicio de contadores
+                    deltas[self.IN_FLIGHT] = 0
+                if deltas is None or min(deltas) < 0:
+                    # Dispositivo nuevo o contadores reiniciados: sin base fiable en este intervalo
+                    deltas = [0] * len(values)
+                ios = deltas[0] + deltas[4]
+                rates[name] = {
+                    'read_iops': round(deltas[0] / elapsed, 1),
+                    'write_iops': round(deltas[4] / elapsed, 1),
+                    'read_bytes_per_s': round(deltas[2] * self.SECTOR_SIZE / elapsed, 1),
+                    'write_bytes_per_s': round(deltas[6] * self.SECTOR_SIZE / elapsed, 1),
+                    # Tiempo medio por operación (cola + servicio), como 'await' de iostat
+                    'await_ms': round((deltas[3] + deltas[7]) / ios, 2) if ios else 0.0,
+                    'util_percent': round(min(100.0, deltas[9] / (elapsed * 1000) * 100), 1)
+                }
+            self._previous = (now, counters)
+            self._rates = rates
+        return rates
+
+# Instancia global, cebada al importar el módulo
+disk_collector = DiskCollector()
+
 def get_disk_usage():
-    """Obtener uso de disco en porcentaje"""
+    """Obtener uso de disco (partición principal, todas las particiones y I/O por dispositivo)"""
     try:
-        # Obtener la partición principal (generalmente C: en Windows o / en Linux)
-        disk_partitions = psutil.disk_partitions()
-        
-        # Buscar la partición principal
-        main_partition = None
-        for partition in disk_partitions:
-            # En Windows, buscar C: o la primera unidad disponible
-            if os.name == 'nt':  # Windows
-                if partition.mountpoint == 'C:\\':
-                    main_partition = partition
-                    break
-                elif not main_partition and ':' in partition.mountpoint:
-                    main_partition = partition
-            else:  # Unix/Linux
-                if partition.mountpoint == '/':
-                    main_partition = partition
-                    break
-                elif not main_partition:
-                    main_partition = partition
+        partitions = disk_collector.usage()
+        devices = disk_collector.io_rates()
         
-        # Si no se encuentra la partición principal, usar la primera disponible
-        if not main_partition and disk_partitions:
-            main_partition = disk_partitions[0]
+        # Partición principal: C: en Windows o / en Linux; si no, la primera disponible
+        main_mountpoint = 'C:\\' if os.name == 'nt' else '/'
+        available = [p for p in partitions if 'error' not in p]
+        main = next((p for p in available if p['mountpoint'] == main_mountpoint),
+                    available[0] if available else None)
         
-        if main_partition:
-            try:
-                usage = psutil.disk_usage(main_partition.mountpoint)
-                # Validar rango
-                usage_percent = max(0.0, min(100.0, usage.percent))
-                return {
-                    'usage': round(usage_percent, 1),
-                    'total': max(0, usage.total),
-                    'used': max(0, usage.used),
-                    'free': max(0, usage.free),
-                    'mountpoint': main_partition.mountpoint,
-                    'timestamp': time.time()
-                }
-            except (OSError, PermissionError) as e:
-                logging.warning(f"No se pudo acceder a {main_partition.mountpoint}: {e}")
-                # Intentar con una ruta alternativa
-                if os.name == 'nt':
-                    try:
-                        usage = psutil.disk_usage('C:\\')
-                        usage_percent = max(0.0, min(100.0, usage.percent))
-                        return {
-                            'usage': round(usage_percent, 1),
-                            'total': max(0, usage.total),
-                            'used': max(0, usage.used),
-                            'free': max(0, usage.free),
-                            'mountpoint': 'C:\\',
-                            'timestamp': time.time()
-                        }
-                    except Exception:
-                        pass
-                raise e
-        else:
+        if main is None:
             logging.error("No se encontró ninguna partición de disco")
             return {
                 'usage': -1,
                 'total': 0,
                 'used': 0,
                 'free': 0,
+                'partitions': [],
+                'devices': devices,
                 'error': 'No se encontró ninguna partición de disco',
                 'timestamp': time.time()
             }
+        
+        disk = {
+            'usage': main['usage'],
+            'total': main['total'],
+            'used': main['used'],
+            'free': main['free'],
+            'mountpoint': main['mountpoint'],
+            'partitions': partitions,
+            'devices': devices,
+            'timestamp': time.time()
+        }
+        if main.get('stale'):
+            disk.update({'stale': True, 'age_seconds': main['age_seconds']})
+        return disk
     except Exception as e:
         logging.error(f"Error obteniendo disk usage: {str(e)}")
         return {
@@ -195,26 +476,36 @@ def get_disk_usage():
             'total': 0,
             'used': 0,
             'free': 0,
+            'partitions': [],
+            'devices': {},
             'error': str(e),
             'timestamp': time.time()
         }
 
-@retry_on_failure(max_retries=MAX_RETRIES_NORMAL, delay=RETRY_DELAY, exponential_backoff=False)
 def get_network_stats():
-    """Obtener estadísticas de red (MB enviados y recibidos)"""
+    """Obtener estadísticas de red (acumulados totales y tasas por interfaz)"""
     try:
-        # Obtener contadores de red
-        net_io = psutil.net_io_counters()
+        # Una sola lectura de contadores por interfaz: tasas y totales salen de ella
+        counters, rates = network_collector.sample()
+        bytes_sent, bytes_recv, packets_sent, packets_recv = (
+            sum(values[index] for values in counters.values()) for index in range(4)
+        )
         
         # Convertir bytes a MB y validar
-        bytes_sent_mb = max(0, round(net_io.bytes_sent / (1024 * 1024), 2))
-        bytes_recv_mb = max(0, round(net_io.bytes_recv / (1024 * 1024), 2))
+        bytes_sent_mb = max(0, round(bytes_sent / (1024 * 1024), 2))
+        bytes_recv_mb = max(0, round(bytes_recv / (1024 * 1024), 2))
         
         return {
             'sent_mb': bytes_sent_mb,
             'received_mb': bytes_recv_mb,
-            'packets_sent': max(0, net_io.packets_sent),
-            'packets_recv': max(0, net_io.packets_recv),
+            'bytes_sent': max(0, bytes_sent),
+            'bytes_recv': max(0, bytes_recv),
+            'packets_sent': max(0, packets_sent),
+            'packets_recv': max(0, packets_recv),
+            # Tasas de las interfaces filtradas (sin loopback ni virtuales por defecto)
+            'bytes_sent_per_s': round(sum(rate['bytes_sent_per_s'] for rate in rates.values()), 1),
+            'bytes_recv_per_s': round(sum(rate['bytes_recv_per_s'] for rate in rates.values()), 1),
+            'interfaces': rates,
             'timestamp': time.time()
         }
     except Exception as e:
@@ -222,8 +513,11 @@ def get_network_stats():
         return {
             'sent_mb': -1,
             'received_mb': -1,
+            'bytes_sent': 0,
+            'bytes_recv': 0,
             'packets_sent': 0,
             'packets_recv': 0,
+            'interfaces': {},
             'error': str(e),
             'timestamp': time.time()
         }
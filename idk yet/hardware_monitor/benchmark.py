@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Benchmarks de Hardware Monitor
+Mide los caminos críticos sin levantar el servidor
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+def measure(func, repeat=5):
+    """Ejecutar una función varias veces y devolver el mejor tiempo en ms"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def bench_lttb():
+    """LTTB: reducir 1 M de puntos a 1 000 (objetivo: muy por debajo de 50 ms)"""
+    from app.downsampling import lttb_indices
+
+    size = 1_000_000
+    timestamps = time.time() - size + np.arange(size, dtype=np.float64)
+    values = np.random.default_rng(42).random(size) * 100
+
+    elapsed = measure(lambda: lttb_indices(timestamps, values, 1000))
+    print(f"📉 LTTB 1M -> 1000 puntos: {elapsed:.2f} ms")
+    return elapsed < 50
+
+def bench_procfs():
+    """Recolección por muestra: lectura directa de /proc frente a psutil (objetivo: < 50 %)"""
+    import psutil
+    from app.procfs import ProcfsCollector
+
+    if not sys.platform.startswith('linux'):
+        print("⏭️ Backend /proc solo disponible en Linux")
+        return True
+
+    procfs = ProcfsCollector()
+    iterations = 500
+
+    def with_psutil():
+        for _ in range(iterations):
+            psutil.cpu_times(percpu=True)
+            psutil.virtual_memory()
+            psutil.net_io_counters(pernic=True)
+            psutil.disk_io_counters(perdisk=True)
+            psutil.disk_usage('/')
+
+    def with_procfs():
+        for _ in range(iterations):
+            procfs.cpu_times()
+            procfs.memory()
+            procfs.net_pernic()
+            procfs.diskstats()
+            procfs.disk_usage('/')
+
+    baseline = measure(with_psutil) * 1000 / iterations
+    fast = measure(with_procfs) * 1000 / iterations
+    print(f"🐧 Recolección por muestra: psutil {baseline:.1f} µs, /proc directo {fast:.1f} µs "
+          f"({fast / baseline * 100:.0f} %)")
+    return fast < baseline * 0.5
+
+def bench_processes():
+    """Tabla de procesos: coste por proceso y pasada de 5 000 procesos dentro del presupuesto"""
+    from app.processes import ProcessCollector, PROCESS_SAMPLE_BUDGET_MS
+
+    collector = ProcessCollector(budget_ms=60_000, min_interval=0)
+    collector.sample()
+    elapsed = measure(lambda: collector.sample(force=True), repeat=3)
+    per_process = elapsed * 1000 / max(1, collector.total)
+    # Con presupuesto fijo, 5 000 procesos se reparten en tantas muestras como haga falta
+    samples = max(1, -(-5000 * per_process // (PROCESS_SAMPLE_BUDGET_MS * 1000)))
+    print(f"📋 Procesos: {collector.total} en {elapsed:.1f} ms ({per_process:.0f} µs/proceso); "
+          f"5 000 procesos = {samples:.0f} muestra(s) de {PROCESS_SAMPLE_BUDGET_MS} ms")
+
+    bounded = ProcessCollector(min_interval=0)
+    bounded.sample()
+    return bounded.sample_ms < PROCESS_SAMPLE_BUDGET_MS + 5
+
+def bench_probes():
+    """Sondas /livez y /readyz en el middleware WSGI frente a /api/health/basic (objetivo: < 50 µs)"""
+    import base64
+    from app import create_app
+
+    app = create_app()
+    environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': '/readyz', 'SERVER_NAME': 'localhost',
+               'SERVER_PORT': '5000', 'wsgi.url_scheme': 'http'}
+    start_response = lambda status, headers: None
+    iterations = 10_000
+
+    def probes():
+        for _ in range(iterations):
+            app.wsgi_app(environ, start_response)
+
+    fast = measure(probes) * 1000 / iterations
+    client = app.test_client()
+    auth = {'Authorization': 'Basic ' + base64.b64encode(b'admin:admin').decode()}
+    flask = measure(lambda: client.get('/api/health/basic', headers=auth), repeat=5) * 1000
+    print(f"💓 /readyz en el middleware: {fast:.2f} µs/request (/api/health/basic vía Flask: {flask:.0f} µs)")
+    return fast < 50
+
+def bench_stats_payload():
+    """/api/stats: variante precomprimida frente a serializar y comprimir por request (objetivo: < 5 %)"""
+    import gzip
+    import json
+    from werkzeug.datastructures import Accept
+    from app.payloads import PayloadCache, render_stats
+    from app.sampler import HardwareSampler
+
+    snapshot = HardwareSampler(enabled=False).sample_once()
+    cache = PayloadCache()
+    accept = Accept([('gzip', 1), ('br', 1)])
+    iterations = 1000
+
+    def per_request():
+        for _ in range(iterations):
+            gzip.compress(render_stats(snapshot), 6)
+
+    def precomputed():
+        for _ in range(iterations):
+            cache.for_snapshot(snapshot).negotiate(accept)
+
+    baseline = measure(per_request) * 1000 / iterations
+    cached = measure(precomputed) * 1000 / iterations
+    print(f"📦 /api/stats por request: serializar + gzip {baseline:.1f} µs, variante precomprimida {cached:.2f} µs")
+    return cached < baseline * 0.05
+
+def bench_query():
+    """Consultas por rango sobre 24 h de muestras: índices frente a reescanear (objetivo: < 1 ms)"""
+    from app.aggregates import RangeIndex
+    from app.timeseries import RingBufferStore
+
+    size = 86_400
+    store = RingBufferStore(capacity=size, max_series=4, aggregates=RangeIndex())
+    values = np.random.default_rng(1).random(size) * 100
+    now = time.time()
+    for offset, value in enumerate(values.tolist()):
+        store.append(now - size + offset, {'cpu.usage': value})
+
+    start = time.perf_counter()
+    store.aggregate('cpu.usage', 'max', now - 900)
+    build = (time.perf_counter() - start) * 1000
+
+    def rescan():
+        timestamps, window = store.range('cpu.usage', now - 43_200)
+        window.max(), window.mean()
+
+    def indexed():
+        store.aggregate('cpu.usage', 'max', now - 43_200)
+        store.aggregate('cpu.usage', 'avg', now - 43_200)
+
+    baseline = measure(rescan)
+    fast = measure(indexed)
+    percentile = measure(lambda: np.nanpercentile(store.range('cpu.usage', now - size)[1], 95))
+    sketch = measure(lambda: store.aggregate('cpu.usage', 'p95', now - size))
+    step = measure(lambda: store.aggregate('cpu.usage', 'p95', now - size, step=300))
+    print(f"🔎 Consulta 12 h (max + avg): reescaneo {baseline:.2f} ms, índices {fast:.3f} ms "
+          f"(construcción {build:.0f} ms)")
+    print(f"🔎 p95 de 24 h: percentil {percentile:.2f} ms, sketches {sketch:.2f} ms; "
+          f"p95 por 5 min en 24 h memoizado: {step:.2f} ms")
+    return fast < 1
+
+def bench_mission_log():
+    """Logs de misión en SQLite: 5 000 entradas/s sostenidas durante 3 s (objetivo: sin retraso acumulado)"""
+    import os
+    import tempfile
+    from app.missionlog import SQLiteMissionLog
+
+    rate, seconds, tick = 5_000, 3, 0.01
+    with tempfile.TemporaryDirectory() as directory:
+        store = SQLiteMissionLog(os.path.join(directory, 'mission_logs.db'))
+        store.append('INFO', 'calentamiento')
+        store.flush()
+
+        per_tick = int(rate * tick)
+        appended, append_time = 0, 0.0
+        start = time.perf_counter()
+        for index in range(int(seconds / tick)):
+            before = time.perf_counter()
+            for _ in range(per_tick):
+                store.append('WARNING' if appended % 10 else 'ERROR', f"entrada {appended}", 'bench')
+                appended += 1
+            append_time += time.perf_counter() - before
+            # Ritmo constante: esperar al siguiente tick
+            time.sleep(max(0, start + (index + 1) * tick - time.perf_counter()))
+        produced = time.perf_counter()
+        store.flush()
+        lag = (time.perf_counter() - produced) * 1000
+        commits = store.commits - 1
+        read = measure(lambda: store.page(after=appended // 2, level='ERROR', limit=50))
+        persisted = len(store) - 1
+        store.close()
+
+    print(f"🗄️ Logs de misión: {appended} entradas a {rate}/s en {commits} commits "
+          f"({appended / max(1, commits):.0f} por commit), append {append_time / appended * 1e6:.1f} µs, "
+          f"retraso al terminar {lag:.1f} ms; página por nivel {read:.2f} ms")
+    return persisted == appended and lag < 100
+
+def bench_mission_log_bulk():
+    """Ingesta NDJSON: 10 000 eventos en un request frente a un POST por evento (objetivo: 10x)"""
+    import gzip
+    import json
+    from app import create_app
+
+    app = create_app()
+    # Sin rate limiting: se mide el coste de cada request, no los 429
+    for limiter in app.extensions.get('limiter', ()):
+        limiter.enabled = False
+    client = app.test_client()
+    token = json.loads(client.post('/api/login', json={'username': 'admin', 'password': 'admin'}).data)['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    events = 10_000
+    body = gzip.compress('\n'.join(json.dumps({'level': 'INFO', 'message': f"evento {i}"})
+                                   for i in range(events)).encode())
+
+    bulk = measure(lambda: client.post('/api/mission-logs/bulk', data=body,
+                                       headers=dict(headers, **{'Content-Encoding': 'gzip'})), repeat=3)
+    single = measure(lambda: client.post('/api/mission-logs/add', json={'level': 'INFO', 'message': 'evento'},
+                                         headers=headers), repeat=50)
+    per_event = bulk * 1000 / events
+    print(f"📦 Bulk NDJSON (gzip): {events} eventos en {bulk:.0f} ms ({per_event:.1f} µs/evento); "
+          f"un POST por evento: {single * 1000:.0f} µs")
+    return per_event * 10 < single * 1000
+
+def bench_logging():
+    """logging.info con el disco atascándose: cola frente a FileHandler síncrono (objetivo: p99.9 < 1 ms)"""
+    import logging
+    import os
+    import tempfile
+    from app.logpipeline import LOG_FORMAT, BatchRotatingFileHandler, LogPipeline, PipelineHandler
+
+    class StallingFile:
+        """Fichero que se bloquea 5 ms cada 200 escrituras (writeback del disco)"""
+
+        def __init__(self, path):
+            self._file = open(path, 'a', encoding='utf-8')
+            self._writes = 0
+
+        def write(self, data):
+            self._writes += 1
+            if self._writes % 200 == 0:
+                time.sleep(0.005)
+            return self._file.write(data)
+
+        def __getattr__(self, name):
+            return getattr(self._file, name)
+
+    lines = 10_000
+    with tempfile.TemporaryDirectory() as directory:
+        formatter = logging.Formatter(LOG_FORMAT)
+        sync_handler = logging.FileHandler(os.path.join(directory, 'sync.log'), delay=True)
+        sync_handler.stream = StallingFile(os.path.join(directory, 'sync.log'))
+        file_handler = BatchRotatingFileHandler(os.path.join(directory, 'async.log'))
+        file_handler.stream = StallingFile(os.path.join(directory, 'async.log'))
+        for handler in (sync_handler, file_handler):
+            handler.setFormatter(formatter)
+        pipeline = LogPipeline(capacity=lines * 2)
+        pipeline.handlers = [file_handler]
+
+        def run(handler):
+            logger = logging.getLogger(f"bench.{id(handler)}")
+            logger.propagate = False
+            logger.setLevel(logging.INFO)
+            logger.handlers = [handler]
+            latencies = []
+            for i in range(lines):
+                start = time.perf_counter()
+                logger.info(f"Request {i} completado: GET /api/stats 200 (0.4 ms)")
+                latencies.append((time.perf_counter() - start) * 1e6)
+                if i % 50 == 0:
+                    # Ritmo de requests: el escritor avanza entre medias
+                    time.sleep(0.0005)
+            return np.mean(latencies), np.percentile(latencies, 99.9)
+
+        sync_mean, sync_tail = run(sync_handler)
+        queued_mean, queued_tail = run(PipelineHandler(pipeline))
+        pipeline.stop()
+        sync_handler.close()
+        file_handler.close()
+
+    print(f"📝 logging.info con el disco atascándose: síncrono {sync_mean:.1f} µs de media, "
+          f"p99.9 {sync_tail:.0f} µs; cola {queued_mean:.1f} µs de media, p99.9 {queued_tail:.0f} µs "
+          f"({pipeline.written} escritos por lotes, descartados {sum(pipeline.dropped.values())})")
+    return queued_tail < 1000
+
+BENCHMARKS = {
+    'lttb': bench_lttb,
+    'procfs': bench_procfs,
+    'processes': bench_processes,
+    'probes': bench_probes,
+    'stats_payload': bench_stats_payload,
+    'query': bench_query,
+    'mission_log': bench_mission_log,
+    'mission_log_bulk': bench_mission_log_bulk,
+    'logging': bench_logging,
+}
+
+def main():
+    """Función principal de benchmarks"""
+    parser = argparse.ArgumentParser(description='Benchmarks de Hardware Monitor')
+    parser.add_argument('names', nargs='*',
+                        help=f"Benchmarks a ejecutar (por defecto todos): {', '.join(BENCHMARKS)}")
+    args = parser.parse_args()
+
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"Benchmarks desconocidos: {', '.join(unknown)}")
+
+    print("⏱️ Iniciando benchmarks de Hardware Monitor")
+    print("=" * 50)
+
+    names = args.names or list(BENCHMARKS)
+    passed = sum(1 for name in names if BENCHMARKS[name]())
+
+    print("=" * 50)
+    print(f"📊 Resultados: {passed}/{len(names)} benchmarks dentro del objetivo")
+    sys.exit(0 if passed == len(names) else 1)
+
+if __name__ == "__main__":
+    main()
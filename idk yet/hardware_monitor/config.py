@@ -43,11 +43,84 @@ class Config:
     LOG_FILE = os.getenv('LOG_FILE', 'hardware_monitor.log')
     LOG_MAX_SIZE = int(os.getenv('LOG_MAX_SIZE', 10 * 1024 * 1024))  # 10MB
     LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 5))
+    LOG_COMPRESS = os.getenv('LOG_COMPRESS', 'true').lower() == 'true'  # gzip de los segmentos rotados
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))  # Registros en cola antes de descartar
+    LOG_DROP_LEVEL = os.getenv('LOG_DROP_LEVEL', 'WARNING').upper()  # Con la cola llena se descarta lo inferior
+    LOG_BATCH_MAX = int(os.getenv('LOG_BATCH_MAX', 512))
+    LOG_ACCESS_SAMPLE = float(os.getenv('LOG_ACCESS_SAMPLE', 1.0))  # Fracción de requests con línea de acceso
+    LOG_ROTATE_CHECK = float(os.getenv('LOG_ROTATE_CHECK', 1.0))  # Segundos entre comprobaciones del dueño de la rotación
     
     # Configuración de la aplicación
-    UPDATE_INTERVAL = int(os.getenv('UPDATE_INTERVAL', 5000))
+    UPDATE_INTERVAL = int(os.getenv('UPDATE_INTERVAL', 5000))  # Cadencia del sampler en ms
+    SAMPLER_ENABLED = os.getenv('SAMPLER_ENABLED', 'true').lower() == 'true'
+    COLLECTOR_POOL_SIZE = int(os.getenv('COLLECTOR_POOL_SIZE', 4))  # Hilos para recolectar en paralelo
+    ON_DEMAND_BUDGET_MS = int(os.getenv('ON_DEMAND_BUDGET_MS', 1000))  # Presupuesto por defecto sin sampler
+    PROCFS_FAST_PATH = os.getenv('PROCFS_FAST_PATH', 'true').lower() == 'true'  # Lectura directa de /proc (Linux)
+    DISK_EXCLUDE_FSTYPES = os.getenv('DISK_EXCLUDE_FSTYPES', 'squashfs')  # Separados por comas
+    DISK_DEVICES_EXCLUDE = os.getenv('DISK_DEVICES_EXCLUDE', r'loop\d+|ram\d+|zram\d+|sr\d+|fd\d+')
+    NETWORK_INTERFACES_INCLUDE = os.getenv('NETWORK_INTERFACES_INCLUDE', '')  # Regex; vacío: todas
+    NETWORK_INTERFACES_EXCLUDE = os.getenv(
+        'NETWORK_INTERFACES_EXCLUDE', r'lo|veth.*|docker\d*|br-.*|virbr.*|vnet\d*|cni\d*|flannel.*|ifb\d*'
+    )
+    NETWORK_MAX_BYTES_PER_S = float(os.getenv('NETWORK_MAX_BYTES_PER_S', 1.25e9))  # Tope creíble para desbordes
+    COLLECTOR_DEADLINE_MS = int(os.getenv('COLLECTOR_DEADLINE_MS', 1000))  # Plazo por recolector
+    COLLECTOR_BACKOFF_BASE = float(os.getenv('COLLECTOR_BACKOFF_BASE', 5))  # Cuarentena inicial en segundos
+    COLLECTOR_BACKOFF_MAX = float(os.getenv('COLLECTOR_BACKOFF_MAX', 300))
+    READINESS_DRAIN_SECONDS = float(os.getenv('READINESS_DRAIN_SECONDS', 5))  # /readyz en 503 antes de parar
+    PROCESS_SAMPLE_BUDGET_MS = int(os.getenv('PROCESS_SAMPLE_BUDGET_MS', 200))  # Tiempo máximo por muestra de procesos
+    PROCESS_MIN_INTERVAL = float(os.getenv('PROCESS_MIN_INTERVAL', 1.0))  # Segundos
+    PROCESS_MAX_TRACKED = int(os.getenv('PROCESS_MAX_TRACKED', 10000))
+    PROCESS_TOP_MAX = int(os.getenv('PROCESS_TOP_MAX', 100))
+    MISSION_LOG_CAPACITY = int(os.getenv('MISSION_LOG_CAPACITY', 1000))  # Logs de misión conservados
+    MISSION_LOG_PAGE_MAX = int(os.getenv('MISSION_LOG_PAGE_MAX', 200))
+    MISSION_LOG_DB = os.getenv('MISSION_LOG_DB', '')  # SQLite compartido por los workers; vacío: en memoria
+    MISSION_LOG_FLUSH_MS = int(os.getenv('MISSION_LOG_FLUSH_MS', 5))  # Ventana del group commit
+    MISSION_LOG_BATCH_MAX = int(os.getenv('MISSION_LOG_BATCH_MAX', 2000))
+    MISSION_LOG_RETENTION_ROWS = int(os.getenv('MISSION_LOG_RETENTION_ROWS', 1000000))
+    MISSION_LOG_BULK_BATCH = int(os.getenv('MISSION_LOG_BULK_BATCH', 500))  # Registros por lote en /bulk
+    MISSION_LOG_MAX_LINE_BYTES = int(os.getenv('MISSION_LOG_MAX_LINE_BYTES', 65536))
+    STATS_GZIP_LEVEL = int(os.getenv('STATS_GZIP_LEVEL', 9))  # /api/stats se comprime una vez por muestra
+    STATS_BROTLI_QUALITY = int(os.getenv('STATS_BROTLI_QUALITY', 9))
+    SHARED_SNAPSHOT_NAME = os.getenv('SHARED_SNAPSHOT_NAME', '')  # Lo fija gunicorn.conf.py
+    SHARED_SNAPSHOT_SIZE = int(os.getenv('SHARED_SNAPSHOT_SIZE', 256 * 1024))  # Bytes de payload
     MAX_DATA_POINTS = int(os.getenv('MAX_DATA_POINTS', 20))
     
+    # Configuración del historial en memoria (buffer circular)
+    HISTORY_CAPACITY = int(os.getenv('HISTORY_CAPACITY', 86400))  # Muestras por serie
+    HISTORY_MAX_SERIES = int(os.getenv('HISTORY_MAX_SERIES', 50))
+    HISTORY_DEFAULT_WINDOW = int(os.getenv('HISTORY_DEFAULT_WINDOW', 3600))  # Segundos
+    QUERY_MAX_INDEXED = int(os.getenv('QUERY_MAX_INDEXED', 8))  # Métricas con índices de rango
+    QUERY_MAX_POINTS = int(os.getenv('QUERY_MAX_POINTS', 1000))  # Buckets por consulta de /api/query
+    QUERY_CACHE_SIZE = int(os.getenv('QUERY_CACHE_SIZE', 10000))  # Buckets cerrados memoizados
+    QUERY_SKETCH_SECONDS = int(os.getenv('QUERY_SKETCH_SECONDS', 60))  # Tramo de los sketches de cuantiles
+    ROLLUP_TIERS = os.getenv('ROLLUP_TIERS', '10:8640,60:10080,3600:2160')  # resolución_s:buckets
+    
+    # Configuración del historial persistente (segmentos mapeados en disco)
+    HISTORY_DIR = os.getenv('HISTORY_DIR', '')  # Vacío: sin persistencia
+    HISTORY_SEGMENT_SECONDS = int(os.getenv('HISTORY_SEGMENT_SECONDS', 3600))
+    HISTORY_SEGMENT_RECORDS = int(os.getenv('HISTORY_SEGMENT_RECORDS', 3600))
+    HISTORY_RETENTION_SECONDS = int(os.getenv('HISTORY_RETENTION_SECONDS', 7 * 86400))
+    HISTORY_RETENTION_BYTES = int(os.getenv('HISTORY_RETENTION_BYTES', 512 * 1024 * 1024))
+    HISTORY_RESTORE_WINDOW = int(os.getenv('HISTORY_RESTORE_WINDOW', 86400))  # Segundos
+    
+    # Configuración del streaming SSE
+    STREAM_QUEUE_SIZE = int(os.getenv('STREAM_QUEUE_SIZE', 16))
+    STREAM_REPLAY_SIZE = int(os.getenv('STREAM_REPLAY_SIZE', 120))
+    STREAM_HEARTBEAT = float(os.getenv('STREAM_HEARTBEAT', 15))
+    WEB_THREADS = int(os.getenv('WEB_THREADS', 32))  # Hilos gthread por worker
+    STREAM_RESERVED_THREADS = int(os.getenv('STREAM_RESERVED_THREADS', WEB_THREADS // 2))
+    STREAM_MAX_CLIENTS = min(int(os.getenv('STREAM_MAX_CLIENTS', WEB_THREADS)),
+                             max(1, WEB_THREADS - STREAM_RESERVED_THREADS))  # Clientes SSE por worker
+    DELTA_KEYFRAME_INTERVAL = int(os.getenv('DELTA_KEYFRAME_INTERVAL', 30))  # Muestras entre keyframes
+    
+    # Configuración de percentiles (DDSketch por ventana deslizante)
+    PERCENTILE_ACCURACY = float(os.getenv('PERCENTILE_ACCURACY', 0.01))  # Error relativo
+    PERCENTILE_MAX_BINS = int(os.getenv('PERCENTILE_MAX_BINS', 1024))
+    PERCENTILE_WINDOWS = os.getenv('PERCENTILE_WINDOWS', '300:10,3600:12,86400:24')  # ventana_s:tramos
+    PERCENTILE_SHARE_DIR = os.getenv('PERCENTILE_SHARE_DIR', '')  # Latencias de todos los workers; vacío: por worker
+    PERCENTILE_SHARE_INTERVAL = float(os.getenv('PERCENTILE_SHARE_INTERVAL', 5))
+    PERCENTILE_SHARE_TTL = float(os.getenv('PERCENTILE_SHARE_TTL', 60))
+    
     # Configuración de reintentos
     MAX_RETRIES_CRITICAL = int(os.getenv('MAX_RETRIES_CRITICAL', '3'))
     MAX_RETRIES_NORMAL = int(os.getenv('MAX_RETRIES_NORMAL', '2'))
@@ -59,8 +132,8 @@ class Config:
     METRICS_PATH = os.getenv('METRICS_PATH', '/metrics')
     
     # Configuración de health checks
-    HEALTH_CHECK_INTERVAL = int(os.getenv('HEALTH_CHECK_INTERVAL', 30))
-    HEALTH_CHECK_TIMEOUT = int(os.getenv('HEALTH_CHECK_TIMEOUT', 5))
+    HEALTH_CHECK_INTERVAL = int(os.getenv('HEALTH_CHECK_INTERVAL', 30))  # Refresco de los checks caros
+    HEALTH_CHECK_TIMEOUT = int(os.getenv('HEALTH_CHECK_TIMEOUT', 5))  # Plazo de cada check caro
     
     # Umbrales de alerta
     CPU_ALERT_THRESHOLD = float(os.getenv('CPU_ALERT_THRESHOLD', 90.0))
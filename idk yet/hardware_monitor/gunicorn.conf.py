@@ -0,0 +1,89 @@
+"""
+Configuración de Gunicorn: un único proceso de muestreo publica en memoria compartida
+"""
+
+import logging
+import multiprocessing
+import os
+import shutil
+import signal
+import tempfile
+import threading
+import time
+
+# Nombre del segmento por despliegue; se fija antes de importar la app (--preload)
+if os.getenv('SAMPLER_ENABLED', 'true').lower() == 'true':
+    os.environ.setdefault('SHARED_SNAPSHOT_NAME', f"hardware_monitor_{os.getpid()}")
+# Latencias de todos los workers fusionadas en /api/percentiles
+os.environ.setdefault('PERCENTILE_SHARE_DIR',
+                      os.path.join(tempfile.gettempdir(), f"hardware_monitor_{os.getpid()}_percentiles"))
+
+# Hilos gthread por worker; app/streaming.py limita los clientes SSE con el mismo valor
+threads = int(os.getenv('WEB_THREADS', 32))
+
+_sampler_process = None
+
+def _sampler_main(name, parent_pid):
+    """Proceso de muestreo: sale con SIGTERM (on_exit) o si el master desaparece"""
+    from app.sampler import run_shared_sampler
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    run_shared_sampler(name, stop_event, parent_pid)
+
+def when_ready(server):
+    """Lanzar el proceso de muestreo: el master no arranca hilos antes de hacer fork de los workers"""
+    global _sampler_process
+    name = os.getenv('SHARED_SNAPSHOT_NAME')
+    if not name:
+        return
+    _sampler_process = multiprocessing.get_context('fork').Process(
+        target=_sampler_main, args=(name, os.getpid()), name='hardware-sampler')
+    _sampler_process.start()
+    logging.info(f"Proceso de muestreo lanzado (pid {_sampler_process.pid})")
+
+def post_fork(server, worker):
+    """Recargar el historial del disco y enganchar el worker al snapshot compartido"""
+    from app.persistence import history_segments, HISTORY_RESTORE_WINDOW
+    from app.timeseries import metrics_store
+    if history_segments.enabled:
+        # Lo heredado es de antes del preload y el proceso de muestreo ha seguido escribiendo;
+        # el worker lo reabre solo para lectura
+        history_segments.reload(read_only=True)
+        metrics_store.clear()
+        restored = metrics_store.restore(history_segments, since=time.time() - HISTORY_RESTORE_WINDOW)
+        logging.info(f"Worker {os.getpid()}: historial recargado de disco ({restored} muestras)")
+
+    from app.sampler import hardware_sampler
+    hardware_sampler.start()
+
+def post_worker_init(worker):
+    """SIGTERM del master: /readyz pasa a 503 antes de que el worker deje de aceptar conexiones"""
+    import signal
+    from app.probes import drain_handler, readiness
+    signal.signal(signal.SIGTERM, drain_handler(worker.handle_exit, readiness))
+
+def worker_int(worker):
+    """SIGINT/SIGQUIT: el worker sale ya, pero /readyz deja de anunciarlo mientras termina"""
+    from app.probes import readiness
+    readiness.mark_not_ready('interrumpido')
+
+def worker_abort(worker):
+    """Worker colgado que el master aborta por timeout"""
+    from app.probes import readiness
+    readiness.mark_not_ready('abortado por timeout')
+
+def worker_exit(server, worker):
+    """Confirmar los logs de misión encolados por el worker"""
+    from app.missionlog import mission_logs
+    if hasattr(mission_logs, 'close'):
+        mission_logs.close()
+    from app.logpipeline import log_pipeline
+    log_pipeline.stop()
+
+def on_exit(server):
+    """Detener el proceso de muestreo (elimina el segmento y cierra el historial al salir)"""
+    if _sampler_process is not None:
+        _sampler_process.terminate()
+        _sampler_process.join(10)
+    shutil.rmtree(os.environ['PERCENTILE_SHARE_DIR'], ignore_errors=True)
@@ -22,11 +22,28 @@ def signal_handler(signum, frame):
 
 def graceful_shutdown(app):
     """Función para shutdown graceful"""
+    # Dejar de anunciarse como disponible para que el balanceador deje de enviar tráfico
+    from app.probes import readiness
+    readiness.mark_not_ready('apagando')
     print("⏳ Esperando que los requests activos terminen...")
     
     # Dar tiempo para que los requests activos terminen
     time.sleep(2)
     
+    # Cerrar streams SSE, detener el sampler, cerrar el historial y confirmar los logs de misión
+    from app.sampler import hardware_sampler
+    from app.streaming import stream_hub
+    from app.persistence import history_segments
+    from app.missionlog import mission_logs
+    stream_hub.close_all()
+    hardware_sampler.stop(timeout=5)
+    history_segments.close()
+    if hasattr(mission_logs, 'close'):
+        mission_logs.close()
+    # Escribir los logs aún en cola
+    from app.logpipeline import log_pipeline
+    log_pipeline.stop()
+    
     print("✅ Shutdown completado")
     sys.exit(0)
 
@@ -13,6 +13,9 @@ class MilitaryMonitor {
         this.systemStatus = 'OPERATIONAL';
         this.authToken = null;
         this.missionLogs = [];
+        this.tacticalStream = null;
+        this.tacticalState = null;
+        this.lastEventId = null;
         
         // Military color scheme
         this.militaryColors = {
@@ -38,11 +41,8 @@ class MilitaryMonitor {
             // Start mission timer
             setInterval(() => this.updateMissionTime(), 1000);
             
-            // Start data updates
-            setInterval(() => this.updateTacticalData(), this.updateInterval);
-            
-            // Initial data load
-            await this.updateTacticalData();
+            // Start data updates (server push, polling fallback)
+            this.startTacticalStream();
             
         } catch (error) {
             this.addMissionLog('ERROR', `MISSION INITIALIZATION FAILED: ${error.message}`);
@@ -144,6 +144,94 @@ class MilitaryMonitor {
         }
     }
     
+    // Subscribe to tactical data stream (Server-Sent Events)
+    startTacticalStream() {
+        if (!window.EventSource) {
+            // Legacy browsers: fall back to polling
+            setInterval(() => this.updateTacticalData(), this.updateInterval);
+            this.updateTacticalData();
+            return;
+        }
+        
+        let url = `/api/stream?encoding=delta&jwt=${encodeURIComponent(this.authToken)}`;
+        if (this.lastEventId !== null && this.tacticalState !== null) {
+            url += `&last_event_id=${this.lastEventId}`;
+        }
+        
+        const source = new EventSource(url);
+        this.tacticalStream = source;
+        
+        // Full state: sent on connect, periodically and after lost events
+        source.addEventListener('keyframe', (event) => {
+            const message = JSON.parse(event.data);
+            this.tacticalState = message.data;
+            this.lastEventId = message.seq;
+            this.renderTacticalState();
+        });
+        
+        // Only the fields that changed since the base sequence
+        source.addEventListener('delta', (event) => {
+            const message = JSON.parse(event.data);
+            if (this.tacticalState === null || String(message.base) !== String(this.lastEventId)) {
+                // Out of sync: reconnect without Last-Event-ID to get a fresh keyframe
+                this.resyncTacticalStream();
+                return;
+            }
+            this.applyDelta(this.tacticalState, message.changes);
+            this.lastEventId = message.seq;
+            this.renderTacticalState();
+        });
+        
+        source.onopen = () => {
+            this.addMissionLog('INFO', 'TACTICAL STREAM CONNECTED');
+        };
+        
+        source.onerror = async () => {
+            if (source.readyState !== EventSource.CLOSED) {
+                // Browser reconnects automatically sending Last-Event-ID
+                return;
+            }
+            // Stream rejected (e.g. expired token): re-authenticate and resume
+            this.addMissionLog('WARNING', 'TACTICAL STREAM LOST - REAUTHENTICATING');
+            try {
+                await this.authenticate();
+                setTimeout(() => this.startTacticalStream(), this.updateInterval);
+            } catch (error) {
+                this.triggerDefconAlert('DATA ACQUISITION FAILED');
+            }
+        };
+    }
+    
+    // Drop local state and request a new keyframe
+    resyncTacticalStream() {
+        if (this.tacticalStream) {
+            this.tacticalStream.close();
+        }
+        this.tacticalState = null;
+        this.lastEventId = null;
+        this.startTacticalStream();
+    }
+    
+    // Apply a JSON merge patch (null removes the field)
+    applyDelta(state, changes) {
+        Object.entries(changes).forEach(([key, value]) => {
+            if (value === null) {
+                delete state[key];
+            } else if (typeof value === 'object' && !Array.isArray(value) &&
+                       state[key] && typeof state[key] === 'object') {
+                this.applyDelta(state[key], value);
+            } else {
+                state[key] = value;
+            }
+        });
+    }
+    
+    // Render current tactical state
+    renderTacticalState() {
+        this.updateGauges(this.tacticalState);
+        this.checkAlertThresholds(this.tacticalState);
+    }
+    
     // Update military gauges
     updateGauges(data) {
         // CPU Gauge
@@ -198,12 +286,27 @@ class MilitaryMonitor {
         const receivedElement = document.getElementById('network-received');
         
         if (sentElement && networkData.sent_mb !== undefined) {
-            sentElement.textContent = `${networkData.sent_mb.toFixed(1)} MB`;
+            sentElement.textContent = `${networkData.sent_mb.toFixed(1)} MB${this.formatRate(networkData.bytes_sent_per_s)}`;
         }
         
         if (receivedElement && networkData.received_mb !== undefined) {
-            receivedElement.textContent = `${networkData.received_mb.toFixed(1)} MB`;
+            receivedElement.textContent = `${networkData.received_mb.toFixed(1)} MB${this.formatRate(networkData.bytes_recv_per_s)}`;
+        }
+    }
+    
+    // Format a server-computed throughput rate (bytes/s)
+    formatRate(bytesPerSecond) {
+        if (bytesPerSecond === undefined) {
+            return '';
+        }
+        const units = ['B/s', 'KB/s', 'MB/s', 'GB/s'];
+        let value = bytesPerSecond;
+        let unit = 0;
+        while (value >= 1024 && unit < units.length - 1) {
+            value /= 1024;
+            unit++;
         }
+        return ` · ${value.toFixed(1)} ${units[unit]}`;
     }
     
     // Check alert thresholds
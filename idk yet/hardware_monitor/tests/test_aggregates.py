@@ -0,0 +1,88 @@
+"""
+Tests de las consultas agregadas por rango
+"""
+
+import json
+
+import numpy as np
+
+from app import create_app
+from app.aggregates import RangeIndex
+from app.timeseries import RingBufferStore
+
+def get_auth_headers(client):
+    """Obtener headers con token JWT"""
+    response = client.post('/api/login', json={'username': 'admin', 'password': 'admin'})
+    token = json.loads(response.data)['access_token']
+    return {'Authorization': f'Bearer {token}'}
+
+def fill(store, values, start=0):
+    for offset, value in enumerate(values):
+        store.append(1000.0 + start + offset, {'cpu.usage': value})
+
+def brute_force(store, since, until):
+    timestamps, values = store.range('cpu.usage')
+    window = values[(timestamps >= since) & (timestamps < until)].astype(np.float64)
+    return window[~np.isnan(window)]
+
+def test_agregados_coinciden_con_el_calculo_directo():
+    """sum/avg/min/max/count coinciden con reescanear, antes y después de dar la vuelta al buffer"""
+    rng = np.random.default_rng(7)
+    values = rng.random(1300) * 100
+    values[rng.random(1300) < 0.05] = np.nan
+    store = RingBufferStore(capacity=500, max_series=2, aggregates=RangeIndex(sketch_seconds=10))
+
+    # La primera consulta construye el índice en bloque; el resto llega de forma incremental
+    fill(store, values[:300])
+    store.aggregate('cpu.usage', 'sum', 1000.0)
+    fill(store, values[300:], start=300)
+
+    for since, until in ((1850.0, 2300.0), (2100.5, 2101.5), (1900.0, 1990.0), (0.0, 5000.0)):
+        expected = brute_force(store, since, until)
+        for fn, reference in (('sum', np.sum), ('avg', np.mean), ('min', np.min), ('max', np.max), ('count', len)):
+            result = store.aggregate('cpu.usage', fn, since, until)['values'][0]
+            assert np.isclose(result, float(reference(expected)), rtol=1e-5), (fn, since, until)
+
+def test_cuantiles_con_sketches():
+    """p95 por rango con el error relativo de DDSketch (tramos completos + bordes crudos)"""
+    values = np.random.default_rng(3).lognormal(3, 1, 2000)
+    store = RingBufferStore(capacity=2000, max_series=2, aggregates=RangeIndex(sketch_seconds=60))
+    fill(store, values)
+
+    expected = np.quantile(brute_force(store, 1123.0, 2877.0), 0.95, method='lower')
+    result = store.aggregate('cpu.usage', 'p95', 1123.0, 2877.0)['values'][0]
+    assert abs(result - expected) <= 0.0101 * expected
+
+def test_incremento_y_tasa_con_reinicio():
+    """increase suma los incrementos y trata un descenso como reinicio del contador"""
+    store = RingBufferStore(capacity=100, max_series=2, aggregates=RangeIndex())
+    fill(store, [0, 10, 20, 5, 15])
+    assert store.aggregate('cpu.usage', 'increase', 1000.0)['values'][0] == 35.0
+    assert store.aggregate('cpu.usage', 'rate', 1000.0)['values'][0] == 35.0 / 4
+
+def test_buckets_memoizados_hasta_que_llegan_datos():
+    """Los buckets cerrados se reutilizan; el abierto se recalcula con cada muestra nueva"""
+    index = RangeIndex()
+    store = RingBufferStore(capacity=1000, max_series=2, aggregates=index)
+    fill(store, range(95))
+
+    first = store.aggregate('cpu.usage', 'max', 1000.0, step=10)
+    assert first['ts'][0] == 1000.0 and first['values'][-1] == 94.0
+    hits = index.hits
+    store.aggregate('cpu.usage', 'max', 1000.0, step=10)
+    assert index.hits == hits + 9
+
+    fill(store, [500.0], start=95)
+    assert store.aggregate('cpu.usage', 'max', 1000.0, step=10)['values'][-1] == 500.0
+
+def test_endpoint_query():
+    """/api/query valida la función y la métrica"""
+    app = create_app()
+    app.config['TESTING'] = True
+    client = app.test_client()
+    headers = get_auth_headers(client)
+
+    data = json.loads(client.get('/api/query?metric=cpu.usage&fn=max&from=0', headers=headers).data)
+    assert data['success'] and len(data['values']) == 1
+    assert client.get('/api/query?metric=cpu.usage&fn=median', headers=headers).status_code == 400
+    assert client.get('/api/query?metric=nope&fn=max', headers=headers).status_code == 404
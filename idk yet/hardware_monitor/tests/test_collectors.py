@@ -0,0 +1,300 @@
+"""
+Tests de los colectores de hardware
+"""
+
+import multiprocessing
+import os
+import sys
+import time
+
+import psutil
+import pytest
+
+from app.procfs import CLOCK_TICKS, ProcFile, ProcfsCollector
+from app.utils import CpuTimesCollector, DiskCollector, NetworkRateCollector, get_cpu_usage
+
+FAKE_PROC = {
+    'stat': (
+        "cpu  300 0 100 1000 10 0 0 5 0 0\n"
+        "cpu0 200 0 50 500 5 0 0 5 0 0\n"
+        "cpu1 100 0 50 500 5 0 0 0 0 0\n"
+        "intr 12345 0 0\nctxt 999\n"
+    ),
+    'meminfo': (
+        "MemTotal:       1000 kB\nMemFree:         200 kB\nMemAvailable:    600 kB\n"
+        "Buffers:          50 kB\nCached:          300 kB\nSwapCached:        0 kB\n"
+        "SReclaimable:     50 kB\n"
+    ),
+    'net/dev': (
+        "Inter-|   Receive                                                |  Transmit\n"
+        " face |bytes    packets errs drop fifo frame compressed multicast|bytes    packets errs drop fifo colls carrier compressed\n"
+        "    lo:    100      2    0    0    0     0          0         0      100      2    0    0    0     0       0          0\n"
+        "  eth0:   5000     40    0    0    0     0          0         0     3000     30    0    0    0     0       0          0\n"
+    ),
+    'diskstats': (
+        "   8       0 sda 10 0 80 5 20 0 160 10 0 15 15 0 0 0 0\n"
+        "   8       1 sda1 10 0 80 5 20 0 160 10 0 15 15 0 0 0 0\n"
+    ),
+    'filesystems': "nodev\tsysfs\nnodev\tproc\nnodev\toverlay\n\text4\n\tsquashfs\n",
+    'self/mountinfo': (
+        "22 1 0:21 / / rw - overlay overlay rw\n"
+        "23 22 0:22 / /proc rw - proc proc rw\n"
+        "24 22 8:1 / /mnt/datos\\040externos rw - ext4 /dev/sda1 rw\n"
+        "25 22 8:1 /sub /srv/bind rw shared:1 - ext4 /dev/sda1 rw\n"
+        "26 22 7:0 / /snap/core rw - squashfs /dev/loop0 ro\n"
+    ),
+}
+
+@pytest.fixture
+def fake_proc(tmp_path):
+    """Árbol /proc mínimo con contenido conocido"""
+    (tmp_path / 'net').mkdir()
+    (tmp_path / 'self').mkdir()
+    for name, content in FAKE_PROC.items():
+        (tmp_path / name).write_text(content)
+    return tmp_path
+
+def test_cpu_no_bloquea():
+    """La medición de CPU por deltas no duerme el hilo"""
+    start = time.monotonic()
+    cpu_data = get_cpu_usage()
+    assert time.monotonic() - start < 0.5
+    assert 0 <= cpu_data['usage'] <= 100
+
+def test_cpu_desglose_por_nucleo():
+    """El colector reporta uso por núcleo y por tipo de tiempo"""
+    cpu_data = get_cpu_usage()
+    assert len(cpu_data['per_core']) == cpu_data['cores']
+    for field in ('user', 'system', 'iowait', 'steal'):
+        assert 0 <= cpu_data[field] <= 100
+
+def test_cpu_primera_lectura_cebada():
+    """La primera lectura tras cebar no devuelve un valor falso de cero deltas"""
+    collector = CpuTimesCollector()
+    usage, per_core, split = collector.sample()
+    assert 0 <= usage <= 100
+    assert all(0 <= value <= 100 for value in per_core)
+
+def test_cpu_lecturas_seguidas_repiten_la_ultima_medicion(monkeypatch):
+    """Dos lecturas con un delta demasiado pequeño no devuelven el uso acumulado desde el arranque"""
+    from app.procfs import CpuTimes
+    readings = [
+        [CpuTimes(1000.0, 0, 1000.0, 8000.0, 0, 0, 0, 0, 0, 0)],  # Desde el arranque: 20 %
+        [CpuTimes(1001.0, 0, 1000.0, 8001.0, 0, 0, 0, 0, 0, 0)],  # +1 s user, +1 s idle: 50 %
+        [CpuTimes(1001.01, 0, 1000.0, 8001.0, 0, 0, 0, 0, 0, 0)],  # Delta de 0,01 s: ruido
+    ]
+    monkeypatch.setattr(CpuTimesCollector, '_read_times', staticmethod(lambda: readings.pop(0)))
+    collector = CpuTimesCollector()
+    assert collector.sample()[0] == 50.0
+    assert collector.sample()[0] == 50.0
+
+def test_procfs_analiza_solo_los_campos_necesarios(fake_proc):
+    """El backend /proc interpreta stat, meminfo, net/dev y diskstats"""
+    collector = ProcfsCollector(str(fake_proc))
+    times = collector.cpu_times()
+    assert len(times) == 2
+    assert times[0].user == 200 / CLOCK_TICKS and times[1].steal == 0
+
+    total, used, free, percent = collector.memory()
+    assert (total, free) == (1000 * 1024, 200 * 1024)
+    assert used == (1000 - 200 - 350 - 50) * 1024
+    assert percent == pytest.approx(40.0)
+
+    assert collector.net_pernic()['eth0'] == (3000, 5000, 30, 40, 0, 0, 0, 0)
+    assert collector.diskstats()['sda'][:3] == [10, 0, 80]
+
+def test_procfile_reutiliza_y_amplia_el_buffer(fake_proc):
+    """Un fichero mayor que el buffer se lee completo y las relecturas ven los cambios"""
+    path = fake_proc / 'grande'
+    path.write_text('x' * 100)
+    proc_file = ProcFile(str(path), size=16)
+    assert proc_file.read() == b'x' * 100
+    path.write_text('y' * 10)
+    assert proc_file.read() == b'y' * 10
+    proc_file.close()
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='Backend /proc solo en Linux')
+def test_procfile_lee_seq_file_de_varias_paginas():
+    """Los seq_file devuelven lecturas cortas de una página: se sigue leyendo hasta EOF"""
+    proc_file = ProcFile('/proc/self/smaps')
+    data = proc_file.read()
+    with open('/proc/self/smaps', 'rb') as f:
+        expected = f.read()
+    proc_file.close()
+    assert len(data) > 4 * 4096
+    assert data.endswith(b'\n')
+    # Los mapeos pueden variar entre lecturas, pero el último (pila/vsyscall) es el mismo
+    last_mapping = [line for line in data.splitlines() if b'-' in line.split(b' ')[0]][-1]
+    assert last_mapping in expected.splitlines()
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='Backend /proc solo en Linux')
+def test_procfs_coincide_con_psutil():
+    """En Linux el camino rápido produce los mismos valores que psutil"""
+    collector = ProcfsCollector()
+    assert collector.memory()[0] == psutil.virtual_memory().total
+    assert len(collector.cpu_times()) == len(psutil.cpu_times(percpu=True))
+    assert collector.disk_usage('/')[0] == psutil.disk_usage('/').total
+
+class FakeNetworkCollector(NetworkRateCollector):
+    """Colector con contadores y reloj controlados por el test"""
+
+    def __init__(self, readings, **kwargs):
+        self.readings = list(readings)
+        super().__init__(**kwargs)
+
+    def _read_counters(self):
+        return self.readings.pop(0)
+
+def counters(bytes_sent, bytes_recv=0, errin=0):
+    return (bytes_sent, bytes_recv, 10, 10, errin, 0, 0, 0)
+
+def test_red_tasas_por_interfaz(monkeypatch):
+    """Bytes/s, paquetes/s y errores/s por interfaz; loopback filtrada por defecto"""
+    clock = iter([100.0, 102.0])
+    monkeypatch.setattr('app.utils.time.monotonic', lambda: next(clock))
+    collector = FakeNetworkCollector([
+        {'lo': counters(0), 'eth0': counters(1000, 500)},
+        {'lo': counters(9999), 'eth0': counters(3000, 1500, errin=4)},
+    ])
+    _, rates = collector.sample()
+    assert set(rates) == {'eth0'}
+    assert rates['eth0']['bytes_sent_per_s'] == 1000.0
+    assert rates['eth0']['bytes_recv_per_s'] == 500.0
+    assert rates['eth0']['errors_in_per_s'] == 2.0
+    assert rates['eth0']['packets_sent_per_s'] == 0.0
+
+def test_red_desborde_32_bits_y_reinicio(monkeypatch):
+    """Un contador de 32 bits que da la vuelta no produce tasas negativas; un reinicio da 0"""
+    clock = iter([0.0, 1.0, 2.0])
+    monkeypatch.setattr('app.utils.time.monotonic', lambda: next(clock))
+    collector = FakeNetworkCollector([
+        {'eth0': counters(2 ** 32 - 100), 'eth1': counters(2 ** 40)},
+        {'eth0': counters(50), 'eth1': counters(10)},
+        {'eth0': counters(150), 'eth1': counters(110)},
+    ])
+    _, rates = collector.sample()
+    assert rates['eth0']['bytes_sent_per_s'] == 150.0
+    assert rates['eth1']['bytes_sent_per_s'] == 0.0
+    _, rates = collector.sample()
+    assert rates['eth1']['bytes_sent_per_s'] == 100.0
+
+def test_red_reinicio_de_contador_no_es_desborde(monkeypatch):
+    """Un retroceso lejos de 2^32 o demasiado grande para el intervalo es un reinicio, no una vuelta"""
+    clock = iter([0.0, 1.0, 2.0, 3.0])
+    monkeypatch.setattr('app.utils.time.monotonic', lambda: next(clock))
+    collector = FakeNetworkCollector([
+        {'eth0': counters(10 ** 9), 'eth1': counters(2 ** 32 - 1000), 'eth2': counters(2 ** 32 - 100)},
+        # eth0: reinicio a mitad de rango; eth1: recreada (contadores casi a 0 tras estar cerca del tope,
+        # pero la "vuelta" supondría 100 MB en 1 s con un tope de 10 MB/s); eth2: desaparece y vuelve
+        {'eth0': counters(5000), 'eth1': counters(10 ** 8)},
+        {'eth0': counters(6000), 'eth1': counters(10 ** 8 + 500), 'eth2': counters(400)},
+        {'eth0': counters(7000), 'eth1': counters(10 ** 8 + 1000), 'eth2': counters(900)},
+    ], max_bytes_per_s=10 ** 7)
+    _, rates = collector.sample()
+    assert rates['eth0']['bytes_sent_per_s'] == 0.0
+    assert rates['eth1']['bytes_sent_per_s'] == 0.0
+    # La interfaz desaparece durante una muestra: al volver no hay base, tampoco hay pico
+    assert 'eth2' not in rates
+    _, rates = collector.sample()
+    assert rates['eth0']['bytes_sent_per_s'] == 1000.0
+    assert rates['eth1']['bytes_sent_per_s'] == 500.0
+    assert rates['eth2']['bytes_sent_per_s'] == 0.0
+    _, rates = collector.sample()
+    assert rates['eth2']['bytes_sent_per_s'] == 500.0
+
+def test_red_filtros_y_lecturas_seguidas(monkeypatch):
+    """Los filtros son configurables y las lecturas muy seguidas reutilizan las tasas"""
+    clock = iter([0.0, 1.0, 1.01])
+    monkeypatch.setattr('app.utils.time.monotonic', lambda: next(clock))
+    collector = FakeNetworkCollector([
+        {'eth0': counters(0), 'wlan0': counters(0)},
+        {'eth0': counters(100), 'wlan0': counters(100)},
+        {'eth0': counters(5000), 'wlan0': counters(5000)},
+    ], include=r'eth\d+', exclude='')
+    first = collector.sample()[1]
+    assert set(first) == {'eth0'}
+    assert collector.sample()[1] is first
+
+def test_tabla_de_montajes_cacheada(fake_proc):
+    """Solo sistemas de ficheros reales, uno por dispositivo, y sin releer si no hay cambios"""
+    collector = ProcfsCollector(str(fake_proc))
+    table = collector.mount_table
+    mounts = table.mounts()
+    # La raíz siempre se incluye; proc (nodev), el bind mount y squashfs no
+    assert [(m.mountpoint, m.fstype) for m in mounts] == [('/', 'overlay'), ('/mnt/datos externos', 'ext4')]
+    assert mounts[1].major_minor == '8:1'
+
+    table.mounts()
+    assert table.refreshes == 1
+    table.invalidate()
+    table.mounts()
+    assert table.refreshes == 2
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='Workers por fork como Gunicorn')
+def test_tabla_de_montajes_propia_de_cada_proceso(fake_proc):
+    """Tras fork cada proceso abre su propio mountinfo y relee la tabla (no comparte eventos)"""
+    table = ProcfsCollector(str(fake_proc)).mount_table
+    table.mounts()
+    parent_fd = table._file.fileno()
+
+    def child():
+        table.mounts()
+        # Mover la posición del descriptor del hijo: si fuese el del padre, este la vería
+        os.lseek(table._file.fileno(), 100, os.SEEK_SET)
+        os._exit(0 if table.refreshes == 2 else 1)
+
+    process = multiprocessing.get_context('fork').Process(target=child)
+    process.start()
+    process.join(10)
+    assert process.exitcode == 0
+    assert os.lseek(parent_fd, 0, os.SEEK_CUR) == 0
+    assert table.mounts() and table.refreshes == 1
+
+class FakeDiskCollector(DiskCollector):
+    """Colector con contadores de I/O controlados por el test"""
+
+    def __init__(self, readings, **kwargs):
+        self.readings = list(readings)
+        super().__init__(**kwargs)
+
+    def _read_counters(self):
+        return self.readings.pop(0)
+
+def test_disco_iops_await_y_util(monkeypatch):
+    """IOPS, throughput, await y %util por dispositivo a partir de deltas de diskstats"""
+    clock = iter([10.0, 12.0])
+    monkeypatch.setattr('app.utils.time.monotonic', lambda: next(clock))
+    collector = FakeDiskCollector([
+        {'sda': [100, 0, 1000, 50, 200, 0, 4000, 150, 0, 500, 0], 'loop0': [0] * 11},
+        {'sda': [120, 0, 1400, 90, 240, 0, 4800, 230, 1, 1500, 0], 'loop0': [5] * 11},
+    ])
+    rates = collector.io_rates()
+    assert set(rates) == {'sda'}
+    assert rates['sda']['read_iops'] == 10.0
+    assert rates['sda']['write_iops'] == 20.0
+    assert rates['sda']['read_bytes_per_s'] == 400 * 512 / 2
+    assert rates['sda']['await_ms'] == 2.0
+    assert rates['sda']['util_percent'] == 50.0
+
+def test_disco_in_flight_es_un_nivel(monkeypatch):
+    """Que bajen las I/O en curso no anula las tasas; un contador que retrocede sí"""
+    clock = iter([0.0, 1.0, 2.0])
+    monkeypatch.setattr('app.utils.time.monotonic', lambda: next(clock))
+    collector = FakeDiskCollector([
+        {'sda': [100, 0, 1000, 50, 200, 0, 4000, 150, 32, 500, 900]},
+        {'sda': [110, 0, 1100, 60, 210, 0, 4100, 160, 2, 900, 950]},
+        {'sda': [5, 0, 50, 5, 5, 0, 50, 5, 0, 10, 10]},
+    ])
+    rates = collector.io_rates()
+    assert rates['sda']['read_iops'] == 10.0 and rates['sda']['write_iops'] == 10.0
+    assert rates['sda']['util_percent'] == 40.0
+    rates = collector.io_rates()
+    assert rates['sda']['read_iops'] == 0.0 and rates['sda']['util_percent'] == 0.0
+
+def test_disco_todas_las_particiones():
+    """get_disk_usage mantiene la partición principal y añade todas las demás"""
+    from app.utils import get_disk_usage
+    disk = get_disk_usage()
+    assert disk['partitions']
+    assert any(p['mountpoint'] == disk['mountpoint'] for p in disk['partitions'])
+    assert isinstance(disk['devices'], dict)
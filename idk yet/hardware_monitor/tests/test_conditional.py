@@ -0,0 +1,50 @@
+"""
+Tests del GET condicional en endpoints de métricas
+"""
+
+import json
+
+from app import create_app
+from flask import Response
+
+from app.conditional import apply_cache_headers, cache_seconds, snapshot_etag
+from app.sampler import Snapshot, hardware_sampler
+
+def get_auth_headers(client):
+    """Obtener headers con token JWT"""
+    response = client.post('/api/login', json={'username': 'admin', 'password': 'admin'})
+    token = json.loads(response.data)['access_token']
+    return {'Authorization': f'Bearer {token}'}
+
+def test_cache_hasta_la_proxima_muestra():
+    """max-age es el tiempo entero que falta para la próxima muestra"""
+    snapshot = Snapshot(7, 1000.0, {}, {}, {}, {})
+    assert cache_seconds(snapshot, 5.0, now=1001.2) == 3
+    assert cache_seconds(snapshot, 5.0, now=1006.0) == 0
+    # Snapshot local sin publicar (seq 0): nunca se cachea
+    assert cache_seconds(Snapshot(0, 1000.0, {}, {}, {}, {}), 5.0, now=1000.0) == 0
+    assert snapshot_etag(snapshot) != snapshot_etag(Snapshot(7, 2000.0, {}, {}, {}, {}))
+    # El 304 declara el mismo Vary que la respuesta completa (el ETag depende de la codificación)
+    assert 'Accept-Encoding' in apply_cache_headers(Response(status=304), snapshot, 5.0).headers['Vary']
+
+def test_if_none_match_devuelve_304():
+    """Con la misma muestra se responde 304; el sufijo de codificación no impide la coincidencia"""
+    app = create_app()
+    app.config['TESTING'] = True
+    client = app.test_client()
+    headers = dict(get_auth_headers(client), **{'Accept-Encoding': 'gzip'})
+    hardware_sampler.sample_once()
+
+    for path in ('/api/stats', '/api/cpu'):
+        response = client.get(path, headers=headers)
+        etag = response.headers['ETag']
+        assert response.status_code == 200
+        assert 's-maxage=' in response.headers['Cache-Control'] or response.headers['Cache-Control'] == 'no-cache'
+
+        cached = client.get(path, headers=dict(headers, **{'If-None-Match': etag}))
+        assert cached.status_code == 304
+        assert cached.data == b''
+        assert 'Accept-Encoding' in cached.headers['Vary']
+
+    hardware_sampler.sample_once()
+    assert client.get('/api/stats', headers=dict(headers, **{'If-None-Match': etag})).status_code == 200
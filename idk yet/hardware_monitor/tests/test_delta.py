@@ -0,0 +1,81 @@
+"""
+Tests de la codificación delta
+"""
+
+import json
+from app.delta import DeltaEncoder, apply_delta
+from app.streaming import BroadcastHub
+from tests.test_streaming import make_snapshots
+
+def sample(usage, used, error=None):
+    """Payload mínimo con la forma de un snapshot"""
+    cpu = {'usage': usage, 'cores': 8, 'timestamp': 1.0}
+    if error:
+        cpu['error'] = error
+    return {'cpu': cpu, 'ram': {'usage': 40.0, 'total': 16 * 2 ** 30, 'used': used, 'timestamp': 1.0}}
+
+def test_delta_solo_campos_cambiados():
+    """Solo viajan los campos que cambian más que su epsilon"""
+    encoder = DeltaEncoder(keyframe_interval=10, epsilons={'usage': 0.5})
+    keyframe, delta, is_keyframe = encoder.encode(1, 1.0, sample(10.0, 100))
+    assert is_keyframe and delta is None
+
+    _, delta, is_keyframe = encoder.encode(2, 2.0, sample(10.2, 200))
+    assert not is_keyframe
+    assert delta['base'] == 1
+    assert delta['changes'] == {'ram': {'used': 200}}
+
+    _, delta, _ = encoder.encode(3, 3.0, sample(11.0, 200, error='fallo'))
+    assert delta['changes'] == {'cpu': {'usage': 11.0, 'error': 'fallo'}}
+    _, delta, _ = encoder.encode(4, 4.0, sample(11.0, 200))
+    assert delta['changes'] == {'cpu': {'error': None}}
+
+def test_keyframe_periodico_y_reconstruccion():
+    """Aplicar los deltas sobre el keyframe reconstruye el estado"""
+    encoder = DeltaEncoder(keyframe_interval=3, epsilons={})
+    keyframe, _, _ = encoder.encode(1, 1.0, sample(1.0, 1))
+    state = json.loads(json.dumps(keyframe['data']))
+    for seq in (2, 3, 4):
+        _, delta, is_keyframe = encoder.encode(seq, float(seq), sample(float(seq), seq))
+        apply_delta(state, delta['changes'])
+    assert is_keyframe
+    assert state['cpu']['usage'] == 4.0 and state['ram']['used'] == 4
+
+def test_delta_mucho_menor_que_keyframe():
+    """Un delta entre muestras consecutivas pesa mucho menos que el payload completo"""
+    hub = BroadcastHub()
+    for snapshot in make_snapshots(3):
+        hub.publish(snapshot)
+    full = json.dumps(hub.delta_since(None))
+    delta = json.dumps(hub.delta_since(2))
+    assert len(delta) * 3 < len(full)
+    assert hub.delta_since(3) is None
+    assert hub.delta_since(1)['base'] == 1
+
+def test_cursor_de_una_secuencia_anterior_recibe_keyframe():
+    """Tras reiniciarse la secuencia, un `since` mayor que la última muestra resincroniza"""
+    hub = BroadcastHub()
+    for snapshot in make_snapshots(5):
+        hub.publish(snapshot)
+    # Sampler nuevo: la secuencia vuelve a empezar en 1
+    for snapshot in make_snapshots(2):
+        hub.publish(snapshot)
+    message = hub.delta_since(5)
+    assert message['type'] == 'keyframe' and message['seq'] == 2
+    assert hub.delta_since(1)['base'] == 1
+    assert hub.delta_since(2) is None
+
+def test_endpoint_delta_con_epoch_distinto():
+    """Un epoch de otro proceso recibe keyframe aunque `since` coincida con la última muestra"""
+    from app import create_app
+    from app.sampler import hardware_sampler
+    app = create_app()
+    app.config['TESTING'] = True
+    client = app.test_client()
+    token = json.loads(client.post('/api/login', json={'username': 'admin', 'password': 'admin'}).data)['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+
+    first = json.loads(client.get('/api/stats/delta', headers=headers).data)
+    assert first['epoch'] == hardware_sampler.epoch
+    response = client.get(f"/api/stats/delta?since={first['seq']}&epoch=otro", headers=headers)
+    assert response.status_code == 200 and json.loads(response.data)['type'] == 'keyframe'
@@ -0,0 +1,39 @@
+"""
+Tests de la reducción de puntos LTTB
+"""
+
+import time
+import numpy as np
+from app.downsampling import downsample, lttb_indices
+
+def test_lttb_conserva_extremos_y_picos():
+    """LTTB mantiene el primer y último punto y no borra los picos"""
+    x = np.arange(10000, dtype=np.float64)
+    y = np.zeros(10000)
+    y[4321] = 100.0
+
+    indices = lttb_indices(x, y, 50)
+    assert len(indices) == 50
+    assert indices[0] == 0 and indices[-1] == 9999
+    assert 4321 in indices
+
+def test_downsample_ignora_huecos():
+    """Los NaN se descartan y el resultado respeta el número de puntos"""
+    values = np.arange(1000, dtype=np.float32)
+    values[::10] = np.nan
+    result = downsample({'ts': np.arange(1000.0), 'avg': values, 'resolution': 0}, 100)
+
+    assert len(result['ts']) == len(result['avg']) == 100
+    assert not np.isnan(result['avg']).any()
+
+def test_lttb_rendimiento():
+    """1 M de puntos a 1 000 en menos de 50 ms"""
+    x = np.arange(1_000_000, dtype=np.float64)
+    y = np.random.default_rng(0).random(1_000_000)
+
+    best = float('inf')
+    for _ in range(3):
+        start = time.perf_counter()
+        lttb_indices(x, y, 1000)
+        best = min(best, time.perf_counter() - start)
+    assert best < 0.05
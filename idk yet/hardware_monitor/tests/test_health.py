@@ -0,0 +1,38 @@
+"""
+Tests de los health checks por niveles
+"""
+
+import threading
+import time
+
+from app.health import HealthMonitor
+from app.sampler import HardwareSampler
+
+def test_checks_caros_cacheados():
+    """Las sondas leen la caché: los checks caros solo se ejecutan en cada refresco"""
+    calls = []
+    monitor = HealthMonitor(interval=60, checks={'application': lambda: calls.append(1) or {'threads': 1}})
+    snapshot = HardwareSampler(enabled=False).get_snapshot()
+
+    for _ in range(50):
+        report = monitor.report(snapshot)
+    assert len(calls) == 1
+    assert report['application'] == {'threads': 1}
+    assert report['checks']['process_ok']
+    assert report['seq'] == snapshot.seq
+    monitor.stop()
+
+def test_check_colgado_respeta_el_plazo():
+    """Un check caro colgado no bloquea la sonda y marca el proceso como no sano"""
+    release = threading.Event()
+    monitor = HealthMonitor(interval=60, timeout=0.05,
+                            checks={'application': lambda: release.wait(5) or {'threads': 1}})
+    snapshot = HardwareSampler(enabled=False).get_snapshot()
+
+    started = time.monotonic()
+    report = monitor.report(snapshot)
+    assert time.monotonic() - started < 1
+    assert not report['checks']['process_ok']
+    assert report['status'] == 'degraded'
+    release.set()
+    monitor.stop()
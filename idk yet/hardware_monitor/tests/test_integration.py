@@ -76,9 +76,10 @@ def test_api_stats_with_auth(client):
     assert 'ram' in data
     assert 'disk' in data
     assert 'network' in data
-    assert 'request_id' in data
-    assert 'response_time_ms' in data
     assert data['success'] == True
+    # request_id y tiempo de respuesta van en cabeceras (el cuerpo se comparte entre requests)
+    assert 'X-Request-ID' in response.headers
+    assert response.headers['Server-Timing'].startswith('app;dur=')
 
 def test_api_stats_without_auth(client):
     """Test de endpoint /api/stats sin autenticación"""
@@ -234,6 +235,7 @@ def test_request_tracing(client):
     request_id = response.headers['X-Request-ID']
     assert len(request_id) > 0
     
-    # Verificar que el request_id está en la respuesta JSON
-    data = json.loads(response.data)
-    assert data['request_id'] == request_id 
\ No newline at end of file
+    # Cada request tiene su propio request_id aunque el cuerpo sea el mismo
+    second = client.get('/api/stats', headers=headers)
+    assert second.headers['X-Request-ID'] != request_id
+    assert 'request_id' not in json.loads(response.data)
\ No newline at end of file
@@ -0,0 +1,135 @@
+"""
+Tests del logging asíncrono por cola
+"""
+
+import gzip
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+
+import pytest
+
+from app import create_app
+from app.logpipeline import BatchRotatingFileHandler, LogPipeline, PipelineHandler
+
+def make_logger(name, pipeline):
+    """Logger aislado que entrega sus registros a la cola"""
+    logger = logging.getLogger(name)
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    logger.handlers = [PipelineHandler(pipeline)]
+    return logger
+
+def test_rotacion_y_compresion(tmp_path):
+    """Los segmentos rotan por tamaño, se comprimen y solo se conservan backup_count"""
+    path = os.path.join(tmp_path, 'app.log')
+    handler = BatchRotatingFileHandler(path, max_bytes=2000, backup_count=2, compress=True)
+    handler.setFormatter(logging.Formatter('%(levelname)s %(message)s'))
+    pipeline = LogPipeline(batch_max=10)
+    pipeline.handlers = [handler]
+    logger = make_logger('test.rotacion', pipeline)
+    for i in range(500):
+        logger.info(f"línea {i:04d} " + 'x' * 40)
+    pipeline.stop()
+    handler.close()
+
+    # El segmento más reciente se comprime en la rotación siguiente
+    assert sorted(os.listdir(tmp_path)) == ['app.log', 'app.log.1', 'app.log.2.gz', 'app.log.lock']
+    assert os.path.getsize(path) < 2000
+    with gzip.open(path + '.2.gz', 'rt', encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    assert lines and all(line.startswith('INFO línea') for line in lines)
+    with open(path, encoding='utf-8') as f:
+        assert f.read().splitlines()[-1].startswith('INFO línea 0499')
+    assert pipeline.written == 500
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='Workers por fork como Gunicorn')
+def test_varios_procesos_un_solo_dueño_de_la_rotacion(tmp_path, monkeypatch, capfd):
+    """Con --preload los workers heredan el handler: solo el master rota y no se pierde ninguna línea"""
+    monkeypatch.setattr('app.logpipeline.LOG_ROTATE_CHECK', 0.01)
+    path = os.path.join(tmp_path, 'app.log')
+    handler = BatchRotatingFileHandler(path, max_bytes=20000, backup_count=200, compress=True)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    pipeline = LogPipeline(batch_max=50)
+    pipeline.handlers = [handler]
+    pipeline.start()
+    # Otro handler sobre el mismo fichero (un worker sin --preload) no toma el lock
+    assert handler.owns_rotation
+    other = BatchRotatingFileHandler(path, max_bytes=20000)
+    assert not other.owns_rotation
+    other.close()
+
+    def worker(index):
+        assert not handler.owns_rotation
+        logger = make_logger(f'test.worker{index}', pipeline)
+        for i in range(2000):
+            logger.info(f"w{index} línea {i:04d} " + 'x' * 30)
+        pipeline.stop()
+
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=worker, args=(index,)) for index in range(4)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join(30)
+        assert process.exitcode == 0
+    pipeline.stop()
+    handler.close()
+
+    lines = []
+    for name in os.listdir(tmp_path):
+        if name.endswith('.lock'):
+            continue
+        opener = gzip.open if name.endswith('.gz') else open
+        with opener(os.path.join(tmp_path, name), 'rt', encoding='utf-8') as f:
+            lines.extend(f.read().splitlines())
+    expected = {f"w{index} línea {i:04d} " + 'x' * 30 for index in range(4) for i in range(2000)}
+    assert len(lines) == len(expected) and set(lines) == expected
+    assert len([name for name in os.listdir(tmp_path) if name.endswith('.gz')]) >= 2
+    assert 'Traceback' not in capfd.readouterr().err
+
+def test_cola_llena_descarta_severidad_baja():
+    """Con el escritor atascado se descartan y cuentan los INFO; los ERROR usan la reserva"""
+    started, release = threading.Event(), threading.Event()
+
+    class SlowHandler(logging.Handler):
+        def __init__(self):
+            super().__init__()
+            self.messages = []
+
+        def emit(self, record):
+            started.set()
+            release.wait(5)
+            self.messages.append(record.getMessage())
+
+    handler = SlowHandler()
+    pipeline = LogPipeline(capacity=5, drop_level='WARNING')
+    pipeline.handlers = [handler]
+    logger = make_logger('test.descartes', pipeline)
+    logger.info('primero')
+    assert started.wait(5)
+
+    for i in range(20):
+        logger.info(f"info {i}")
+    for i in range(3):
+        logger.error(f"error {i}")
+    assert pipeline.stats()['dropped'] == {'INFO': 15}
+
+    release.set()
+    pipeline.stop()
+    assert handler.messages == ['primero'] + [f"info {i}" for i in range(5)] + [f"error {i}" for i in range(3)]
+
+def test_muestreo_de_accesos(monkeypatch, caplog):
+    """Con muestreo 0 solo se registran los requests con error"""
+    monkeypatch.setattr('app.logpipeline.LOG_ACCESS_SAMPLE', 0.0)
+    app = create_app()
+    app.config['TESTING'] = True
+    client = app.test_client()
+
+    with caplog.at_level(logging.INFO):
+        assert client.post('/api/login', json={'username': 'admin', 'password': 'admin'}).status_code == 200
+        assert client.get('/api/stats').status_code == 401
+    access = [record.getMessage() for record in caplog.records if 'completado' in record.getMessage()]
+    assert len(access) == 1 and 'GET /api/stats 401' in access[0]
@@ -0,0 +1,149 @@
+"""
+Tests del almacén de logs de misión
+"""
+
+import gzip
+import io
+import json
+import os
+
+from app import create_app
+from app.missionlog import MissionLogStore, SQLiteMissionLog, ingest_ndjson
+
+def get_auth_headers(client):
+    """Obtener headers con token JWT"""
+    response = client.post('/api/login', json={'username': 'admin', 'password': 'admin'})
+    token = json.loads(response.data)['access_token']
+    return {'Authorization': f'Bearer {token}'}
+
+def test_buffer_acotado_y_cursor_monotonico():
+    """Al llenarse se descartan las más antiguas; los cursores no se reutilizan"""
+    store = MissionLogStore(capacity=5)
+    for i in range(12):
+        store.append('info', f"log {i}", timestamp=1000 + i)
+    assert len(store) == 5
+
+    logs, next_cursor, has_more = store.page(limit=3)
+    assert [entry['cursor'] for entry in logs] == [8, 9, 10]
+    assert logs[0]['level'] == 'INFO' and next_cursor == 10 and has_more
+
+    logs, next_cursor, has_more = store.page(after=next_cursor, limit=3)
+    assert [entry['cursor'] for entry in logs] == [11, 12]
+    assert not has_more
+    assert store.page(after=12) == ([], 12, False)
+
+def test_filtro_por_nivel_y_tiempo():
+    """Los índices por nivel y tiempo coinciden con filtrar todas las entradas"""
+    store = MissionLogStore(capacity=200)
+    levels = ('INFO', 'WARNING', 'ERROR')
+    for i in range(500):
+        store.append(levels[i % 3] if i % 7 else 'ERROR', f"log {i}", timestamp=1000 + i)
+    retained = store.page(limit=1000)[0]
+
+    expected = [entry['cursor'] for entry in retained if entry['level'] == 'ERROR']
+    cursors, after = [], 0
+    while True:
+        logs, after, has_more = store.page(after=after, level='error', limit=17)
+        cursors.extend(entry['cursor'] for entry in logs)
+        if not has_more:
+            break
+    assert cursors == expected
+
+    logs = store.page(level='WARNING', since=1450, limit=1000)[0]
+    assert [entry['cursor'] for entry in logs] == [entry['cursor'] for entry in retained
+                                                   if entry['level'] == 'WARNING' and entry['cursor'] > 450]
+    assert store.page(level='DEBUG') == ([], 0, False)
+
+    # Sin nivel el filtro por tiempo recorre los dos tramos del buffer circular
+    for after in (0, 350, 399, 450):
+        for since in (0, 1310, 1399, 1400, 1401, 1480, 1499, 1500, 2000):
+            logs = store.page(after=after, since=since, limit=1000)[0]
+            assert [entry['cursor'] for entry in logs] == [
+                entry['cursor'] for entry in retained if entry['cursor'] > after and entry['cursor'] > since - 1000]
+
+def test_sqlite_group_commit_entre_workers(tmp_path):
+    """Un escritor agrupa los inserts; otra instancia (otro worker) lee lo confirmado"""
+    path = os.path.join(tmp_path, 'mission_logs.db')
+    writer = SQLiteMissionLog(path, flush_ms=50)
+    reader = SQLiteMissionLog(path)
+    for i in range(300):
+        entry = writer.append('error' if i % 3 == 0 else 'info', f"log {i}", timestamp=1000 + i)
+    assert entry['cursor'] is None and entry['level'] == 'INFO'
+    writer.flush()
+    assert writer.written == 300 and writer.commits < 300
+    assert len(reader) == 300
+
+    logs, next_cursor, has_more = reader.page(after=10, level='ERROR', limit=5)
+    assert [entry['cursor'] for entry in logs] == [13, 16, 19, 22, 25]
+    assert next_cursor == 25 and has_more
+    logs = reader.page(since=1290, limit=50)[0]
+    assert [entry['message'] for entry in logs] == [f"log {i}" for i in range(290, 300)]
+    writer.close()
+
+def test_sqlite_retencion(tmp_path):
+    """La retención conserva las últimas filas y los cursores siguen creciendo"""
+    store = SQLiteMissionLog(os.path.join(tmp_path, 'mission_logs.db'), flush_ms=0, retention_rows=10)
+    for i in range(25):
+        store.append('INFO', f"log {i}")
+    store.close()
+    logs, _, has_more = store.page(limit=50)
+    assert len(store) == 10 and not has_more
+    assert [entry['cursor'] for entry in logs] == list(range(16, 26))
+
+def test_ingesta_ndjson_por_lotes():
+    """Las líneas inválidas se reportan sin rechazar el resto; los válidos entran por lotes"""
+    lines = [json.dumps({'level': 'warning', 'message': f"evento {i}"}) for i in range(7)]
+    lines[2] = '{"message": '
+    lines[4] = json.dumps({'level': 'INFO'})
+    lines.insert(5, '')
+    lines.append(json.dumps({'message': 'x' * 200}))
+    store = MissionLogStore(capacity=50)
+    batches = []
+    extend = store.extend
+    store.extend = lambda records: (batches.append(len(records)), extend(records))
+
+    result = ingest_ndjson(store, io.BytesIO('\n'.join(lines).encode()), 'req-1', batch_size=2, max_line=100)
+    assert result['accepted'] == 5 and result['rejected'] == 3
+    assert [error['line'] for error in result['errors']] == [3, 5, 9]
+    assert 'JSON inválido' in result['errors'][0]['error'] and '100 bytes' in result['errors'][2]['error']
+    assert batches == [2, 2, 1]
+    logs = store.page(limit=50)[0]
+    assert [entry['message'] for entry in logs] == ['evento 0', 'evento 1', 'evento 3', 'evento 5', 'evento 6']
+    assert {entry['level'] for entry in logs} == {'WARNING'} and logs[0]['request_id'] == 'req-1'
+
+def test_endpoint_bulk_gzip():
+    """/api/mission-logs/bulk acepta NDJSON comprimido y rechaza cuerpos sin registros"""
+    app = create_app()
+    app.config['TESTING'] = True
+    client = app.test_client()
+    headers = get_auth_headers(client)
+
+    body = '\n'.join(json.dumps({'level': 'ERROR', 'message': f"despliegue {i}"}) for i in range(1000)) + '\nnope\n'
+    response = client.post('/api/mission-logs/bulk', data=gzip.compress(body.encode()),
+                           headers=dict(headers, **{'Content-Encoding': 'gzip',
+                                                    'Content-Type': 'application/x-ndjson'}))
+    data = json.loads(response.data)
+    assert response.status_code == 200 and data['success']
+    assert data['accepted'] == 1000 and data['errors'] == [{'line': 1001, 'error': data['errors'][0]['error']}]
+
+    assert client.post('/api/mission-logs/bulk', data=b'', headers=headers).status_code == 400
+    assert client.post('/api/mission-logs/bulk', data=b'{}', headers=dict(headers, **{'Content-Encoding': 'br'})
+                       ).status_code == 415
+
+def test_endpoint_mission_logs():
+    """GET pagina sin añadir entradas; POST añade una"""
+    app = create_app()
+    app.config['TESTING'] = True
+    client = app.test_client()
+    headers = get_auth_headers(client)
+
+    added = json.loads(client.post('/api/mission-logs/add', json={'level': 'error', 'message': 'FALLO'},
+                                   headers=headers).data)['log_added']
+    first = json.loads(client.get(f"/api/mission-logs?after={added['cursor'] - 1}&level=ERROR",
+                                  headers=headers).data)
+    second = json.loads(client.get(f"/api/mission-logs?after={added['cursor'] - 1}&level=ERROR",
+                                   headers=headers).data)
+    assert first['logs'] == second['logs'] == [added]
+    assert first['next_cursor'] == added['cursor'] and not first['has_more']
+    assert first['total_logs'] == second['total_logs']
+    assert client.get('/api/mission-logs?since=ayer', headers=headers).status_code == 400
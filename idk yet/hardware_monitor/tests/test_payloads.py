@@ -0,0 +1,70 @@
+"""
+Tests de los cuerpos serializados una vez por muestra
+"""
+
+import gzip
+import json
+
+from werkzeug.datastructures import Accept
+
+from app import create_app
+from app.payloads import PayloadCache, brotli
+from app.sampler import HardwareSampler
+
+def get_auth_headers(client):
+    """Obtener headers con token JWT"""
+    response = client.post('/api/login', json={'username': 'admin', 'password': 'admin'})
+    token = json.loads(response.data)['access_token']
+    return {'Authorization': f'Bearer {token}'}
+
+def test_una_serializacion_por_snapshot():
+    """Varias lecturas del mismo snapshot reutilizan las variantes ya codificadas"""
+    renders = []
+    cache = PayloadCache(render=lambda snapshot: renders.append(snapshot.seq) or b'{"seq":1}')
+    sampler = HardwareSampler(enabled=False)
+    snapshot = sampler.sample_once()
+
+    for _ in range(10):
+        payload = cache.for_snapshot(snapshot)
+    assert renders == [snapshot.seq]
+    assert gzip.decompress(payload.encode('gzip')) == b'{"seq":1}'
+
+    cache.for_snapshot(sampler.sample_once())
+    assert len(renders) == 2
+
+def test_negociacion_de_codificacion():
+    """Se elige br, luego gzip y por último identity según Accept-Encoding"""
+    cache = PayloadCache(render=lambda snapshot: b'{}' * 100)
+    payload = cache.for_snapshot(HardwareSampler(enabled=False).sample_once())
+
+    assert payload.negotiate(Accept([('gzip', 1), ('br', 1)]))[0] == ('br' if brotli else 'gzip')
+    assert payload.negotiate(Accept([('gzip', 1), ('br', 0)]))[0] == 'gzip'
+    assert payload.negotiate(Accept([]))[0] == 'identity'
+
+def test_compresion_perezosa():
+    """Solo se comprime la variante negociada; el sampler precomprime todas al publicar"""
+    sampler = HardwareSampler(enabled=False)
+    cache = PayloadCache(render=lambda snapshot: b'{}' * 100)
+    payload = cache.for_snapshot(sampler.sample_once())
+    assert set(payload.variants) == {'identity'}
+    assert payload.negotiate(Accept([('gzip', 1)]))[0] == 'gzip'
+    assert set(payload.variants) == {'identity', 'gzip'}
+    assert payload.negotiate(Accept([('gzip', 1)]))[1] is payload.variants['gzip']
+
+    snapshot = sampler.sample_once()
+    cache.publish(snapshot)
+    assert set(cache.for_snapshot(snapshot).variants) == {'identity', 'gzip'} | ({'br'} if brotli else set())
+
+def test_endpoint_stats_precomprimido():
+    """/api/stats sirve la variante gzip sin recomprimir y el request_id en cabecera"""
+    app = create_app()
+    app.config['TESTING'] = True
+    client = app.test_client()
+    headers = get_auth_headers(client)
+
+    response = client.get('/api/stats', headers=dict(headers, **{'Accept-Encoding': 'gzip'}))
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    data = json.loads(gzip.decompress(response.data))
+    assert data['success'] and 'cpu' in data
+    assert response.headers['X-Request-ID']
@@ -0,0 +1,107 @@
+"""
+Tests del historial persistente en segmentos mapeados
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+from app.persistence import SegmentStore
+from app.rollups import RollupStore
+from app.timeseries import RingBufferStore
+
+def make_store(directory, **kwargs):
+    """Store pequeño para tests"""
+    options = {'max_series': 4, 'segment_seconds': 100, 'segment_records': 200}
+    options.update(kwargs)
+    return SegmentStore(str(directory), **options)
+
+def segment_files(directory):
+    return sorted(name for name in os.listdir(directory) if name.startswith('segment-'))
+
+def test_rotacion_por_tiempo_y_lectura_por_rango(tmp_path):
+    """Los segmentos rotan por ventana y la lectura abarca varios"""
+    store = make_store(tmp_path)
+    for second in range(250):
+        store.append(1000.0 + second, {'cpu.usage': float(second)})
+    assert len(segment_files(tmp_path)) == 3
+
+    timestamps, columns = store.read(1090.0, 1110.0)
+    assert timestamps.tolist() == [1000.0 + second for second in range(90, 111)]
+    assert columns['cpu.usage'].tolist() == [float(second) for second in range(90, 111)]
+    store.close()
+
+def test_rotacion_por_capacidad(tmp_path):
+    """Un segmento lleno antes de acabar su ventana abre otro"""
+    store = make_store(tmp_path, segment_records=10)
+    for index in range(25):
+        store.append(1000.0 + index * 0.5, {'ram.usage': 1.0})
+    assert len(segment_files(tmp_path)) == 3
+    assert len(store.read()[0]) == 25
+    store.close()
+
+def test_retencion_por_edad_y_tamano(tmp_path):
+    """Se borran los segmentos más antiguos al superar la retención"""
+    store = make_store(tmp_path, retention_seconds=300)
+    for second in range(0, 1000, 10):
+        store.append(1000.0 + second, {'cpu.usage': 1.0})
+    timestamps, _ = store.read()
+    # Solo queda lo que cabe en la retención más, como mucho, un segmento parcial
+    assert timestamps[0] >= 1990.0 - 300 - 100
+    store.close()
+
+    sized = make_store(tmp_path / 'sized', retention_seconds=0, retention_bytes=1)
+    for second in range(0, 500, 10):
+        sized.append(1000.0 + second, {'cpu.usage': 1.0})
+    assert len(segment_files(tmp_path / 'sized')) == 1
+    sized.close()
+
+def test_reinicio_recupera_historial(tmp_path):
+    """Tras reiniciar, el historial reciente vuelve al buffer en memoria y a los rollups"""
+    store = make_store(tmp_path)
+    for second in range(120):
+        store.append(1000.0 + second, {'cpu.usage': float(second), 'ram.usage': 50.0})
+    store.close()
+
+    reopened = make_store(tmp_path)
+    memory = RingBufferStore(capacity=100, max_series=4, rollups=RollupStore([(10, 100)]))
+    assert memory.restore(reopened, since=1010.0) == 100
+
+    timestamps, values = memory.range('cpu.usage')
+    assert timestamps[0] == 1020.0 and timestamps[-1] == 1119.0
+    assert values[-1] == 119.0
+    assert memory.rollups.tiers[0].oldest() == 1020.0
+
+    # Se sigue escribiendo en el último segmento de la misma ventana
+    reopened.append(1120.0, {'cpu.usage': 120.0})
+    assert len(segment_files(tmp_path)) == 2
+    assert np.isnan(reopened.read(1120.0)[1]['ram.usage'][0])
+    reopened.close()
+
+def test_worker_recarga_historial_tras_fork(tmp_path):
+    """Un worker descarta lo heredado y recarga lo que el master escribió después, sin duplicar"""
+    master = make_store(tmp_path)
+    for second in range(50):
+        master.append(1000.0 + second, {'cpu.usage': float(second)})
+
+    # Estado heredado del preload: índice y buffer con las primeras 50 muestras
+    worker = make_store(tmp_path)
+    memory = RingBufferStore(capacity=1000, max_series=4, rollups=RollupStore([(10, 1000)]))
+    assert memory.restore(worker, since=0) == 50
+
+    for second in range(50, 250):
+        master.append(1000.0 + second, {'cpu.usage': float(second)})
+
+    # Fork con el lock tomado por el hilo escritor: el hijo no debe quedarse esperándolo
+    worker._lock.acquire()
+    worker.reload()
+    memory.clear()
+    assert memory.restore(worker, since=0) == 250
+    timestamps, values = memory.range('cpu.usage', 0, 2000)
+    assert timestamps.tolist() == [1000.0 + second for second in range(250)]
+    assert values[-1] == 249.0
+    assert memory.rollups.tiers[0].oldest() == 1000.0
+    with pytest.raises(RuntimeError):
+        worker.append(1300.0, {'cpu.usage': 1.0})
+    master.close()
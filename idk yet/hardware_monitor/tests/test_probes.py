@@ -0,0 +1,53 @@
+"""
+Tests de las sondas /livez y /readyz
+"""
+
+import threading
+import time
+
+from app import create_app
+from app.probes import Readiness, drain_handler, readiness
+
+def test_livez_y_readyz_sin_middleware():
+    """Las sondas responden sin pasar por Flask: sin X-Request-ID ni rate limiting"""
+    app = create_app()
+    client = app.test_client()
+
+    for _ in range(30):
+        response = client.get('/livez')
+        assert response.status_code == 200
+    assert response.data == b'ok\n'
+    assert 'X-Request-ID' not in response.headers
+
+    response = client.get('/readyz')
+    assert response.status_code == 200 and response.data == b'ready\n'
+    assert client.head('/readyz').data == b''
+
+def test_readyz_no_disponible():
+    """Con la bandera bajada /readyz devuelve 503 y /livez sigue vivo"""
+    app = create_app()
+    client = app.test_client()
+    readiness.mark_not_ready('apagando')
+    try:
+        response = client.get('/readyz')
+        assert response.status_code == 503
+        assert b'apagando' in response.data
+        assert client.get('/livez').status_code == 200
+    finally:
+        readiness.mark_ready()
+
+def test_sigterm_baja_readyz_antes_de_parar():
+    """El manejador de SIGTERM baja la bandera al instante y para el worker solo tras el drenaje"""
+    flag = Readiness()
+    flag.mark_ready()
+    stopped = threading.Event()
+    calls = []
+    handler = drain_handler(lambda signum, frame: calls.append(signum) or stopped.set(), flag, delay=0.1)
+
+    handler(15, None)
+    assert not flag.ready and flag.reason == 'apagando'
+    assert not stopped.is_set()
+    handler(15, None)
+    assert stopped.wait(2)
+    time.sleep(0.15)
+    assert calls == [15]
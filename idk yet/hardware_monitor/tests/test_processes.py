@@ -0,0 +1,59 @@
+"""
+Tests de la tabla de procesos top-N
+"""
+
+import json
+import os
+
+from app import create_app
+from app.processes import ProcessCollector
+
+def get_auth_headers(client):
+    """Obtener headers con token JWT"""
+    response = client.post('/api/login', json={'username': 'admin', 'password': 'admin'})
+    token = json.loads(response.data)['access_token']
+    return {'Authorization': f'Bearer {token}'}
+
+def test_top_n_ordenado():
+    """El heap devuelve lo mismo que ordenar todas las filas"""
+    collector = ProcessCollector(budget_ms=5000, min_interval=0)
+    collector.sample()
+    collector.sample()
+    rows = list(collector._rows.values())
+    top, complete = collector.top('memory', 5)
+    assert complete
+    assert [row['pid'] for row in top] == [row['pid'] for row in
+                                           sorted(rows, key=lambda row: row['memory_rss'], reverse=True)[:5]]
+    assert os.getpid() in collector._rows
+
+def test_presupuesto_y_pasada_incremental():
+    """Sin presupuesto la pasada queda pendiente y continúa en la siguiente muestra"""
+    collector = ProcessCollector(budget_ms=0, min_interval=0)
+    collector.sample()
+    _, complete = collector.top()
+    assert not complete and collector.total > 0
+
+    collector.budget = 5.0
+    collector.sample()
+    assert collector.top()[1]
+
+def test_limite_de_cardinalidad():
+    """No se guarda estado de más procesos que max_tracked"""
+    collector = ProcessCollector(budget_ms=5000, min_interval=0, max_tracked=3)
+    collector.sample()
+    assert collector.tracked() <= 3
+    assert len(collector.top('cpu', 50)[0]) <= 3
+
+def test_endpoint_processes():
+    """/api/processes valida el criterio y acota el límite"""
+    app = create_app()
+    app.config['TESTING'] = True
+    client = app.test_client()
+    headers = get_auth_headers(client)
+
+    data = json.loads(client.get('/api/processes?sort=memory&limit=3', headers=headers).data)
+    assert data['success'] and data['sort'] == 'memory'
+    assert 1 <= len(data['processes']) <= 3
+    assert {'pid', 'name', 'cpu_percent', 'memory_rss'} <= set(data['processes'][0])
+
+    assert client.get('/api/processes?sort=nope', headers=headers).status_code == 400
@@ -0,0 +1,67 @@
+"""
+Tests de los niveles de agregación (rollups)
+"""
+
+import numpy as np
+from app.rollups import RollupStore, RollupTier
+from app.timeseries import RingBufferStore
+
+def test_agregacion_incremental():
+    """Cada bucket mantiene min/max/avg/count/last sin reescanear"""
+    tier = RollupTier(resolution=10, capacity=4, max_series=1)
+    for ts, value in ((100, 1.0), (105, 5.0), (109, 3.0), (110, 7.0)):
+        tier.add(float(ts), np.array([value], dtype=np.float32))
+
+    buckets = tier.range(0)
+    assert buckets['ts'].tolist() == [100.0, 110.0]
+    assert buckets['min'].tolist() == [1.0, 7.0]
+    assert buckets['max'].tolist() == [5.0, 7.0]
+    assert buckets['avg'].tolist() == [3.0, 7.0]
+    assert buckets['count'].tolist() == [3, 1]
+    assert buckets['last'].tolist() == [3.0, 7.0]
+
+def test_valores_ausentes_no_cuentan():
+    """Los NaN no afectan a los agregados"""
+    tier = RollupTier(resolution=60, capacity=2, max_series=2)
+    tier.add(0.0, np.array([2.0, np.nan], dtype=np.float32))
+    tier.add(1.0, np.array([4.0, 8.0], dtype=np.float32))
+
+    assert tier.range(0)['avg'].tolist() == [3.0]
+    assert tier.range(1)['count'].tolist() == [1]
+
+def test_seleccion_del_nivel_mas_grueso():
+    """La consulta elige el nivel más grueso que cumple el número de puntos"""
+    store = RingBufferStore(capacity=100, max_series=1,
+                            rollups=RollupStore([(10, 1000), (60, 1000), (3600, 10)]))
+    for second in range(0, 7200, 5):
+        store.append(float(second), {'cpu.usage': float(second % 100)})
+
+    result = store.query('cpu.usage', 0, 7200, points=100)
+    assert result['resolution'] == 60
+    assert len(result['ts']) == 120
+
+    result = store.query('cpu.usage', 0, 7200, points=2)
+    assert result['resolution'] == 3600
+
+    # El buffer crudo solo conserva las últimas 100 muestras: un rango antiguo usa rollups
+    result = store.query('cpu.usage', 0, 7200)
+    assert result['resolution'] == 10
+
+def test_carga_en_bloque_equivale_a_incremental():
+    """extend() produce los mismos buckets que añadir muestra a muestra"""
+    rng = np.random.default_rng(7)
+    timestamps = 1000.0 + np.cumsum(rng.random(300) * 3)
+    matrix = rng.random((2, 300)).astype(np.float32)
+    matrix[1, ::4] = np.nan
+
+    incremental = RollupTier(10, 1000, 2)
+    for index in range(300):
+        incremental.add(timestamps[index], matrix[:, index])
+    bulk = RollupTier(10, 1000, 2)
+    bulk.add(timestamps[0], matrix[:, 0])
+    bulk.extend(timestamps[1:], matrix[:, 1:])
+
+    for column in range(2):
+        expected, result = incremental.range(column), bulk.range(column)
+        for key in expected:
+            assert np.allclose(expected[key], result[key], equal_nan=True)
@@ -0,0 +1,113 @@
+"""
+Tests del sampler de hardware en segundo plano
+"""
+
+import json
+import time
+from app import create_app
+from app.sampler import HardwareSampler, hardware_sampler, ON_DEMAND_BUDGET_MS
+from app.supervisor import CollectorSupervisor
+
+def get_auth_headers(client):
+    """Obtener headers con token JWT"""
+    response = client.post('/api/login', json={'username': 'admin', 'password': 'admin'})
+    token = json.loads(response.data)['access_token']
+    return {'Authorization': f'Bearer {token}'}
+
+def test_snapshot_consistente():
+    """Cada snapshot tiene secuencia creciente y un único timestamp"""
+    sampler = HardwareSampler(enabled=False)
+    first = sampler.sample_once()
+    second = sampler.sample_once()
+
+    assert second.seq == first.seq + 1
+    for group in (second.cpu, second.ram, second.disk, second.network):
+        assert group['timestamp'] == second.timestamp
+
+def test_sampler_deshabilitado_recolecta_bajo_demanda():
+    """Sin hilo de fondo, cada lectura produce una muestra nueva"""
+    sampler = HardwareSampler(enabled=False)
+    assert sampler.get_snapshot().seq == 1
+    assert sampler.get_snapshot().seq == 2
+    assert not sampler.is_running()
+
+def test_endpoints_leen_el_mismo_snapshot():
+    """Los endpoints devuelven el snapshot publicado por el sampler"""
+    app = create_app()
+    app.config['TESTING'] = True
+    client = app.test_client()
+    headers = get_auth_headers(client)
+
+    assert hardware_sampler.is_running()
+    snapshot = hardware_sampler.get_snapshot()
+
+    data = json.loads(client.get('/api/stats', headers=headers).data)
+    assert data['seq'] >= snapshot.seq
+    assert data['cpu']['timestamp'] == data['sampled_at']
+
+    data = json.loads(client.get('/api/cpu', headers=headers).data)
+    assert data['seq'] >= snapshot.seq
+
+def test_recoleccion_paralela_con_presupuesto():
+    """Bajo demanda los grupos se recolectan en paralelo y lo que no llega a tiempo se marca"""
+    def slow(seconds):
+        def collector():
+            time.sleep(seconds)
+            return {'usage': 1.0}
+        return collector
+
+    collectors = (('cpu', slow(0.1)), ('ram', slow(0.1)), ('disk', slow(0.1)), ('network', slow(1.0)))
+    sampler = HardwareSampler(enabled=False, collectors=collectors,
+                              supervisor=CollectorSupervisor(deadline_ms=2000))
+
+    started = time.monotonic()
+    snapshot = sampler.get_snapshot(budget_ms=300)
+    elapsed = time.monotonic() - started
+
+    # La latencia es la del más lento dentro del presupuesto, no la suma (0.4 s)
+    assert elapsed < 0.35
+    assert snapshot.cpu['usage'] == snapshot.ram['usage'] == snapshot.disk['usage'] == 1.0
+    assert snapshot.network['missing'] and snapshot.network['usage'] == -1
+
+def test_presupuesto_acotado_y_finito(monkeypatch):
+    """budget_ms no finito es 400; uno mayor que ON_DEMAND_BUDGET_MS se recorta"""
+    app = create_app()
+    app.config['TESTING'] = True
+    client = app.test_client()
+    headers = get_auth_headers(client)
+
+    budgets = []
+    get_snapshot = hardware_sampler.get_snapshot
+    monkeypatch.setattr(hardware_sampler, 'get_snapshot',
+                        lambda budget_ms: budgets.append(budget_ms) or get_snapshot(budget_ms=budget_ms))
+    for value in ('inf', '-inf', 'nan', '1e400'):
+        assert client.get(f'/api/stats?budget_ms={value}', headers=headers).status_code == 400
+    assert client.get('/api/stats?budget_ms=1e300', headers=headers).status_code == 200
+    assert client.get('/api/stats?budget_ms=-5', headers=headers).status_code == 200
+    assert budgets == [ON_DEMAND_BUDGET_MS, 0.0]
+
+def test_bajo_demanda_consumidores_a_la_cadencia_del_intervalo():
+    """Sin sampler los requests no alimentan el historial más de una vez por intervalo ni con muestras parciales"""
+    def slow():
+        time.sleep(0.5)
+        return {'usage': 1.0}
+
+    fast = lambda: {'usage': 1.0}
+    groups = {'network': fast}
+    collectors = (('cpu', fast), ('ram', fast), ('disk', fast), ('network', lambda: groups['network']()))
+    sampler = HardwareSampler(interval_ms=200, enabled=False, collectors=collectors,
+                              supervisor=CollectorSupervisor(deadline_ms=2000))
+    received = []
+    sampler.add_listener(received.append)
+
+    snapshots = [sampler.get_snapshot() for _ in range(5)]
+    assert [snapshot.seq for snapshot in snapshots] == [1, 2, 3, 4, 5]
+    assert received == [snapshots[0]]
+
+    time.sleep(0.25)
+    groups['network'] = slow
+    partial = sampler.get_snapshot(budget_ms=50)
+    assert partial.network['missing'] and received == [snapshots[0]]
+    groups['network'] = fast
+    time.sleep(0.5)
+    assert sampler.get_snapshot().seq == received[-1].seq == 7
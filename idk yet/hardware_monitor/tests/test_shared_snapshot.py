@@ -0,0 +1,102 @@
+"""
+Tests del snapshot compartido entre workers
+"""
+
+import itertools
+import os
+
+import pytest
+
+from app.sampler import HardwareSampler
+from app.shared_snapshot import GENERATION, SharedSnapshotReader, SharedSnapshotWriter
+
+_names = itertools.count()
+
+@pytest.fixture
+def writer():
+    """Segmento compartido exclusivo para cada test"""
+    shared = SharedSnapshotWriter(f"hm_test_{os.getpid()}_{next(_names)}", size=64 * 1024)
+    yield shared
+    shared.close()
+
+def test_lector_sin_segmento():
+    """Si el master aún no creó el segmento no hay snapshot"""
+    reader = SharedSnapshotReader(f"hm_test_inexistente_{os.getpid()}")
+    assert reader.read() is None
+    assert reader.current_seq() == 0
+
+def test_escritura_y_lectura(writer):
+    """El lector recibe la última publicación y reutiliza el payload si no cambia"""
+    reader = SharedSnapshotReader(writer.name)
+    assert reader.read() is None
+
+    writer.write(1, 100.0, {'cpu': {'usage': 12.5}})
+    seq, timestamp, payload = reader.read()
+    assert (seq, timestamp, payload) == (1, 100.0, {'cpu': {'usage': 12.5}})
+    assert reader.read()[2] is payload
+
+    writer.write(2, 101.0, {'cpu': {'usage': 50.0}})
+    assert reader.current_seq() == 2
+    assert reader.read()[2] == {'cpu': {'usage': 50.0}}
+    reader.close()
+
+def test_escritura_en_curso_no_se_lee(writer):
+    """Con la generación impar el lector no devuelve datos a medio escribir"""
+    reader = SharedSnapshotReader(writer.name)
+    writer.write(1, 100.0, {'ram': {'usage': 40.0}})
+    assert reader.read()[0] == 1
+
+    generation = GENERATION.unpack_from(writer._shm.buf, 0)[0]
+    GENERATION.pack_into(writer._shm.buf, 0, generation + 1)
+    # Agotados los reintentos se conserva la última lectura consistente
+    assert reader.read()[0] == 1
+    GENERATION.pack_into(writer._shm.buf, 0, generation)
+    reader.close()
+
+def test_payload_demasiado_grande(writer):
+    """Un snapshot que no cabe no corrompe el segmento"""
+    writer.write(1, 100.0, {'disk': {'usage': 1.0}})
+    assert not writer.write(2, 101.0, {'blob': 'x' * (writer.capacity + 1)})
+    reader = SharedSnapshotReader(writer.name)
+    assert reader.read()[0] == 1
+    reader.close()
+
+def test_sampler_sigue_al_master(writer):
+    """Un worker adopta la secuencia del master y notifica a sus consumidores"""
+    master = HardwareSampler(enabled=False, shared_name='')
+    master.add_listener(writer.publish)
+    published = master.sample_once()
+
+    follower = HardwareSampler(shared_name=writer.name)
+    received = []
+    follower.add_listener(received.append)
+    snapshot = follower.follow_shared()
+
+    assert snapshot.seq == published.seq
+    assert snapshot.cpu['usage'] == published.cpu['usage']
+    assert received == [snapshot]
+    # Sin publicaciones nuevas no se vuelve a notificar
+    assert follower.follow_shared() is None
+    follower._reader.close()
+
+def test_proceso_de_muestreo_publica_y_limpia():
+    """El cuerpo del proceso de muestreo publica en el segmento y lo elimina al parar"""
+    import threading
+    import time
+    from app.sampler import run_shared_sampler
+
+    name = f"hm_test_{os.getpid()}_{next(_names)}"
+    stop_event = threading.Event()
+    runner = threading.Thread(target=run_shared_sampler, args=(name, stop_event))
+    runner.start()
+    reader = SharedSnapshotReader(name)
+    deadline = time.monotonic() + 10
+    while reader.current_seq() == 0 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert reader.read()[0] >= 1
+    reader.close()
+
+    stop_event.set()
+    runner.join(10)
+    assert not runner.is_alive()
+    assert SharedSnapshotReader(name).read() is None
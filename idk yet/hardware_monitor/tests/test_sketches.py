@@ -0,0 +1,112 @@
+"""
+Tests de los percentiles en streaming (DDSketch)
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+
+from app import create_app
+from app.sketches import DDSketch, PercentileRegistry, SharedPercentiles, merge_exports, summarize
+
+def get_auth_headers(client):
+    """Obtener headers con token JWT"""
+    response = client.post('/api/login', json={'username': 'admin', 'password': 'admin'})
+    token = json.loads(response.data)['access_token']
+    return {'Authorization': f'Bearer {token}'}
+
+def test_error_relativo_acotado():
+    """Los cuantiles respetan la precisión relativa configurada"""
+    values = np.random.default_rng(3).lognormal(3, 1, 50_000)
+    sketch = DDSketch(relative_accuracy=0.01)
+    for value in values.tolist():
+        sketch.add(value)
+
+    for quantile in (0.5, 0.95, 0.99):
+        expected = np.quantile(values, quantile, method='lower')
+        assert abs(sketch.quantile(quantile) - expected) <= 0.0101 * expected
+    assert len(sketch.bins) < 1024
+
+def test_memoria_acotada_y_ceros():
+    """Con pocos buckets se fusionan los más bajos y los ceros van aparte"""
+    values = [0.0] * 10 + np.geomspace(0.001, 1000, 1000).tolist()
+    sketch = DDSketch(relative_accuracy=0.01, max_bins=32)
+    for value in values:
+        sketch.add(value)
+    assert len(sketch.bins) <= 32
+    assert sketch.quantile(0.0) == 0.0
+    # Los cuantiles altos no se ven afectados por el colapso de los buckets bajos
+    expected = np.quantile(values, 0.99, method='lower')
+    assert abs(sketch.quantile(0.99) - expected) <= 0.0101 * expected
+
+def test_fusion_entre_workers():
+    """Fusionar exportaciones equivale a observar todo en un único sketch"""
+    first, second, combined = PercentileRegistry(), PercentileRegistry(), PercentileRegistry()
+    rng = np.random.default_rng(5)
+    for index, value in enumerate(rng.random(2000).tolist()):
+        (first if index % 2 else second).observe('latency.api', value * 100, 1000.0)
+        combined.observe('latency.api', value * 100, 1000.0)
+
+    exports = [first.export(now=1000.0), json.loads(json.dumps(second.export(now=1000.0)))]
+    merged = summarize(merge_exports(exports))
+    assert merged == combined.summary(now=1000.0)
+
+def test_ventanas_deslizantes():
+    """Las observaciones salen de las ventanas cortas pero no de las largas"""
+    registry = PercentileRegistry(windows=[(300, 10), (3600, 12)])
+    registry.observe('cpu.usage', 90.0, 1000.0)
+    registry.observe('cpu.usage', 10.0, 1700.0)
+
+    summary = registry.summary('cpu.usage', now=1700.0)['cpu.usage']
+    assert summary['5m']['count'] == 1
+    assert summary['5m']['p99'] == 10.0
+    assert summary['1h']['count'] == 2
+
+def test_endpoint_percentiles():
+    """/api/percentiles resume métricas del host y latencias por endpoint"""
+    app = create_app()
+    app.config['TESTING'] = True
+    client = app.test_client()
+    headers = get_auth_headers(client)
+    client.get('/api/cpu', headers=headers)
+
+    response = client.get('/api/percentiles', headers=headers)
+    assert response.status_code == 200
+    assert json.loads(response.data)['scope'] == 'worker'
+    data = json.loads(response.data)['percentiles']
+    assert 'cpu.usage' in data
+    assert data['latency.main.api_cpu']['5m']['count'] >= 1
+    assert set(data['cpu.usage']['24h']) >= {'count', 'p50', 'p95', 'p99'}
+
+    response = client.get('/api/percentiles?metric=latency.main.login&format=sketch', headers=headers)
+    sketch = json.loads(response.data)['percentiles']['latency.main.login']['1h']
+    assert sketch['count'] >= 1 and sketch['bins']
+
+    assert client.get('/api/percentiles?metric=nope', headers=headers).status_code == 404
+
+def test_latencias_fusionadas_entre_workers(tmp_path):
+    """Con directorio compartido se fusionan las latencias de todos los workers, no las del host"""
+    workers = []
+    for offset in (0, 100):
+        registry = PercentileRegistry(windows=[(300, 10)])
+        for value in range(1, 51):
+            registry.observe('latency.main.api_stats', value + offset, timestamp=1000.0)
+        registry.observe('cpu.usage', 10.0, timestamp=1000.0)
+        workers.append(SharedPercentiles(registry, str(tmp_path), interval=5, ttl=60))
+
+    # El segundo worker vuelca desde "otro proceso": mismo pid, así que se renombra su volcado
+    workers[1].publish(now=1001.0, force=True)
+    os.replace(tmp_path / f"{os.getpid()}.json", tmp_path / 'otro.json')
+
+    sketches, count = workers[0].sketches(now=1001.0)
+    assert count == 2
+    latency = sketches['latency.main.api_stats']['5m']
+    assert latency.count == 100 and latency.min == 1.0 and latency.max == 150.0
+    # Las métricas del host son las del propio worker (no se cuentan una vez por worker)
+    assert sketches['cpu.usage']['5m'].count == 1
+
+    os.utime(tmp_path / 'otro.json', (0, 0))
+    sketches, count = workers[0].sketches(now=time.time())
+    assert count == 1 and not (tmp_path / 'otro.json').exists()
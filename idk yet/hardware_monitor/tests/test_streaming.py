@@ -0,0 +1,93 @@
+"""
+Tests del streaming SSE
+"""
+
+import json
+from app import create_app
+from app.sampler import HardwareSampler
+from app.streaming import (BroadcastHub, stream_client_limit, STREAM_MAX_CLIENTS, STREAM_RESERVED_THREADS,
+                           WEB_THREADS)
+
+def make_snapshots(count):
+    """Generar snapshots reales con secuencia creciente"""
+    sampler = HardwareSampler(enabled=False)
+    return [sampler.sample_once() for _ in range(count)]
+
+def test_cola_acotada_descarta_lo_mas_antiguo():
+    """Un cliente lento pierde los eventos más antiguos, no bloquea al hub"""
+    hub = BroadcastHub(queue_size=2)
+    subscription = hub.subscribe()
+    for snapshot in make_snapshots(4):
+        hub.publish(snapshot)
+
+    assert subscription.dropped == 2
+    assert [subscription.get(0)[0], subscription.get(0)[0]] == [3, 4]
+    assert subscription.get(0) is None
+
+def test_reanudar_con_last_event_id():
+    """Con Last-Event-ID solo se reenvían los eventos posteriores"""
+    hub = BroadcastHub()
+    for snapshot in make_snapshots(5):
+        hub.publish(snapshot)
+
+    subscription = hub.subscribe(last_event_id=3)
+    assert [subscription.get(0)[0], subscription.get(0)[0]] == [4, 5]
+
+    fresh = hub.subscribe()
+    assert fresh.get(0)[0] == 5
+
+def test_stream_emite_eventos_y_heartbeat():
+    """El generador emite retry, el evento pendiente y comentarios heartbeat"""
+    hub = BroadcastHub()
+    hub.publish(make_snapshots(1)[0])
+    subscription = hub.subscribe()
+    stream = hub.stream(subscription, heartbeat=0.01)
+
+    assert next(stream).startswith('retry:')
+    event = next(stream)
+    assert event.startswith('id: 1\nevent: sample\n')
+    assert json.loads(event.split('data: ')[1])['seq'] == 1
+    assert next(stream) == ': heartbeat\n\n'
+    stream.close()
+    assert hub.client_count() == 0
+
+def test_api_stream_con_token_en_query():
+    """EventSource no envía headers: el token viaja en ?jwt="""
+    app = create_app()
+    client = app.test_client()
+    response = client.post('/api/login', json={'username': 'admin', 'password': 'admin'})
+    token = json.loads(response.data)['access_token']
+
+    assert client.get('/api/stream').status_code == 401
+    response = client.get(f'/api/stream?jwt={token}')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    chunks = response.response
+    assert next(chunks).startswith(b'retry:')
+    assert b'event: sample' in next(chunks)
+    response.close()
+
+def test_stream_delta_reenvia_keyframe_si_se_rompe_la_cadena():
+    """Un cliente delta recibe deltas encadenados y un keyframe tras perder eventos"""
+    hub = BroadcastHub(queue_size=2)
+    snapshots = make_snapshots(5)
+    hub.publish(snapshots[0])
+    subscription = hub.subscribe(encoding='delta')
+
+    hub.publish(snapshots[1])
+    assert 'event: keyframe' in hub.render(subscription, subscription.get(0))
+    assert 'event: delta' in hub.render(subscription, subscription.get(0))
+
+    # La cola solo guarda 2 eventos: el 3 se descarta y el 4 ya no encadena
+    for snapshot in snapshots[2:]:
+        hub.publish(snapshot)
+    assert 'event: keyframe' in hub.render(subscription, subscription.get(0))
+    assert 'event: delta' in hub.render(subscription, subscription.get(0))
+
+def test_limite_de_clientes_deja_hilos_libres():
+    """El tope de clientes SSE por worker reserva hilos para el resto de requests"""
+    assert stream_client_limit(32, 16, 200) == 16
+    assert stream_client_limit(32, 4) == 28
+    assert stream_client_limit(32, 16, 8) == 8
+    assert stream_client_limit(4, 8) == 1
+    assert STREAM_MAX_CLIENTS <= WEB_THREADS - STREAM_RESERVED_THREADS or STREAM_MAX_CLIENTS == 1
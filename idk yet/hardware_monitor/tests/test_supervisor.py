@@ -0,0 +1,113 @@
+"""
+Tests de la supervisión de recolectores (plazos, cuarentena y último valor bueno)
+"""
+
+import threading
+import time
+
+import pytest
+
+from app.supervisor import CollectorSupervisor, CollectorUnavailable, mark_stale
+
+def make_supervisor():
+    """Supervisor con plazos cortos para tests"""
+    return CollectorSupervisor(deadline_ms=50, backoff_base=0.2, backoff_max=1.0)
+
+def test_valor_fresco():
+    """Una llamada a tiempo devuelve el valor sin antigüedad"""
+    supervisor = make_supervisor()
+    assert supervisor.call('cpu', lambda: {'usage': 10.0}) == ({'usage': 10.0}, None)
+    assert supervisor.status()['cpu']['failures'] == 0
+
+def test_colgado_sirve_ultimo_valor_y_no_bloquea():
+    """Un recolector colgado no bloquea más allá del plazo y se sirve el último valor bueno"""
+    supervisor = make_supervisor()
+    supervisor.call('disk', lambda: {'usage': 42.0})
+    release = threading.Event()
+
+    started = time.monotonic()
+    value, age = supervisor.call('disk', lambda: release.wait(5) or {'usage': 0.0})
+    assert time.monotonic() - started < 0.5
+    assert value == {'usage': 42.0}
+    assert age is not None
+    assert mark_stale(value, age) == {'usage': 42.0, 'stale': True, 'age_seconds': age}
+    assert supervisor.status()['disk']['quarantined']
+    release.set()
+
+def test_cuarentena_con_backoff_exponencial():
+    """Los fallos consecutivos alargan la cuarentena y durante ella no se llama al recolector"""
+    supervisor = make_supervisor()
+    calls = []
+
+    def failing():
+        calls.append(1)
+        raise OSError('Stale file handle')
+
+    with pytest.raises(CollectorUnavailable):
+        supervisor.call('nfs', failing)
+    first = supervisor.status()['nfs']['retry_in_seconds']
+    with pytest.raises(CollectorUnavailable):
+        supervisor.call('nfs', failing)
+    assert len(calls) == 1
+
+    time.sleep(0.25)
+    with pytest.raises(CollectorUnavailable):
+        supervisor.call('nfs', failing)
+    status = supervisor.status()['nfs']
+    assert len(calls) == 2
+    assert status['failures'] == 2 and status['retry_in_seconds'] > first
+    assert 'Stale file handle' in status['last_error']
+
+def test_no_se_apilan_hilos_sobre_un_recurso_colgado():
+    """Mientras la llamada colgada sigue viva no se lanza otra"""
+    supervisor = CollectorSupervisor(deadline_ms=20, backoff_base=0.01, backoff_max=0.01)
+    release = threading.Event()
+    calls = []
+
+    def hung():
+        calls.append(1)
+        release.wait(5)
+        return {'usage': 1.0}
+
+    for _ in range(5):
+        with pytest.raises(CollectorUnavailable):
+            supervisor.call('mount', hung)
+        time.sleep(0.02)
+    assert len(calls) == 1
+    release.set()
+
+def test_resultado_con_error():
+    """Un resultado marcado como fallido se devuelve tal cual si no hay valor previo"""
+    supervisor = make_supervisor()
+    failed = lambda data: 'error' in data
+    value, age = supervisor.call('ram', lambda: {'usage': -1, 'error': 'x'}, failed=failed)
+    assert value['error'] == 'x' and age is None
+    assert supervisor.status()['ram']['quarantined']
+
+def test_llamadas_concurrentes_comparten_la_llamada_en_curso():
+    """Una segunda petición mientras el recolector responde a tiempo espera ese resultado sin cuarentena"""
+    supervisor = CollectorSupervisor(deadline_ms=500, backoff_base=1.0, backoff_max=1.0)
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {'usage': 7.0}
+
+    results = []
+    first = threading.Thread(target=lambda: results.append(supervisor.call('cpu', slow)))
+    first.start()
+    assert started.wait(5)
+    second = threading.Thread(target=lambda: results.append(supervisor.call('cpu', slow)))
+    second.start()
+    time.sleep(0.05)
+    release.set()
+    first.join(5)
+    second.join(5)
+
+    assert results == [({'usage': 7.0}, None)] * 2
+    assert len(calls) == 1
+    status = supervisor.status()['cpu']
+    assert not status['quarantined'] and status['failures'] == 0
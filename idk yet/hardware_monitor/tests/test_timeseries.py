@@ -0,0 +1,58 @@
+"""
+Tests del almacén de series temporales
+"""
+
+import json
+import math
+from app import create_app
+from app.timeseries import RingBufferStore
+
+def test_buffer_circular_descarta_lo_mas_antiguo():
+    """Al superar la capacidad se sobrescriben las muestras más antiguas"""
+    store = RingBufferStore(capacity=4, max_series=2)
+    for i in range(6):
+        store.append(100.0 + i, {'cpu.usage': float(i)})
+
+    timestamps, values = store.range('cpu.usage')
+    assert timestamps.tolist() == [102.0, 103.0, 104.0, 105.0]
+    assert values.tolist() == [2.0, 3.0, 4.0, 5.0]
+
+def test_rango_por_tiempo():
+    """El rango [since, until] se resuelve por búsqueda binaria"""
+    store = RingBufferStore(capacity=8, max_series=2)
+    for i in range(10):
+        store.append(float(i), {'cpu.usage': float(i), 'ram.usage': 50.0})
+
+    timestamps, values = store.range('cpu.usage', since=4, until=6)
+    assert timestamps.tolist() == [4.0, 5.0, 6.0]
+    assert values.tolist() == [4.0, 5.0, 6.0]
+    assert store.range('cpu.usage', since=20)[0].size == 0
+
+def test_limite_de_series_y_huecos():
+    """Las series extra se descartan y los valores ausentes son NaN"""
+    store = RingBufferStore(capacity=4, max_series=1)
+    store.append(1.0, {'cpu.usage': 1.0, 'ram.usage': 2.0})
+    store.append(2.0, {})
+
+    assert store.series_names() == ['cpu.usage']
+    values = store.range('cpu.usage')[1].tolist()
+    assert values[0] == 1.0 and math.isnan(values[1])
+    assert store.memory_bytes() == 4 * 8 + 4 * 4
+
+def test_api_history_columnar():
+    """El endpoint devuelve arrays ts/values en lugar de una lista de dicts"""
+    app = create_app()
+    client = app.test_client()
+    response = client.post('/api/login', json={'username': 'admin', 'password': 'admin'})
+    headers = {'Authorization': f"Bearer {json.loads(response.data)['access_token']}"}
+
+    data = json.loads(client.get('/api/history?metric=cpu.usage', headers=headers).data)
+    assert data['success'] is True
+    assert len(data['ts']) == len(data['values']) >= 1
+
+    response = client.get('/api/history?metric=no.existe', headers=headers)
+    assert response.status_code == 404
+
+    for points in ('0', '-5', 'diez'):
+        response = client.get(f'/api/history?metric=cpu.usage&points={points}', headers=headers)
+        assert response.status_code == 400 and json.loads(response.data)['success'] is False